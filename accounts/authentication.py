@@ -0,0 +1,93 @@
+"""
+JWT authentication with cached user and Google account lookups
+
+Every JWT-authenticated request used to load the User and, in most views,
+the GoogleAccount, whose two EncryptedCharField tokens are decrypted with
+Fernet on load. ``CachedJWTAuthentication`` serves both from caches scoped
+to the user's versioned ``auth`` cache scope:
+
+- the User is cached in the shared cache for AUTH_USER_CACHE_TTL
+- the GoogleAccount, with its decrypted tokens, is cached in process
+  memory only (tokens never reach Redis) for GOOGLE_ACCOUNT_CACHE_TTL
+
+Saving or deleting the User or GoogleAccount (token refresh, disconnect,
+profile changes) invalidates the scope, which drops both in every process.
+Reading the cached user and the scope version takes one cache round trip.
+"""
+import copy
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import GoogleAccount
+from core.cache import get_versioned, invalidate, set_versioned
+
+NAMESPACE = 'auth'
+LOCAL_CACHE_SIZE = 10000
+
+# user id -> (scope version, expires at, GoogleAccount or None)
+_google_accounts: Dict[int, Tuple[str, float, Optional[GoogleAccount]]] = {}
+
+
+def invalidate_auth_cache(user_id: int):
+    """Drop the cached user and Google account once the current transaction commits"""
+    transaction.on_commit(lambda: invalidate(NAMESPACE, user_id))
+
+
+def _invalidate_for_user(sender, instance, **kwargs):
+    invalidate_auth_cache(instance.pk)
+
+
+def _invalidate_for_google_account(sender, instance, **kwargs):
+    invalidate_auth_cache(instance.user_id)
+
+
+def connect_signals():
+    post_save.connect(_invalidate_for_user, sender=User, dispatch_uid='auth_cache:user')
+    post_delete.connect(_invalidate_for_user, sender=User, dispatch_uid='auth_cache:user')
+    post_save.connect(_invalidate_for_google_account, sender=GoogleAccount, dispatch_uid='auth_cache:google_account')
+    post_delete.connect(_invalidate_for_google_account, sender=GoogleAccount, dispatch_uid='auth_cache:google_account')
+
+
+def _get_google_account(user_id: int, version: str) -> Optional[GoogleAccount]:
+    """Return the user's GoogleAccount from process memory, loading it when stale"""
+    entry = _google_accounts.get(user_id)
+    if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+        return entry[2]
+
+    google_account = GoogleAccount.objects.filter(user_id=user_id).first()
+    if len(_google_accounts) >= LOCAL_CACHE_SIZE:
+        _google_accounts.clear()
+    _google_accounts[user_id] = (version, time.monotonic() + settings.GOOGLE_ACCOUNT_CACHE_TTL, google_account)
+    return google_account
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the user and ``user.google_account`` from cache"""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        version, user = get_versioned(NAMESPACE, user_id, 'user')
+        if user is None or not user.is_active:
+            # Loaded fresh, so no related objects get pickled into the cache
+            user = super().get_user(validated_token)
+            set_versioned(NAMESPACE, user_id, 'user',
+                          value=user, version=version, timeout=settings.AUTH_USER_CACHE_TTL)
+
+        google_account = _get_google_account(user.pk, version)
+        if google_account is None:
+            # Makes user.google_account raise DoesNotExist without a query
+            User.google_account.related.set_cached_value(user, None)
+        else:
+            # A copy per request: callers refresh tokens in place
+            user.google_account = copy.copy(google_account)
+        return user
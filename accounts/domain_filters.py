@@ -0,0 +1,125 @@
+"""
+Compiled per-user domain allow/block matching
+
+A user's DomainFilter rows are compiled into a suffix trie keyed on reversed
+domain labels (``jobs.example.com`` -> com, example, jobs), so a sender is
+matched against every rule in one walk of its own labels. A rule applies to
+its domain and all subdomains; the most specific matching rule wins and
+senders matching no rule are allowed.
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.models import DomainFilter
+from core.cache import make_key
+
+# Key holding a node's own rule; labels are never empty so it cannot clash
+RULE = ''
+
+EMAIL_ADDRESS_RE = re.compile(r'<([^<>]+)>')
+
+
+def normalize_domain(domain: str) -> str:
+    """Lowercase a domain and strip wildcards, leading dots and '@'"""
+    domain = domain.strip().lower().rstrip('.')
+    if '@' in domain:
+        domain = domain.rsplit('@', 1)[1]
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    return domain.lstrip('.')
+
+
+def get_sender_domain(sender: str) -> str:
+    """Domain of a From header value or bare email address"""
+    match = EMAIL_ADDRESS_RE.search(sender)
+    address = match.group(1) if match else sender
+    if '@' not in address:
+        return ''
+    return normalize_domain(address)
+
+
+class DomainMatcher:
+    """Suffix trie over reversed domain labels"""
+
+    def __init__(self, rules: Iterable[Tuple[str, bool]] = ()):
+        self.root = {}
+        for domain, is_allowed in rules:
+            self.add(domain, is_allowed)
+
+    def add(self, domain: str, is_allowed: bool):
+        domain = normalize_domain(domain)
+        if not domain:
+            return
+        node = self.root
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        node[RULE] = is_allowed
+
+    def match(self, domain: str) -> Optional[bool]:
+        """Verdict of the most specific rule covering ``domain``, None if no rule does"""
+        verdict = None
+        node = self.root
+        for label in reversed(normalize_domain(domain).split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            verdict = node.get(RULE, verdict)
+        return verdict
+
+    def is_allowed(self, sender: str) -> bool:
+        """Check a From header value or email address against the rules"""
+        domain = get_sender_domain(sender)
+        return not domain or self.match(domain) is not False
+
+    def blocked_domains(self) -> List[str]:
+        """
+        Blocked domains that can be excluded wholesale in a Gmail query
+
+        A block with an allowed subdomain beneath it is left out, since
+        ``-from:example.com`` would also drop mail from ``jobs.example.com``.
+        """
+        blocked = []
+
+        def walk(node, labels):
+            if node.get(RULE) is False and not _has_allow_below(node):
+                blocked.append('.'.join(reversed(labels)))
+                return  # Subdomains are covered by this term
+            for label, child in node.items():
+                if label != RULE:
+                    walk(child, labels + [label])
+
+        walk(self.root, [])
+        return sorted(blocked)
+
+    def __bool__(self):
+        return bool(self.root)
+
+
+def _has_allow_below(node) -> bool:
+    for label, child in node.items():
+        if label != RULE and (child.get(RULE) is True or _has_allow_below(child)):
+            return True
+    return False
+
+
+def _cache_key(user_id: int) -> str:
+    return make_key('accounts', 'domain-matcher', user_id)
+
+
+def get_domain_matcher(user) -> DomainMatcher:
+    """Return the user's compiled matcher, compiling it on a cache miss"""
+    matcher = cache.get(_cache_key(user.pk))
+    if matcher is None:
+        matcher = DomainMatcher(
+            DomainFilter.objects.filter(user=user).values_list('domain', 'is_allowed')
+        )
+        cache.set(_cache_key(user.pk), matcher, settings.DOMAIN_FILTER_CACHE_TTL)
+    return matcher
+
+
+def invalidate_domain_matcher(user):
+    """Drop the cached matcher after the user's DomainFilter rows change"""
+    cache.delete(_cache_key(user.pk))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googleaccount',
+            name='gmail_history_id',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_googleaccount_gmail_history_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googleaccount',
+            name='gmail_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
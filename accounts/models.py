@@ -8,6 +8,8 @@ class GoogleAccount(models.Model):
     access_token = EncryptedCharField(max_length=2048)
     refresh_token = EncryptedCharField(max_length=2048)
     token_expiry = models.DateTimeField()
+    gmail_history_id = models.CharField(max_length=32, null=True, blank=True)  # Cursor for incremental sync
+    gmail_synced_at = models.DateTimeField(null=True, blank=True)  # Last completed Gmail sync
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
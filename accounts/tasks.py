@@ -0,0 +1,49 @@
+"""
+Celery tasks for Google account maintenance
+"""
+import logging
+from datetime import timedelta
+from typing import Dict
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import GoogleAccount
+from accounts.utils import ensure_fresh_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_expiring_tokens() -> Dict:
+    """
+    Refresh access tokens shortly before they expire (run by celery beat)
+
+    Renewing every token that expires within GOOGLE_TOKEN_REFRESH_AHEAD
+    seconds keeps request handlers and sync tasks from ever having to wait
+    on Google's token endpoint.
+    """
+    cutoff = timezone.now() + timedelta(seconds=settings.GOOGLE_TOKEN_REFRESH_AHEAD)
+    account_ids = list(
+        GoogleAccount.objects.filter(token_expiry__lte=cutoff).values_list('id', flat=True)
+    )
+
+    for account_id in account_ids:
+        refresh_account_tokens.delay(account_id)
+
+    return {'accounts': len(account_ids)}
+
+
+@shared_task
+def refresh_account_tokens(account_id: int):
+    """Refresh one account's tokens if they are still close to expiry"""
+    try:
+        google_account = GoogleAccount.objects.get(pk=account_id)
+    except GoogleAccount.DoesNotExist:
+        return  # Disconnected since the sweep started
+
+    try:
+        ensure_fresh_tokens(google_account, margin=settings.GOOGLE_TOKEN_REFRESH_AHEAD)
+    except Exception:
+        logger.exception('Failed to refresh Google tokens for account %s', account_id)
@@ -1,3 +1,261 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.domain_filters import DomainMatcher, get_domain_matcher
+from accounts.models import GoogleAccount
+from accounts.tasks import refresh_account_tokens, refresh_expiring_tokens
+from accounts.utils import TokenRefreshTimeout, ensure_fresh_tokens
+
+
+class TokenRefreshTestCase(TestCase):
+    """Tests for Google token refresh coordination"""
+
+    def setUp(self):
+        cache.clear()
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('accounts.utils.get_redis_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        self.google_account = GoogleAccount.objects.create(
+            user=self.user,
+            access_token='old-access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+
+    def fake_refresh(self, credentials, request):
+        credentials.token = 'new-access'
+        credentials.expiry = datetime(2030, 1, 1, 12, 0)
+
+    def test_valid_token_is_not_refreshed(self):
+        """Test that tokens outside the expiry margin are left alone"""
+        with mock.patch('google.oauth2.credentials.Credentials.refresh') as refresh:
+            ensure_fresh_tokens(self.google_account)
+
+        refresh.assert_not_called()
+
+    def test_expiring_token_uses_issued_expiry(self):
+        """Test that refreshed tokens store the expiry Google returned"""
+        self.google_account.token_expiry = timezone.now() + timedelta(seconds=30)
+        self.google_account.save()
+
+        with mock.patch('google.oauth2.credentials.Credentials.refresh',
+                        autospec=True, side_effect=self.fake_refresh) as refresh:
+            ensure_fresh_tokens(self.google_account)
+
+        self.assertEqual(refresh.call_count, 1)
+        self.google_account.refresh_from_db()
+        self.assertEqual(self.google_account.access_token, 'new-access')
+        self.assertEqual(
+            self.google_account.token_expiry,
+            datetime(2030, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+        )
+
+    
+    def hold_refresh_lock(self):
+        lock = self.redis.lock(
+            f'google:token-refresh:{self.google_account.pk}', timeout=60, thread_local=False
+        )
+        self.assertTrue(lock.acquire(blocking=False))
+        return lock
+    
+    def test_follower_reloads_tokens_refreshed_while_waiting(self):
+        """Test that a caller waiting on the lock uses the leader's tokens instead of refreshing"""
+        stale_expiry = timezone.now() + timedelta(seconds=30)
+        GoogleAccount.objects.filter(pk=self.google_account.pk).update(token_expiry=stale_expiry)
+        self.google_account.refresh_from_db()
+        
+        # The leader refreshes, then releases the lock while we wait on it
+        lock = self.hold_refresh_lock()
+        GoogleAccount.objects.filter(pk=self.google_account.pk).update(
+            access_token='leader-access', token_expiry=timezone.now() + timedelta(hours=1)
+        )
+        timer = threading.Timer(0.2, lock.release)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        
+        with mock.patch('google.oauth2.credentials.Credentials.refresh') as refresh:
+            ensure_fresh_tokens(self.google_account)
+        
+        refresh.assert_not_called()
+        self.assertEqual(self.google_account.access_token, 'leader-access')
+    
+    @override_settings(GOOGLE_TOKEN_REFRESH_LOCK_TIMEOUT=0.2)
+    def test_lock_wait_timeout_does_not_return_stale_tokens(self):
+        """Test that a caller that cannot get the lock raises instead of using the expiring token"""
+        self.google_account.token_expiry = timezone.now() + timedelta(seconds=30)
+        self.google_account.save()
+        self.hold_refresh_lock()
+        
+        with mock.patch('google.oauth2.credentials.Credentials.refresh') as refresh:
+            with self.assertRaises(TokenRefreshTimeout):
+                ensure_fresh_tokens(self.google_account)
+        
+        refresh.assert_not_called()
+    
+    def test_refresh_endpoint_uses_the_refresh_ahead_margin(self):
+        """Test that the manual refresh renews tokens inside the refresh-ahead window under the lock"""
+        self.google_account.token_expiry = timezone.now() + timedelta(minutes=5)
+        self.google_account.save()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        
+        with mock.patch('google.oauth2.credentials.Credentials.refresh',
+                        autospec=True, side_effect=self.fake_refresh) as refresh:
+            response = self.client.post('/api/auth/google/refresh/', **headers)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['refreshed'])
+        self.assertEqual(refresh.call_count, 1)
+        self.assertFalse(self.redis.exists(f'google:token-refresh:{self.google_account.pk}'))
+        self.google_account.refresh_from_db()
+        self.assertEqual(self.google_account.access_token, 'new-access')
+        
+        # Far from expiry: nothing to do, and the response says so
+        cache.clear()
+        with mock.patch('google.oauth2.credentials.Credentials.refresh') as refresh:
+            response = self.client.post('/api/auth/google/refresh/', **headers)
+        refresh.assert_not_called()
+        self.assertEqual(
+            (response.json()['refreshed'], response.json()['message']), (False, 'Tokens are still valid')
+        )
+        
+        # Held by another worker past the wait: an error, not the old token
+        self.google_account.token_expiry = timezone.now() + timedelta(minutes=5)
+        self.google_account.save()
+        cache.clear()  # Cached account invalidation runs on commit
+        self.hold_refresh_lock()
+        with override_settings(GOOGLE_TOKEN_REFRESH_LOCK_TIMEOUT=0.2):
+            response = self.client.post('/api/auth/google/refresh/', **headers)
+        self.assertEqual(response.status_code, 500)
+    
+    def test_periodic_refresh_renews_expiring_accounts(self):
+        """Test that the sweep queues accounts expiring within GOOGLE_TOKEN_REFRESH_AHEAD"""
+        expiring = GoogleAccount.objects.create(
+            user=User.objects.create(username='expiring', email='expiring@example.com'),
+            access_token='old-access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(minutes=5),
+        )
+        
+        with mock.patch('google.oauth2.credentials.Credentials.refresh',
+                        autospec=True, side_effect=self.fake_refresh) as refresh:
+            self.assertEqual(refresh_expiring_tokens(), {'accounts': 1})
+        
+        self.assertEqual(refresh.call_count, 1)
+        expiring.refresh_from_db()
+        self.assertEqual(expiring.access_token, 'new-access')
+        self.google_account.refresh_from_db()
+        self.assertEqual(self.google_account.access_token, 'old-access')
+    
+    def test_failed_account_refresh_is_logged(self):
+        """Test that a failing refresh is logged, and deleted accounts are ignored"""
+        self.google_account.token_expiry = timezone.now() + timedelta(minutes=5)
+        self.google_account.save()
+        
+        with mock.patch('google.oauth2.credentials.Credentials.refresh', side_effect=Exception('invalid_grant')):
+            with self.assertLogs('accounts.tasks', level='ERROR'):
+                refresh_account_tokens(self.google_account.pk)
+        
+        self.assertIsNone(refresh_account_tokens(self.google_account.pk + 1))
+
+
+class DomainMatcherTestCase(TestCase):
+    """Tests for compiled domain filter matching"""
+
+    def test_most_specific_rule_wins(self):
+        """Test that rules cover subdomains and deeper rules override them"""
+        matcher = DomainMatcher([('example.com', False), ('jobs.example.com', True)])
+
+        self.assertFalse(matcher.is_allowed('Spam <news@example.com>'))
+        self.assertFalse(matcher.is_allowed('promo@mail.example.com'))
+        self.assertTrue(matcher.is_allowed('Recruiter <r@eu.jobs.example.com>'))
+        self.assertTrue(matcher.is_allowed('someone@notexample.com'))
+
+    def test_blocked_domains_skip_blocks_with_allowed_subdomains(self):
+        """Test that only blocks safe to push into the Gmail query are returned"""
+        matcher = DomainMatcher([
+            ('example.com', False),
+            ('jobs.example.com', True),
+            ('spam.net', False),
+            ('x.spam.net', False),
+            ('ads.example.com', False),
+        ])
+
+        self.assertEqual(matcher.blocked_domains(), ['ads.example.com', 'spam.net'])
+
+    def test_matcher_is_rebuilt_after_filter_changes(self):
+        """Test that the cached matcher is invalidated when filters are written"""
+        cache.clear()
+        user = User.objects.create(username='tester', email='tester@example.com')
+        self.assertTrue(get_domain_matcher(user).is_allowed('a@spam.net'))
+
+        self.client.force_login(user)
+        response = self.client.post('/api/auth/domains/', {'domain': 'spam.net', 'is_allowed': False})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(get_domain_matcher(user).is_allowed('a@spam.net'))
+
+
+class OAuthStateTestCase(TestCase):
+    """Tests for cache-backed OAuth state"""
+
+    def test_state_is_single_use_and_needs_no_session(self):
+        """Test that an issued state is accepted once and never written to a session"""
+        cache.clear()
+        flow = mock.Mock()
+        flow.authorization_url.return_value = ('https://accounts.google.com/o/oauth2/auth', None)
+        flow.fetch_token.side_effect = Exception('code exchange skipped')
+
+        with mock.patch('accounts.views.get_google_auth_flow', return_value=flow):
+            state = self.client.get('/api/auth/oauth/google/').json()['state']
+            self.assertNotIn('sessionid', self.client.cookies)
+
+            # Accepted: fails later, at the (mocked) code exchange
+            response = self.client.post('/api/auth/oauth/google/callback/', {'code': 'abc', 'state': state})
+            self.assertEqual(response.status_code, 500)
+
+            response = self.client.post('/api/auth/oauth/google/callback/', {'code': 'abc', 'state': state})
+            self.assertEqual(response.status_code, 400)
+
+
+class CachedJWTAuthenticationTestCase(TestCase):
+    """Tests for cached user and Google account lookups"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        self.google_account = GoogleAccount.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_repeat_requests_skip_user_and_account_queries(self):
+        """Test that the user and account are loaded once, then after a token refresh"""
+        with self.assertNumQueries(2):  # user, google account
+            response = self.client.get('/api/auth/user/', **self.headers)
+        self.assertTrue(response.json()['has_google_account'])
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/auth/user/', **self.headers)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.google_account.access_token = 'new-access'
+            self.google_account.save()
+
+        with self.assertNumQueries(2):
+            self.client.get('/api/auth/user/', **self.headers)
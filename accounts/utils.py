@@ -1,17 +1,26 @@
 """
 Google OAuth utilities for authentication and token management
 """
+import json
+import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
 from typing import Dict, Optional
 
+import redis
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from django.conf import settings
 from django.utils import timezone
 
+from core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
 
 # Gmail API scopes required for the application
 SCOPES = [
@@ -23,6 +32,42 @@ SCOPES = [
 ]
 
 
+@lru_cache(maxsize=None)
+def load_discovery_document(service_name: str, version: str) -> Dict:
+    """
+    Load and parse a Google API discovery document once per process
+    
+    Uses the static copy bundled with google-api-python-client, so no
+    network request is made and the JSON is only parsed on first use.
+    """
+    document = get_static_doc(service_name, version)
+    if document is None:
+        raise ValueError(f"No bundled discovery document for {service_name} {version}")
+    return json.loads(document)
+
+
+def build_google_service(service_name: str, version: str,
+                         credentials: Optional[Credentials] = None, http=None,
+                         root_url: Optional[str] = None):
+    """
+    Build a Google API client from the cached discovery document
+    
+    The returned service object is cheap to create and bound to the given
+    credentials (or http transport), so build one per use rather than
+    sharing it between threads. ``root_url`` replaces the API's root URL
+    (e.g. ``http://127.0.0.1:8081/`` for a local fake), for both single and
+    batch requests.
+    """
+    document = load_discovery_document(service_name, version)
+    if root_url:
+        document = {**document, 'rootUrl': root_url}
+    return build_from_document(
+        document,
+        credentials=credentials,
+        http=http
+    )
+
+
 def get_google_auth_flow(redirect_uri: Optional[str] = None) -> Flow:
     """
     Create and return a Google OAuth2 flow instance
@@ -65,6 +110,10 @@ def get_google_auth_flow(redirect_uri: Optional[str] = None) -> Flow:
     return flow
 
 
+class TokenRefreshTimeout(Exception):
+    """Another worker held the token refresh lock for longer than GOOGLE_TOKEN_REFRESH_LOCK_TIMEOUT"""
+
+
 def get_credentials_from_tokens(access_token: str, refresh_token: str, 
                                token_expiry: datetime) -> Credentials:
     """
@@ -78,6 +127,10 @@ def get_credentials_from_tokens(access_token: str, refresh_token: str,
     Returns:
         Google Credentials object
     """
+    # google-auth compares expiry against a naive UTC datetime
+    if token_expiry is not None and timezone.is_aware(token_expiry):
+        token_expiry = timezone.make_naive(token_expiry, dt_timezone.utc)
+    
     return Credentials(
         token=access_token,
         refresh_token=refresh_token,
@@ -89,6 +142,18 @@ def get_credentials_from_tokens(access_token: str, refresh_token: str,
     )
 
 
+def get_credentials_expiry(credentials: Credentials) -> datetime:
+    """
+    Return the aware expiry datetime of freshly issued credentials
+    
+    google-auth sets ``credentials.expiry`` from the token endpoint's
+    ``expires_in``; fall back to Google's usual one hour if it is missing.
+    """
+    if credentials.expiry is None:
+        return timezone.now() + timedelta(seconds=3600)
+    return timezone.make_aware(credentials.expiry, dt_timezone.utc)
+
+
 def refresh_google_tokens(google_account) -> Dict[str, any]:
     """
     Refresh expired Google OAuth tokens
@@ -108,15 +173,14 @@ def refresh_google_tokens(google_account) -> Dict[str, any]:
     # Refresh the token
     credentials.refresh(Request())
     
-    # Calculate new expiry (Google tokens typically expire in 1 hour)
-    new_expiry = timezone.now() + timedelta(seconds=3600)
+    new_expiry = get_credentials_expiry(credentials)
     
     # Update the model
     google_account.access_token = credentials.token
     google_account.token_expiry = new_expiry
     if credentials.refresh_token:  # Sometimes refresh token is not returned
         google_account.refresh_token = credentials.refresh_token
-    google_account.save()
+    google_account.save(update_fields=['access_token', 'refresh_token', 'token_expiry', 'updated_at'])
     
     return {
         'access_token': credentials.token,
@@ -125,6 +189,67 @@ def refresh_google_tokens(google_account) -> Dict[str, any]:
     }
 
 
+def tokens_need_refresh(google_account, margin: int = 0) -> bool:
+    """Check whether the access token expires within ``margin`` seconds"""
+    return google_account.token_expiry <= timezone.now() + timedelta(seconds=margin)
+
+
+def ensure_fresh_tokens(google_account, margin: Optional[int] = None):
+    """
+    Refresh tokens that are about to expire, once per account at a time
+    
+    Concurrent callers for the same account coordinate through a Redis lock:
+    the first one refreshes while the others wait for the lock, then reload
+    the new token from the database instead of refreshing again.
+    
+    Args:
+        google_account: GoogleAccount model instance, updated in place
+        margin: Refresh tokens expiring within this many seconds
+            (defaults to GOOGLE_TOKEN_EXPIRY_SKEW)
+        
+    Returns:
+        The same GoogleAccount instance with valid tokens
+        
+    Raises:
+        TokenRefreshTimeout: If the lock could not be acquired in time and
+            the tokens were still not refreshed
+    """
+    if margin is None:
+        margin = settings.GOOGLE_TOKEN_EXPIRY_SKEW
+    if not tokens_need_refresh(google_account, margin):
+        return google_account
+    
+    lock = get_redis_client().lock(
+        f'google:token-refresh:{google_account.pk}',
+        timeout=settings.GOOGLE_TOKEN_REFRESH_LOCK_TIMEOUT,
+        blocking_timeout=settings.GOOGLE_TOKEN_REFRESH_LOCK_TIMEOUT
+    )
+    try:
+        acquired = lock.acquire()
+    except redis.exceptions.ConnectionError:
+        logger.warning('Redis unavailable, refreshing Google tokens without a lock')
+        refresh_google_tokens(google_account)
+        return google_account
+    
+    try:
+        # Another worker may have refreshed while we waited for the lock
+        google_account.refresh_from_db(fields=['access_token', 'refresh_token', 'token_expiry'])
+        if tokens_need_refresh(google_account, margin):
+            if not acquired:
+                raise TokenRefreshTimeout(
+                    f'Timed out waiting for the token refresh of Google account {google_account.pk}'
+                )
+            refresh_google_tokens(google_account)
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except redis.exceptions.LockError:
+                pass  # Lock expired during a slow refresh
+    
+    return google_account
+
+
 def get_user_info(credentials: Credentials) -> Dict[str, str]:
     """
     Fetch user information from Google
@@ -135,7 +260,7 @@ def get_user_info(credentials: Credentials) -> Dict[str, str]:
     Returns:
         Dictionary with user email and name
     """
-    service = build('oauth2', 'v2', credentials=credentials)
+    service = build_google_service('oauth2', 'v2', credentials=credentials)
     user_info = service.userinfo().get().execute()
     
     return {
@@ -157,8 +282,7 @@ def get_gmail_service(google_account):
         Gmail service instance
     """
     # Check if tokens need refresh
-    if google_account.token_expiry <= timezone.now():
-        refresh_google_tokens(google_account)
+    ensure_fresh_tokens(google_account)
     
     credentials = get_credentials_from_tokens(
         google_account.access_token,
@@ -166,4 +290,4 @@ def get_gmail_service(google_account):
         google_account.token_expiry
     )
     
-    return build('gmail', 'v1', credentials=credentials)
\ No newline at end of file
+    return build_google_service('gmail', 'v1', credentials=credentials)
\ No newline at end of file
@@ -2,8 +2,8 @@ import secrets
 from django.conf import settings
 from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.shortcuts import redirect
-from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -11,6 +11,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from core.cache import make_key
+from .domain_filters import invalidate_domain_matcher
 from .models import GoogleAccount, DomainFilter
 from .serializers import (
     UserSerializer, 
@@ -23,10 +25,15 @@ from .utils import (
     get_google_auth_flow, 
     get_user_info, 
     get_credentials_from_tokens,
-    refresh_google_tokens
+    get_credentials_expiry,
+    ensure_fresh_tokens
 )
 
 
+def _oauth_state_key(state: str) -> str:
+    return make_key('accounts', 'oauth-state', state)
+
+
 class GoogleOAuthInitView(APIView):
     """Initialize Google OAuth flow"""
     permission_classes = [AllowAny]
@@ -39,8 +46,8 @@ class GoogleOAuthInitView(APIView):
             # Generate a secure random state
             state = secrets.token_urlsafe(32)
             
-            # Store state in session for verification
-            request.session['oauth_state'] = state
+            # Store state in the cache for verification (no session needed)
+            cache.set(_oauth_state_key(state), True, settings.OAUTH_STATE_TTL)
             
             # Get OAuth flow
             flow = get_google_auth_flow()
@@ -81,18 +88,15 @@ class GoogleOAuthCallbackView(APIView):
         code = serializer.validated_data['code']
         state = serializer.validated_data.get('state', '')
         
-        # Verify state to prevent CSRF
-        # Note: In a production environment with separate frontend/backend,
-        # you'd want to store state in a database or cache instead of sessions
-        session_state = request.session.get('oauth_state', '')
-        if state and session_state and session_state != state:
+        # Verify state to prevent CSRF; deleting it makes each state single-use
+        if state and not cache.delete(_oauth_state_key(state)):
             return Response(
                 {'error': 'Invalid state parameter'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        # For development, we'll allow missing state if both are empty
-        elif not state and not session_state:
-            print("Warning: No state parameter provided or stored")
+        # For development, we'll allow a missing state
+        elif not state:
+            print("Warning: No state parameter provided")
         
         try:
             # Exchange code for tokens
@@ -121,16 +125,13 @@ class GoogleOAuthCallbackView(APIView):
                 defaults={
                     'access_token': credentials.token,
                     'refresh_token': credentials.refresh_token,
-                    'token_expiry': timezone.now() + timezone.timedelta(seconds=3600)
+                    'token_expiry': get_credentials_expiry(credentials)
                 }
             )
             
             # Generate JWT tokens
             refresh = RefreshToken.for_user(user)
             
-            # Clear session state
-            request.session.pop('oauth_state', None)
-            
             return Response({
                 'user': UserSerializer(user).data,
                 'access_token': str(refresh.access_token),
@@ -161,10 +162,15 @@ def refresh_google_token(request):
         )
     
     try:
-        tokens = refresh_google_tokens(google_account)
+        # Coordinated with the periodic refresh and running syncs; tokens
+        # expiring within the refresh-ahead window are renewed
+        previous_expiry = google_account.token_expiry
+        ensure_fresh_tokens(google_account, margin=settings.GOOGLE_TOKEN_REFRESH_AHEAD)
+        refreshed = google_account.token_expiry != previous_expiry
         return Response({
-            'message': 'Tokens refreshed successfully',
-            'token_expiry': tokens['token_expiry']
+            'message': 'Tokens refreshed successfully' if refreshed else 'Tokens are still valid',
+            'refreshed': refreshed,
+            'token_expiry': google_account.token_expiry
         }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response(
@@ -249,6 +255,7 @@ class DomainFilterListCreateView(APIView):
                 )
             
             serializer.save()
+            invalidate_domain_matcher(request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -273,6 +280,7 @@ class DomainFilterDetailView(APIView):
             )
         
         domain_filter.delete()
+        invalidate_domain_matcher(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     def patch(self, request, pk):
@@ -286,6 +294,7 @@ class DomainFilterDetailView(APIView):
         
         domain_filter.is_allowed = not domain_filter.is_allowed
         domain_filter.save()
+        invalidate_domain_matcher(request.user)
         
         serializer = DomainFilterSerializer(domain_filter)
         return Response(serializer.data)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApplicationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'applications'
+    
+    def ready(self):
+        from core.versioning import track_user_changes
+        from applications.models import Application
+        track_user_changes(Application)
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:48
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Serve both company/role ILIKE '%...%' and trigram similarity (%) lookups
+CREATE_TRIGRAM_INDEXES = """
+CREATE INDEX app_company_trgm_idx ON applications_application USING GIN (company gin_trgm_ops);
+CREATE INDEX app_role_trgm_idx ON applications_application USING GIN (role gin_trgm_ops);
+"""
+
+DROP_TRIGRAM_INDEXES = """
+DROP INDEX IF EXISTS app_company_trgm_idx;
+DROP INDEX IF EXISTS app_role_trgm_idx;
+"""
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGRAM_INDEXES)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGRAM_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0002_application_indexes'),
+    ]
+
+    operations = [
+        # No-op on databases other than PostgreSQL
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
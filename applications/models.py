@@ -23,6 +23,11 @@ class Application(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # ApplicationViewSet: per-user list, optionally by status, newest first
+            models.Index(fields=['user', '-created_at'], name='app_user_created_idx'),
+            models.Index(fields=['user', 'status', '-created_at'], name='app_user_status_created_idx'),
+        ]
         
     def __str__(self):
         return f"{self.role} at {self.company} - {self.status}"
@@ -19,12 +19,16 @@ class ApplicationSerializer(serializers.ModelSerializer):
     
     def get_email_count(self, obj):
         """Get count of emails for this application"""
+        # Annotated by ApplicationViewSet.get_queryset; query for one-off instances
+        if hasattr(obj, 'email_count'):
+            return obj.email_count
         return obj.emails.count()
     
     def get_latest_email_date(self, obj):
         """Get date of most recent email"""
-        latest_email = obj.emails.order_by('-received_at').first()
-        return latest_email.received_at if latest_email else None
+        if hasattr(obj, 'latest_email_date'):
+            return obj.latest_email_date
+        return obj.emails.order_by('-received_at').values_list('received_at', flat=True).first()
     
     def create(self, validated_data):
         """Create application with current user"""
@@ -0,0 +1,58 @@
+"""
+Per-user application statistics with caching
+"""
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from applications.models import Application
+from core.cache import make_key
+
+# Response key for each status
+STATUS_KEYS = {
+    'APPLIED': 'applied',
+    'INTERVIEW': 'interview',
+    'OFFER': 'offer',
+    'REJECTED': 'rejected',
+    'ARCHIVE': 'archived',
+    'REPLIED': 'replied',
+}
+
+
+def _cache_key(user_id: int) -> str:
+    return make_key('applications', 'stats', user_id)
+
+
+def get_application_stats(user) -> Dict[str, int]:
+    """
+    Count a user's applications in total and per status
+
+    Counts come from one GROUP BY status query, served by the
+    (user, status, -created_at) index, and are cached until the user's
+    applications change.
+    """
+    stats = cache.get(_cache_key(user.pk))
+    if stats is not None:
+        return stats
+
+    stats = dict.fromkeys(['total', *STATUS_KEYS.values()], 0)
+    rows = (
+        Application.objects.filter(user=user)
+        .order_by()
+        .values('status')
+        .annotate(count=Count('id'))
+    )
+    for row in rows:
+        stats['total'] += row['count']
+        if row['status'] in STATUS_KEYS:
+            stats[STATUS_KEYS[row['status']]] = row['count']
+
+    cache.set(_cache_key(user.pk), stats, settings.APPLICATION_STATS_CACHE_TTL)
+    return stats
+
+
+def invalidate_application_stats(user):
+    """Drop cached stats after the user's applications were created, changed or deleted"""
+    cache.delete(_cache_key(user.pk))
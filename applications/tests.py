@@ -1,3 +1,213 @@
+from datetime import timedelta
+from unittest import mock
+
+import fakeredis
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import GoogleAccount
+from applications.models import Application
+from gmail.models import Email, GmailOperation
+
+
+class ApplicationCursorPaginationTestCase(TestCase):
+    """Tests for keyset pagination of the application list"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        Application.objects.bulk_create([
+            Application(user=self.user, company=f'Company {i}', role='Engineer', thread_id=f't{i}')
+            for i in range(45)
+        ])
+        # Pairs of applications share a timestamp to exercise the id tie-breaker
+        now = timezone.now()
+        for application in Application.objects.all():
+            Application.objects.filter(pk=application.pk).update(
+                created_at=now - timedelta(minutes=application.pk // 2)
+            )
+        self.client.force_login(self.user)
+
+    def test_cursor_walk_returns_every_application_once(self):
+        """Test that following next cursors visits all rows in order without repeats"""
+        expected = list(Application.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+        seen = []
+        response = self.client.get('/api/apps/', {'cursor': '', 'count': 'exact'}).json()
+        self.assertEqual(response['count'], 45)
+        while True:
+            seen += [application['id'] for application in response['results']]
+            if not response['next_cursor']:
+                break
+            response = self.client.get('/api/apps/', {'cursor': response['next_cursor']}).json()
+            self.assertNotIn('count', response)
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        response = self.client.get('/api/apps/', {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryCountTestCase(TestCase):
+    """Pin list and detail endpoints to a constant number of queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        now = timezone.now()
+        for i in range(30):
+            application = Application.objects.create(
+                user=self.user, company=f'Company {i}', role='Engineer', thread_id=f't{i}'
+            )
+            for j in range(3):
+                Email.objects.create(
+                    user=self.user, application=application, gmail_id=f'msg{i}-{j}', thread_id=f't{i}',
+                    subject='Update', sender='jobs@example.com',
+                    recipient='tester@example.com', received_at=now - timedelta(hours=j), body_fetched_at=now,
+                )
+        self.application = application
+        self.email = Email.objects.filter(application=application).first()
+        self.client.force_login(self.user)
+
+    def assertConstantQueries(self, num, url, page_sizes=(5, 30), **params):
+        """Request ``url`` at each page size with exactly ``num`` queries"""
+        for page_size in page_sizes:
+            if page_size:
+                params['page_size'] = page_size
+            with self.assertNumQueries(num):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_application_list(self):
+        """Test that email counts and dates come from one annotated query"""
+        # user, COUNT, page
+        data = self.assertConstantQueries(3, '/api/apps/')
+        self.assertEqual(data['results'][0]['email_count'], 3)
+        self.assertIsNotNone(data['results'][0]['latest_email_date'])
+
+    def test_application_list_cursor(self):
+        self.assertConstantQueries(2, '/api/apps/', cursor='')
+
+    def test_application_detail(self):
+        self.assertConstantQueries(2, f'/api/apps/{self.application.pk}/', page_sizes=(None,))
+
+    def test_email_list(self):
+        # user, COUNT, page
+        data = self.assertConstantQueries(3, '/api/gmail/')
+        self.assertTrue(data['results'][0]['has_application'])
+
+    def test_email_list_cursor(self):
+        self.assertConstantQueries(2, '/api/gmail/', cursor='')
+
+    def test_email_detail(self):
+        # user, email + application + body, application email count, latest email
+        self.assertConstantQueries(4, f'/api/gmail/{self.email.pk}/', page_sizes=(None,))
+
+
+class ApplicationStatsTestCase(TestCase):
+    """Tests for the cached application stats endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        statuses = ['APPLIED', 'APPLIED', 'INTERVIEW', 'ARCHIVE']
+        self.applications = [
+            Application.objects.create(user=self.user, company=f'C{i}', role='Engineer',
+                                       thread_id=f't{i}', status=status)
+            for i, status in enumerate(statuses)
+        ]
+        self.client.force_login(self.user)
+
+    def test_stats_use_one_query_and_are_cached(self):
+        """Test that stats are one grouped query and served from cache afterwards"""
+        with self.assertNumQueries(2):  # user, GROUP BY status
+            data = self.client.get('/api/apps/stats/').json()
+        self.assertEqual(data, {
+            'total': 4, 'applied': 2, 'interview': 1, 'offer': 0,
+            'rejected': 0, 'archived': 1, 'replied': 0,
+        })
+
+        with self.assertNumQueries(1):  # user (sessions are cache-backed)
+            self.client.get('/api/apps/stats/')
+
+    def test_bulk_update_invalidates_stats(self):
+        """Test that a bulk status change is reflected immediately"""
+        self.client.get('/api/apps/stats/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/apps/bulk_update_status/', {
+                'ids': [a.pk for a in self.applications[:2]], 'status': 'OFFER'
+            }, content_type='application/json')
+
+        data = self.client.get('/api/apps/stats/').json()
+        self.assertEqual((data['applied'], data['offer']), (0, 2))
+
+    def test_bulk_update_defers_gmail_labels(self):
+        """Test that Gmail labelling happens after the response, and failures are logged"""
+        GoogleAccount.objects.create(
+            user=self.user, access_token='access', refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        Email.objects.create(
+            user=self.user, gmail_id='msg1', thread_id='t0', subject='Application',
+            sender='jobs@example.com', received_at=timezone.now(), application=self.applications[0],
+        )
+
+        redis_patch = mock.patch('core.redis.get_redis_client', return_value=fakeredis.FakeRedis())
+        service_patch = mock.patch('gmail.outbox.GmailService', side_effect=RuntimeError('invalid_grant'))
+        with redis_patch, service_patch as service_class:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post('/api/apps/bulk_update_status/', {
+                    'ids': [self.applications[0].pk], 'status': 'OFFER'
+                }, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            service_class.assert_not_called()
+
+            with self.assertLogs('gmail.outbox', level='WARNING'):
+                for callback in callbacks:
+                    callback()
+
+        operation = GmailOperation.objects.get()
+        self.assertEqual((operation.operation, operation.status), ('ADD_LABEL', 'PENDING'))
+        self.assertEqual(operation.last_error, 'invalid_grant')
+
+
+class ConditionalListTestCase(TestCase):
+    """Tests for ETag revalidation and the per-user response cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        Application.objects.create(user=self.user, company='Acme', role='Engineer', thread_id='t1')
+        self.client.force_login(self.user)
+
+    def test_unchanged_poll_is_not_modified(self):
+        """Test that a matching If-None-Match gets a 304 without querying"""
+        response = self.client.get('/api/apps/')
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):  # user
+            response = self.client.get('/api/apps/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/apps/')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_write_changes_etag(self):
+        """Test that creating an application invalidates the cached list"""
+        etag = self.client.get('/api/apps/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/apps/', {'company': 'Beta', 'role': 'Engineer'})
 
-# Create your tests here.
+        response = self.client.get('/api/apps/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['count'], 2)
@@ -1,11 +1,18 @@
-from django.db.models import Count, Q
+from django.db.models import Count, Max
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 
+from core.pagination import KeysetPagination
+from core.search import search_applications
+from core.versioning import bump_user_version, cached_user_response
+from gmail.models import Email
+from gmail import outbox
+from gmail.services import STATUS_LABEL
 from .models import Application
+from .stats import get_application_stats, invalidate_application_stats
 from .serializers import (
     ApplicationSerializer,
     ApplicationCreateSerializer,
@@ -20,6 +27,12 @@ class ApplicationPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class ApplicationCursorPagination(KeysetPagination):
+    ordering = '-created_at'
+    page_size = 20
+    max_page_size = 100
+
+
 class ApplicationViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing job applications
@@ -27,26 +40,37 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     pagination_class = ApplicationPagination
     
+    @property
+    def paginator(self):
+        """Page-number pagination, or keyset pagination when ``cursor`` is passed"""
+        if not hasattr(self, '_paginator'):
+            if ApplicationCursorPagination.is_requested(self.request):
+                self._paginator = ApplicationCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+    
     def get_queryset(self):
         """Filter applications by current user"""
-        queryset = Application.objects.filter(user=self.request.user)
+        queryset = Application.objects.filter(user=self.request.user).annotate(
+            email_count=Count('emails'),
+            latest_email_date=Max('emails__received_at')
+        )
         
         # Filter by status if provided
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Filter by search query
+        # Filter by search query (fuzzy and ranked on PostgreSQL)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(company__icontains=search) | 
-                Q(role__icontains=search)
-            )
+            queryset = search_applications(queryset, search)
         
-        # Order by
-        ordering = self.request.query_params.get('ordering', '-created_at')
-        queryset = queryset.order_by(ordering)
+        # Order by (search results default to best match first)
+        ordering = self.request.query_params.get('ordering', None if search else '-created_at')
+        if ordering:
+            queryset = queryset.order_by(ordering)
         
         return queryset
     
@@ -58,6 +82,23 @@ class ApplicationViewSet(viewsets.ModelViewSet):
             return ApplicationStatusUpdateSerializer
         return ApplicationSerializer
     
+    def list(self, request, *args, **kwargs):
+        """List applications, answering unchanged polls from the per-user cache"""
+        build = super().list
+        return cached_user_response(request, lambda: build(request, *args, **kwargs).data)
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_application_stats(self.request.user)
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_application_stats(self.request.user)
+    
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_application_stats(self.request.user)
+    
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
         """Update application status"""
@@ -69,6 +110,7 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        invalidate_application_stats(request.user)
         
         # Return updated application
         response_serializer = ApplicationSerializer(application)
@@ -77,20 +119,10 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get application statistics for current user"""
-        applications = Application.objects.filter(user=request.user)
-        
-        stats_data = {
-            'total': applications.count(),
-            'applied': applications.filter(status='APPLIED').count(),
-            'interview': applications.filter(status='INTERVIEW').count(),
-            'offer': applications.filter(status='OFFER').count(),
-            'rejected': applications.filter(status='REJECTED').count(),
-            'archived': applications.filter(status='ARCHIVE').count(),
-            'replied': applications.filter(status='REPLIED').count(),
-        }
-        
-        serializer = ApplicationStatsSerializer(stats_data)
-        return Response(serializer.data)
+        return cached_user_response(
+            request,
+            lambda: ApplicationStatsSerializer(get_application_stats(request.user)).data
+        )
     
     @action(detail=False, methods=['post'])
     def bulk_update_status(self, request):
@@ -117,6 +149,20 @@ class ApplicationViewSet(viewsets.ModelViewSet):
             user=request.user,
             id__in=ids
         ).update(status=new_status)
+        invalidate_application_stats(request.user)
+        bump_user_version(request.user.pk)
+        
+        # Label the applications' emails in Gmail (batched by the outbox worker)
+        emails = Email.objects.filter(
+            user=request.user,
+            application_id__in=ids
+        ).only('id', 'gmail_id')
+        outbox.enqueue(
+            request.user,
+            outbox.ADD_LABEL,
+            emails,
+            {'label': STATUS_LABEL.format(status=dict(Application.STATUS_CHOICES)[new_status])}
+        )
         
         return Response({
             'updated': updated,
@@ -0,0 +1,163 @@
+"""
+Load test a Gmail-bound endpoint under WSGI and ASGI deployments
+
+Starts a fake Gmail server on localhost (FakeGmailServer, ``--latency``
+seconds per HTTP round-trip), then for each mode runs the Procfile web
+command (gunicorn -c gunicorn.conf.py) with ``--workers`` processes:
+
+- wsgi: sync workers and gmail.views
+- asgi: ASGI_MODE=True, uvicorn workers and gmail.async_views
+
+and fires ``--requests`` GET /api/gmail/<id>/ calls, ``--concurrency`` at a
+time (one user per client), each for a metadata-only email whose body is
+fetched from Gmail during the request. Reports throughput and latency
+percentiles.
+Uses a throwaway SQLite file unless BENCH_DATABASE_URL is set (PostgreSQL
+avoids SQLite's single writer lock).
+
+Usage:
+    python -m benchmarks.asgi_load [--requests 200] [--concurrency 20] [--workers 2] [--latency 0.25]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import _django
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:  # not listening or still booting
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not start')
+
+
+def get_email(base_url: str, token: str, email_id: int):
+    request = urllib.request.Request(
+        f'{base_url}/api/gmail/{email_id}/',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            ok = response.status == 200 and bool(json.load(response)['body_plain'])
+    except urllib.error.HTTPError:
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def run_mode(mode, args, env, clients):
+    port = free_port()
+    server_env = {
+        **env,
+        'ASGI_MODE': 'True' if mode == 'asgi' else 'False',
+        'WEB_CONCURRENCY': str(args.workers),
+        'PORT': str(port),
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=_django.BASE_DIR, env=server_env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_up(f'{base_url}/api/health/')
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            # Warm up: connections, caches and each user's first request
+            list(pool.map(lambda client: get_email(base_url, client[0], client[1].pop()), clients))
+
+            started = time.perf_counter()
+            results = list(pool.map(
+                lambda i: get_email(base_url, clients[i % len(clients)][0], clients[i % len(clients)][1].pop()),
+                range(args.requests)
+            ))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for _, latency in results)
+    return (
+        mode,
+        args.workers,
+        sum(1 for ok, _ in results if not ok),
+        f'{args.requests / elapsed:.1f}/s',
+        f'{statistics.median(latencies):.2f}s',
+        f'{latencies[int(len(latencies) * 0.95) - 1]:.2f}s',
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.25, help='seconds per fake Gmail round-trip')
+    parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+    args = parser.parse_args()
+
+    from gmail.testing import FakeGmailServer, FakeGmailTransport
+
+    # Every request of every mode reads an email of its own
+    per_user = (args.requests // args.concurrency + 2) * len(args.modes)
+    message_count = per_user * args.concurrency
+    gmail_server = FakeGmailServer(FakeGmailTransport(message_count=message_count, latency=args.latency)).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'benchmarks.load_settings',
+            'BENCH_DATABASE_URL': os.environ.get('BENCH_DATABASE_URL', f'sqlite:///{tmp}/load.sqlite3'),
+            'GMAIL_API_ROOT_URL': gmail_server.url,
+        }
+        os.environ.update(env)
+        sys.path.insert(0, str(_django.BASE_DIR))
+
+        import django
+        django.setup()
+        from django.core.management import call_command
+        from django.utils import timezone
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from gmail.models import Email
+
+        call_command('migrate', verbosity=0)
+        clients = []
+        for i in range(args.concurrency):
+            user = _django.make_user(f'load{i}')
+            emails = Email.objects.bulk_create([
+                Email(
+                    user=user, gmail_id=f'msg{index:08d}', thread_id=f'thr{index:08d}', subject='Application',
+                    sender='jobs@example.com', recipient='me@example.com', received_at=timezone.now(),
+                )
+                for index in range(i * per_user, (i + 1) * per_user)
+            ])
+            token = str(RefreshToken.for_user(user).access_token)
+            clients.append((token, [email.id for email in emails]))
+
+        rows = [run_mode(mode, args, env, clients) for mode in args.modes]
+
+    gmail_server.shutdown()
+    print(f'requests={args.requests} concurrency={args.concurrency} latency={args.latency}s')
+    _django.print_table(['mode', 'workers', 'errors', 'throughput', 'p50', 'p95'], rows)
+
+
+if __name__ == '__main__':
+    main()
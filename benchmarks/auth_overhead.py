@@ -0,0 +1,75 @@
+"""
+Benchmark per-request authentication overhead
+
+Authenticates the same JWT-bearing request with simplejwt's
+JWTAuthentication and with accounts.authentication.CachedJWTAuthentication,
+then reads ``user.google_account`` tokens as GmailService does. Reports the
+mean time and database queries per request; the cached path is measured
+warm (after its first request filled the caches).
+
+Usage:
+    python -m benchmarks.auth_overhead [--requests 2000]
+"""
+import argparse
+import time
+
+from benchmarks import _django
+
+
+def measure(authenticator, request, requests):
+    from django.db import connection
+
+    query_count = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal query_count
+        query_count += 1
+        return execute(sql, params, many, context)
+
+    def one_request():
+        user, _ = authenticator.authenticate(request)
+        google_account = user.google_account
+        return google_account.access_token, google_account.refresh_token
+
+    one_request()  # warm up
+    with connection.execute_wrapper(count_query):
+        started = time.perf_counter()
+        for _ in range(requests):
+            one_request()
+        elapsed = time.perf_counter() - started
+    return elapsed / requests, query_count / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from django.conf import settings
+        from django.test import RequestFactory
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from accounts.authentication import CachedJWTAuthentication
+
+        user = _django.make_user()
+        token = RefreshToken.for_user(user).access_token
+        request = RequestFactory().get('/api/gmail/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        rows = []
+        for name, authenticator in (
+            ('JWTAuthentication', JWTAuthentication()),
+            ('CachedJWTAuthentication', CachedJWTAuthentication()),
+        ):
+            per_request, queries = measure(authenticator, request, args.requests)
+            rows.append((name, f'{per_request * 1e6:.0f}us', f'{queries:.1f}'))
+
+        print(f"cache={settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]} requests={args.requests}")
+        _django.print_table(['authentication', 'per request', 'queries per request'], rows)
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
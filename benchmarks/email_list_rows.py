@@ -0,0 +1,129 @@
+"""
+Benchmark email list queries with and without message bodies in the row
+
+Loads one mailbox of hydrated emails and times list pages loaded two ways:
+joined with their EmailBody rows (what every list query read while bodies
+were columns of gmail_email) and narrowed to EMAIL_LIST_FIELDS as
+list_emails does now. On PostgreSQL it also prints the shared buffers each
+query touched (EXPLAIN ANALYZE, BUFFERS) and the on-disk size of both tables.
+
+Usage:
+    python -m benchmarks.email_list_rows [--emails 50000] [--body-size 20000] [--page-sizes 20 200 2000] [--repeat 10]
+"""
+import argparse
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from benchmarks import _django
+
+
+def load_mailbox(user, emails, body_size):
+    from django.utils import timezone
+    from gmail.models import Email, EmailBody
+
+    now = timezone.now()
+    plain = ('Thanks for applying to the Software Engineer role. ' * (body_size // 50 + 1))[:body_size]
+    html = f'<html><body><p>{plain}</p></body></html>'
+    for start in range(0, emails, 2000):
+        batch = Email.objects.bulk_create([
+            Email(
+                user=user, gmail_id=f'msg{i:09d}', thread_id=f'thr{i:09d}', subject=f'Message {i}',
+                sender='jobs@example.com', recipient='me@example.com', snippet=plain[:200],
+                received_at=now - timedelta(seconds=i), body_fetched_at=now,
+            )
+            for i in range(start, min(start + 2000, emails))
+        ])
+        EmailBody.objects.bulk_create([EmailBody.build(email, plain, html) for email in batch])
+    return len(html.encode('utf-8'))
+
+
+def median_time(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset.all())
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def shared_buffers(queryset):
+    """Shared buffers (hit + read) touched by the query, PostgreSQL only"""
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        return 'n/a'
+    plan = queryset.explain(analyze=True, buffers=True)
+    match = re.search(r'Buffers: shared((?: \w+=\d+)+)', plan)
+    if not match:
+        return '0'
+    return str(sum(int(value) for value in re.findall(r'=(\d+)', match.group(1))))
+
+
+def table_sizes():
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_size_pretty(pg_total_relation_size('gmail_email')), "
+            "pg_size_pretty(pg_total_relation_size('gmail_emailbody'))"
+        )
+        return cursor.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=50_000)
+    parser.add_argument('--body-size', type=int, default=20000, help='characters per message body')
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[20, 200, 2000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from django.conf import settings
+        from django.db import connection
+        from django.db.models import Sum
+        from django.db.models.functions import Length
+        from gmail.models import Email, EmailBody
+        from gmail.views import EMAIL_LIST_FIELDS
+
+        user = _django.make_user()
+        html_size = load_mailbox(user, args.emails, args.body_size)
+        stored_html = EmailBody.objects.aggregate(size=Sum(Length('html_data')))['size'] or 0
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        emails = Email.objects.filter(user=user).order_by('-received_at')
+        rows = []
+        for page_size in args.page_sizes:
+            wide = emails.select_related('body')[:page_size]
+            slim = emails.only(*EMAIL_LIST_FIELDS)[:page_size]
+            rows.append((
+                page_size,
+                f'{median_time(wide, args.repeat) * 1000:.2f}ms',
+                f'{median_time(slim, args.repeat) * 1000:.2f}ms',
+                shared_buffers(wide),
+                shared_buffers(slim),
+            ))
+
+        print(f'database={connection.vendor} emails={args.emails} body_size={args.body_size} chars '
+              f'compression={settings.EMAIL_BODY_COMPRESSION or "none"}')
+        print(f'html stored: {stored_html / args.emails:.0f} of {html_size} bytes per email')
+        sizes = table_sizes()
+        if sizes:
+            print(f'gmail_email: {sizes[0]}, gmail_emailbody: {sizes[1]}')
+        _django.print_table(
+            ['page size', 'with bodies', 'list fields', 'buffers with bodies', 'buffers list fields'],
+            rows,
+        )
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark serial vs batched Gmail message-detail fetching
+
+Runs GmailService's detail-fetch stage against the in-process fake Gmail
+transport and reports HTTP round-trips and wall-clock time.
+
+Usage:
+    python -m benchmarks.gmail_batch_fetch [--sizes 50 500 5000] [--latency 0.01]
+"""
+import argparse
+import time
+
+from benchmarks import _django
+from gmail.testing import FakeGmailTransport, build_fake_gmail_service
+
+
+def run(service_cls, user, size, latency, batch_size):
+    transport = FakeGmailTransport(message_count=size, latency=latency)
+    gmail_service = service_cls(user, service=build_fake_gmail_service(transport))
+    message_ids = [f'msg{i:08d}' for i in range(size)]
+
+    started = time.perf_counter()
+    if batch_size > 1:
+        emails = gmail_service._fetch_email_details_batch(message_ids, batch_size)
+    else:
+        emails = [gmail_service._fetch_email_details(message_id) for message_id in message_ids]
+    elapsed = time.perf_counter() - started
+
+    assert len(emails) == size, f'expected {size} emails, got {len(emails)}'
+    return transport.round_trips, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--latency', type=float, default=0.01, help='simulated seconds per round-trip')
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from gmail.services import GmailService
+        user = _django.make_user()
+
+        rows = []
+        for size in args.sizes:
+            serial_trips, serial_time = run(GmailService, user, size, args.latency, 1)
+            batch_trips, batch_time = run(GmailService, user, size, args.latency, args.batch_size)
+            rows.append((
+                size,
+                serial_trips, f'{serial_time:.2f}s',
+                batch_trips, f'{batch_time:.2f}s',
+                f'{serial_time / batch_time:.1f}x',
+            ))
+
+        print(f'latency={args.latency * 1000:.0f}ms/round-trip, batch_size={args.batch_size}')
+        _django.print_table(
+            ['messages', 'serial trips', 'serial time', 'batch trips', 'batch time', 'speedup'],
+            rows,
+        )
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark Gmail API client construction
+
+Compares googleapiclient.discovery.build (what GmailService used to call on
+every construction) with accounts.utils.build_google_service, which parses
+the bundled discovery document once per process. Reports the cold first
+call and the mean of warm calls.
+
+Usage:
+    python -m benchmarks.gmail_client_build [--iterations 200]
+"""
+import argparse
+import logging
+import time
+
+from benchmarks import _django
+
+
+def time_calls(fn, iterations):
+    started = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    warm = (time.perf_counter() - started) / iterations
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from googleapiclient.discovery import build
+        from google.oauth2.credentials import Credentials
+        from accounts.utils import build_google_service, load_discovery_document
+
+        # build() logs a file_cache warning on every call
+        logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
+        credentials = Credentials(token='bench-access-token')
+
+        rows = []
+        cold, warm = time_calls(lambda: build('gmail', 'v1', credentials=credentials), args.iterations)
+        rows.append(('discovery.build', f'{cold * 1000:.2f}ms', f'{warm * 1000:.3f}ms'))
+
+        load_discovery_document.cache_clear()
+        cold, warm = time_calls(lambda: build_google_service('gmail', 'v1', credentials), args.iterations)
+        rows.append(('build_google_service', f'{cold * 1000:.2f}ms', f'{warm * 1000:.3f}ms'))
+
+        print(f'iterations={args.iterations}')
+        _django.print_table(['factory', 'cold call', 'warm call (mean)'], rows)
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark full vs metadata-only Gmail sync
+
+Syncs the same fake mailbox with message_format='full' and 'metadata' and
+reports bytes received from the (fake) Gmail API, wall-clock time and the
+average stored body size per email (plain text plus stored HTML bytes).
+
+Usage:
+    python -m benchmarks.gmail_sync_format [--messages 1000] [--body-size 20000]
+"""
+import argparse
+import time
+
+from benchmarks import _django
+from gmail.testing import FakeGmailTransport, build_fake_gmail_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--body-size', type=int, default=20000, help='characters per message body')
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from django.db.models import Sum
+        from django.db.models.functions import Coalesce, Length
+        from gmail.models import Email, EmailBody
+        from gmail.services import GmailService
+        user = _django.make_user()
+
+        rows = []
+        for message_format in ('full', 'metadata'):
+            transport = FakeGmailTransport(message_count=args.messages, latency=0, body_size=args.body_size)
+            gmail_service = GmailService(user, service=build_fake_gmail_service(transport))
+
+            started = time.perf_counter()
+            gmail_service.sync_emails(max_results=args.messages, message_format=message_format)
+            elapsed = time.perf_counter() - started
+
+            body_size = EmailBody.objects.aggregate(
+                size=Sum(Length('plain') + Coalesce(Length('html_data'), 0))
+            )['size'] or 0
+            row_size = body_size / Email.objects.count()
+            Email.objects.all().delete()
+
+            rows.append((
+                message_format,
+                f'{transport.bytes_received / 2**20:.1f} MiB',
+                f'{elapsed:.2f}s',
+                f'{row_size:.0f} bytes',
+            ))
+
+        print(f'messages={args.messages} body_size={args.body_size} chars')
+        _django.print_table(['format', 'received', 'time', 'avg body per row'], rows)
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
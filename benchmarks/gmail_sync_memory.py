@@ -0,0 +1,75 @@
+"""
+Benchmark peak memory of eager vs streaming Gmail sync
+
+The eager path collects every fetched email into one list before saving
+(fetch_recent_emails + save_emails_to_db); the streaming path is
+GmailService.sync_emails. Both download bodies (message_format='full').
+Peak Python allocations are measured with tracemalloc.
+
+Usage:
+    python -m benchmarks.gmail_sync_memory [--sizes 500 2000 5000] [--body-size 20000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks import _django
+from gmail.testing import FakeGmailTransport, build_fake_gmail_service
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 5000])
+    parser.add_argument('--body-size', type=int, default=20000, help='characters per message body')
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from gmail.models import Email
+        from gmail.services import GmailService
+        user = _django.make_user()
+
+        rows = []
+        for size in args.sizes:
+            transport = FakeGmailTransport(message_count=size, latency=0, body_size=args.body_size)
+            gmail_service = GmailService(user, service=build_fake_gmail_service(transport))
+
+            def eager():
+                emails = gmail_service.fetch_recent_emails(max_results=size, message_format='full')
+                gmail_service.save_emails_to_db(emails)
+
+            def streaming():
+                gmail_service.sync_emails(max_results=size, message_format='full')
+
+            eager_peak, eager_time = measure(eager)
+            Email.objects.all().delete()
+            streaming_peak, streaming_time = measure(streaming)
+            Email.objects.all().delete()
+
+            rows.append((
+                size,
+                f'{eager_peak / 2**20:.1f} MiB', f'{eager_time:.2f}s',
+                f'{streaming_peak / 2**20:.1f} MiB', f'{streaming_time:.2f}s',
+            ))
+
+        print(f'body_size={args.body_size} chars')
+        _django.print_table(
+            ['messages', 'eager peak', 'eager time', 'streaming peak', 'streaming time'],
+            rows,
+        )
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
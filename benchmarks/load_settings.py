@@ -0,0 +1,18 @@
+"""
+Settings for the web servers started by benchmarks.asgi_load
+
+Local settings on the database in BENCH_DATABASE_URL, shared by the load
+test and its server processes. GMAIL_API_ROOT_URL (read by the base
+settings) points Gmail at the load test's fake server.
+"""
+import os
+
+import dj_database_url
+
+from job_tracker.settings import *  # noqa: F401,F403
+
+DEBUG = False
+DATABASES = {'default': dj_database_url.parse(os.environ['BENCH_DATABASE_URL'])}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Server processes write concurrently; wait for the lock instead of failing
+    DATABASES['default']['OPTIONS'] = {'timeout': 30}
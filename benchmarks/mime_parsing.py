@@ -0,0 +1,135 @@
+"""
+Benchmark body extraction from Gmail message payloads
+
+Compares the recursive extractor GmailService used before (every text part
+base64-decoded in full, attachments included) with gmail.mime.extract_body
+(iterative walk, attachments skipped, bodies capped at GMAIL_BODY_MAX_BYTES)
+over corpora of synthetic payloads. Reports CPU time per message, peak
+Python allocations (tracemalloc) and the characters of body kept.
+
+Usage:
+    python -m benchmarks.mime_parsing [--messages 50] [--depth 200] [--newsletter-size 2000000]
+"""
+import argparse
+import base64
+import time
+import tracemalloc
+
+from benchmarks import _django
+
+
+def recursive_extract_body(payload):
+    """The extractor GmailService._extract_body used to implement"""
+    body = {'text': '', 'html': ''}
+    if 'parts' in payload:
+        for part in payload['parts']:
+            if part['mimeType'] == 'text/plain':
+                body['text'] = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
+            elif part['mimeType'] == 'text/html':
+                body['html'] = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
+            elif 'parts' in part:
+                nested_body = recursive_extract_body(part)
+                body['text'] = body['text'] or nested_body['text']
+                body['html'] = body['html'] or nested_body['html']
+    elif payload['body'].get('data'):
+        data = payload['body']['data']
+        if payload['mimeType'] == 'text/plain':
+            body['text'] = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
+        elif payload['mimeType'] == 'text/html':
+            body['html'] = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
+    return body
+
+
+def text_part(mime_type, content, filename=''):
+    data = base64.urlsafe_b64encode(content.encode()).decode()
+    part = {
+        'mimeType': mime_type,
+        'filename': filename,
+        'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="UTF-8"'}],
+        'body': {'size': len(data), 'data': data},
+    }
+    if filename:
+        part['headers'].append({'name': 'Content-Disposition', 'value': f'attachment; filename="{filename}"'})
+    return part
+
+
+def multipart(mime_type, parts):
+    return {'mimeType': mime_type, 'filename': '', 'headers': [], 'body': {'size': 0}, 'parts': parts}
+
+
+def alternative(text_size, html_size):
+    text = ('Thanks for applying. We will be in touch shortly. ' * (text_size // 51 + 1))[:text_size]
+    row = '<tr><td class="item"><a href="https://example.com/jobs/1">Senior Engineer</a></td></tr>'
+    html = '<html><body><table>' + row * (html_size // len(row) + 1) + '</table></body></html>'
+    return multipart('multipart/alternative', [text_part('text/plain', text), text_part('text/html', html)])
+
+
+def build_corpora(args):
+    """Payload corpora by name"""
+    nested = alternative(2000, 8000)
+    for level in range(args.depth):
+        nested = multipart('multipart/mixed' if level % 2 else 'multipart/related', [nested])
+
+    report = '\n'.join(f'{i},Software Engineer,Applied,2025-10-{i % 28 + 1:02d}' for i in range(40000))
+    with_attachments = multipart('multipart/mixed', [alternative(2000, 8000)] + [
+        text_part('text/csv' if i % 2 else 'text/plain', report, filename=f'report-{i}.csv')
+        for i in range(3)
+    ])
+
+    return {
+        'simple': [text_part('text/plain', 'Your application was received. ' * 40)] * args.messages,
+        'newsletter': [alternative(50000, args.newsletter_size)] * args.messages,
+        'nested': [nested] * args.messages,
+        'attachments': [with_attachments] * args.messages,
+    }
+
+
+def run(extractor, payloads):
+    """CPU seconds, peak allocated bytes and body characters kept"""
+    started = time.process_time()
+    for payload in payloads:
+        extractor(payload)
+    cpu = time.process_time() - started
+
+    tracemalloc.start()
+    kept = 0
+    for payload in payloads:
+        body = extractor(payload)
+        kept += len(body['text']) + len(body['html'])
+        del body
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=50, help='payloads per corpus')
+    parser.add_argument('--depth', type=int, default=200, help='multipart nesting of the nested corpus')
+    parser.add_argument('--newsletter-size', type=int, default=2000000, help='HTML characters per newsletter')
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from django.conf import settings
+        from gmail.mime import extract_body
+
+        extractors = [('recursive', recursive_extract_body), ('iterative', extract_body)]
+        rows = []
+        for name, payloads in build_corpora(args).items():
+            for extractor_name, extractor in extractors:
+                cpu, peak, kept = run(extractor, payloads)
+                rows.append((
+                    name, extractor_name,
+                    f'{cpu / len(payloads) * 1000:.3f}ms', f'{peak / 2**20:.2f} MiB',
+                    f'{kept / len(payloads) / 1024:.0f} KiB',
+                ))
+
+        print(f'messages={args.messages} depth={args.depth} GMAIL_BODY_MAX_BYTES={settings.GMAIL_BODY_MAX_BYTES}')
+        _django.print_table(['corpus', 'extractor', 'cpu/message', 'peak alloc', 'body kept/message'], rows)
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark page-number vs keyset pagination of the email list
+
+Loads one mailbox and times fetching a 20-row page at increasing depths,
+once with COUNT(*) + OFFSET (Django's Paginator, as list_emails does
+without a cursor) and once with a keyset seek (EmailCursorPagination).
+
+Usage:
+    python -m benchmarks.pagination [--emails 200000] [--pages 1 100 1000 5000] [--repeat 10]
+"""
+import argparse
+import statistics
+import time
+from datetime import timedelta
+
+from benchmarks import _django
+
+PAGE_SIZE = 20
+
+
+def median_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=200_000)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from django.core.paginator import Paginator
+        from django.test import RequestFactory
+        from django.utils import timezone
+        from rest_framework.request import Request
+        from gmail.models import Email
+        from gmail.views import EmailCursorPagination
+
+        user = _django.make_user()
+        now = timezone.now()
+        for start in range(0, args.emails, 10000):
+            Email.objects.bulk_create([
+                Email(
+                    user=user, gmail_id=f'msg{i:09d}', thread_id=f'thr{i:09d}', subject=f'Message {i}',
+                    sender='jobs@example.com', recipient='me@example.com',
+                    received_at=now - timedelta(seconds=i),
+                )
+                for i in range(start, min(start + 10000, args.emails))
+            ])
+        emails = Email.objects.filter(user=user).order_by('-received_at')
+        paginator = EmailCursorPagination()
+
+        rows = []
+        for page in args.pages:
+            if (page - 1) * PAGE_SIZE >= args.emails:
+                continue
+
+            def offset_page():
+                page_obj = Paginator(emails, PAGE_SIZE).get_page(page)
+                list(page_obj)
+
+            # Cursor of the last row of the previous page, as a client would hold it
+            cursor = ''
+            if page > 1:
+                cursor = paginator.encode_cursor(emails[(page - 1) * PAGE_SIZE - 1])
+            request = Request(RequestFactory().get('/api/gmail/', {'cursor': cursor}))
+
+            def keyset_page():
+                paginator.paginate_queryset(emails, request)
+
+            rows.append((
+                page,
+                f'{median_time(offset_page, args.repeat) * 1000:.2f}ms',
+                f'{median_time(keyset_page, args.repeat) * 1000:.2f}ms',
+            ))
+
+        print(f'emails={args.emails} page_size={PAGE_SIZE}')
+        _django.print_table(['page', 'count + offset', 'keyset'], rows)
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark the per-user hot queries without and with their composite indexes
+
+Loads a synthetic dataset (1M emails across 1000 users by default, the
+queried user holding 10% of the mail), drops the indexes declared in
+Email.Meta and Application.Meta, and prints the EXPLAIN plan and median
+latency of each hot query. It then recreates the indexes and prints both
+again.
+
+Usage:
+    python -m benchmarks.query_indexes [--emails 1000000] [--users 1000] [--hot-share 0.1] [--repeat 20]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from benchmarks import _django
+
+
+def load_dataset(emails, users, applications, hot_share):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from applications.models import Application
+    from gmail.models import Email
+
+    rng = random.Random(42)
+    now = timezone.now()
+    categories = [choice for choice, _ in Email.CATEGORY_CHOICES] + [None]
+    statuses = [choice for choice, _ in Application.STATUS_CHOICES]
+
+    User.objects.bulk_create([User(username=f'bench{i}') for i in range(users)])
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+    Application.objects.bulk_create([
+        Application(
+            user_id=user_ids[i % users],
+            company=f'Company {i}',
+            role='Engineer',
+            status=rng.choice(statuses),
+            thread_id=f'app-thread-{i}',
+        )
+        for i in range(applications)
+    ], batch_size=5000)
+    application_ids = list(Application.objects.order_by('id').values_list('id', 'user_id'))
+    applications_by_user = {}
+    for application_id, user_id in application_ids:
+        applications_by_user.setdefault(user_id, []).append(application_id)
+
+    batch = []
+    for i in range(emails):
+        # The benchmarked user is a heavy user holding hot_share of all mail
+        user_id = user_ids[0] if rng.random() < hot_share else user_ids[i % users]
+        # One in five emails belongs to an application
+        application_id = rng.choice(applications_by_user[user_id]) if i % 5 == 0 else None
+        batch.append(Email(
+            user_id=user_id,
+            application_id=application_id,
+            gmail_id=f'msg{i:09d}',
+            thread_id=f'thr{i // 3:09d}',
+            subject=f'Message {i}',
+            sender=f'jobs@example{i % 500}.com',
+            recipient='me@example.com',
+            category=rng.choice(categories),
+            received_at=now - timedelta(seconds=rng.randrange(365 * 86400)),
+        ))
+        if len(batch) == 10000:
+            Email.objects.bulk_create(batch)
+            batch = []
+    Email.objects.bulk_create(batch)
+
+    return user_ids[0], applications_by_user[user_ids[0]][0]
+
+
+def hot_queries(user_id, application_id):
+    from applications.models import Application
+    from gmail.models import Email
+
+    return [
+        ('list_emails', Email.objects.filter(user_id=user_id).order_by('-received_at')[:20]),
+        ('list_emails ?category', Email.objects.filter(
+            user_id=user_id, category='APPLICATION_RESPONSE'
+        ).order_by('-received_at')[:20]),
+        ('applications', Application.objects.filter(user_id=user_id).order_by('-created_at')[:20]),
+        ('applications ?status', Application.objects.filter(
+            user_id=user_id, status='INTERVIEW'
+        ).order_by('-created_at')[:20]),
+        ('application latest email', Email.objects.filter(
+            application_id=application_id
+        ).order_by('-received_at')[:1]),
+        ('thread lookup', Email.objects.filter(thread_id='thr000000100')),
+    ]
+
+
+def set_indexes(enabled):
+    from django.db import connection
+    from applications.models import Application
+    from gmail.models import Email
+
+    with connection.schema_editor() as schema_editor:
+        for model in (Email, Application):
+            for index in model._meta.indexes:
+                if enabled:
+                    schema_editor.add_index(model, index)
+                else:
+                    schema_editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def measure(queries, repeat):
+    rows = []
+    for name, queryset in queries:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter() - started)
+        rows.append((name, f'{statistics.median(timings) * 1000:.2f}ms', queryset.explain()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--applications', type=int, default=100_000)
+    parser.add_argument('--hot-share', type=float, default=0.1, help='fraction of emails owned by the queried user')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        # Load without the indexes, as on a table that predates them
+        set_indexes(False)
+        started = time.perf_counter()
+        user_id, application_id = load_dataset(
+            args.emails, args.users, args.applications, args.hot_share
+        )
+        print(f'loaded {args.emails} emails, {args.applications} applications in '
+              f'{time.perf_counter() - started:.0f}s')
+
+        queries = hot_queries(user_id, application_id)
+        before = measure(queries, args.repeat)
+        set_indexes(True)
+        after = measure(queries, args.repeat)
+
+        for (name, before_time, before_plan), (_, after_time, after_plan) in zip(before, after):
+            print(f'\n== {name}')
+            print(f'-- without indexes ({before_time})\n{before_plan}')
+            print(f'-- with indexes ({after_time})\n{after_plan}')
+
+        print()
+        _django.print_table(
+            ['query', 'without indexes', 'with indexes'],
+            [(b[0], b[1], a[1]) for b, a in zip(before, after)],
+        )
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
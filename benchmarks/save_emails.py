@@ -0,0 +1,108 @@
+"""
+Benchmark per-row vs bulk email persistence
+
+Compares the previous save path (one exists() plus one INSERT per email in a
+single transaction) with GmailService.save_emails_to_db, reporting query
+count and wall-clock time. A second bulk run over the same emails measures
+the cost of deduplicating an already-synced mailbox.
+
+Usage:
+    python -m benchmarks.save_emails [--sizes 1000 10000]
+    BENCH_DATABASE_URL=postgres://... python -m benchmarks.save_emails
+"""
+import argparse
+import time
+
+from benchmarks import _django
+
+
+def make_emails(count):
+    return [
+        {
+            'gmail_id': f'bench{i:08d}',
+            'thread_id': f'thread{i:08d}',
+            'subject': f'Your application #{i}',
+            'sender': f'Recruiter <jobs{i % 50}@example.com>',
+            'sender_email': f'jobs{i % 50}@example.com',
+            'recipient': 'me@example.com',
+            'date': 'Mon, 13 Oct 2025 10:00:00 +0000',
+            'body_text': 'Thanks for applying. ' * 50,
+            'body_html': '<p>Thanks for applying.</p>' * 50,
+            'labels': ['INBOX'],
+            'snippet': 'Thanks for applying.',
+            'has_body': True,
+        }
+        for i in range(count)
+    ]
+
+
+def per_row_save(gmail_service, emails):
+    """The pre-bulk implementation of save_emails_to_db"""
+    from django.db import transaction
+    from gmail.models import Email
+
+    saved_count = 0
+    with transaction.atomic():
+        for email_data in emails:
+            if Email.objects.filter(user=gmail_service.user, gmail_id=email_data['gmail_id']).exists():
+                continue
+            email = gmail_service._build_email(email_data)
+            email.save()
+            gmail_service._build_body(email, email_data).save()
+            saved_count += 1
+    return saved_count
+
+
+def measure(fn):
+    from django.db import connection
+
+    query_count = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal query_count
+        query_count += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        started = time.perf_counter()
+        saved = fn()
+        elapsed = time.perf_counter() - started
+    return saved, query_count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+
+    teardown = _django.setup()
+    try:
+        from django.db import connection
+        from gmail.models import Email
+        from gmail.services import GmailService
+        user = _django.make_user()
+        gmail_service = GmailService(user, service=object())
+
+        rows = []
+        for size in args.sizes:
+            emails = make_emails(size)
+
+            saved, queries, elapsed = measure(lambda: per_row_save(gmail_service, emails))
+            rows.append((size, 'per-row', saved, queries, f'{elapsed:.2f}s'))
+            Email.objects.all().delete()
+
+            saved, queries, elapsed = measure(lambda: gmail_service.save_emails_to_db(emails))
+            rows.append((size, 'bulk', saved, queries, f'{elapsed:.2f}s'))
+
+            saved, queries, elapsed = measure(lambda: gmail_service.save_emails_to_db(emails))
+            rows.append((size, 'bulk (all existing)', saved, queries, f'{elapsed:.2f}s'))
+            Email.objects.all().delete()
+
+        print(f'database={connection.vendor}')
+        _django.print_table(['emails', 'path', 'saved', 'queries', 'time'], rows)
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
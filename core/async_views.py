@@ -0,0 +1,80 @@
+"""
+``@api_view`` for ``async def`` views
+
+DRF 3.14 only runs synchronous views. ``async_api_view`` gives an async
+Django view the parts of ``@api_view`` + ``IsAuthenticated`` our views
+rely on: the request is wrapped in a DRF ``Request`` with the configured
+parsers and authenticators, authentication (and the session CSRF check)
+and body parsing run in a thread, errors go through DRF's exception handler
+and returned ``Response`` objects are rendered as JSON (other responses,
+such as streams, are passed through).
+"""
+from functools import wraps
+from typing import List
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+
+def _initialize_request(request) -> Request:
+    """Wrap, authenticate and parse the request (blocking: ORM, cache, body)"""
+    drf_request = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    if not drf_request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    drf_request.data  # Parse the body now, outside the event loop
+    return drf_request
+
+
+def _handle_exception(exc, request, drf_request):
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # As APIView does: 401 with a challenge when an authenticator offers one
+        authenticator = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+        auth_header = authenticator.authenticate_header(request)
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = 403
+
+    response = exception_handler(exc, {'request': drf_request or request, 'args': (), 'kwargs': {}})
+    if response is None:
+        raise exc
+    return response
+
+
+def _render(response):
+    if not isinstance(response, Response):
+        return response  # e.g. a StreamingHttpResponse
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = JSONRenderer.media_type
+    response.renderer_context = {}
+    return response.render()
+
+
+def async_api_view(http_method_names: List[str]):
+    """Decorate an ``async def`` view taking a DRF Request and returning a DRF Response"""
+    def decorator(func):
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            drf_request = None
+            try:
+                if request.method not in http_method_names:
+                    raise exceptions.MethodNotAllowed(request.method)
+                drf_request = await sync_to_async(_initialize_request)(request)
+                response = await func(drf_request, *args, **kwargs)
+            except Exception as exc:
+                response = _handle_exception(exc, request, drf_request)
+            return _render(response)
+
+        # CSRF is enforced by SessionAuthentication, as in APIView
+        return csrf_exempt(view)
+    return decorator
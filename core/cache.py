@@ -0,0 +1,69 @@
+"""
+Cache helpers shared by the apps
+
+Keys are namespaced as ``<namespace>:<part>:<part>`` so apps sharing the
+Redis cache cannot collide. Groups of entries that must be invalidated
+together (e.g. every cached response of a user) are versioned: the scope
+holds a version token, each entry stores the token it was built under,
+and ``invalidate`` replaces the token instead of deleting the entries,
+which then expire on their own. The token is a nanosecond timestamp, so
+one lost from the cache is replaced by a newer one and never validates an
+old entry again.
+"""
+import time
+from typing import Any, Optional, Tuple
+
+from django.core.cache import cache
+
+
+def make_key(namespace: str, *parts) -> str:
+    """Build the cache key for ``parts`` within ``namespace``"""
+    return ':'.join([namespace, *map(str, parts)])
+
+
+def _version_key(namespace: str, scope) -> str:
+    return make_key(namespace, scope, 'version')
+
+
+def _new_version() -> str:
+    return str(time.time_ns())
+
+
+def get_version(namespace: str, scope) -> str:
+    """Return the scope's current version token, creating one if missing"""
+    key = _version_key(namespace, scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(namespace: str, scope):
+    """Invalidate every versioned entry of the scope at once"""
+    cache.set(_version_key(namespace, scope), _new_version(), None)
+
+
+def get_versioned(namespace: str, scope, *parts) -> Tuple[str, Optional[Any]]:
+    """
+    Read a versioned entry together with the scope's version
+
+    Both are fetched with one cache round trip.
+
+    Returns:
+        (current version, cached value or None when missing or stale)
+    """
+    version_key = _version_key(namespace, scope)
+    key = make_key(namespace, scope, *parts)
+    cached = cache.get_many([version_key, key])
+
+    version = cached.get(version_key) or get_version(namespace, scope)
+    entry = cached.get(key)
+    if entry is None or entry[0] != version:
+        return version, None
+    return version, entry[1]
+
+
+def set_versioned(namespace: str, scope, *parts, value, version: str, timeout: int):
+    """Store ``value`` as built under ``version`` of the scope"""
+    cache.set(make_key(namespace, scope, *parts), (version, value), timeout)
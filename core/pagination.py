@@ -0,0 +1,127 @@
+"""
+Keyset (cursor) pagination
+
+Pages are addressed by an opaque cursor holding the sort key and id of the
+last row served, and the next page is fetched with an index-backed seek
+(``key <= last AND NOT (key = last AND id >= last_id)``) instead of an
+OFFSET, so every page costs the same however deep it is. Counting is
+opt-in through the ``count`` query param: ``exact`` runs COUNT(*),
+``approximate`` uses the planner's row estimate on PostgreSQL.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset) -> int:
+    """Estimated row count from the query plan, exact count off PostgreSQL"""
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over ``(ordering field, id)``
+
+    Results are always ordered by ``ordering`` (a descending datetime field
+    by default) with the primary key breaking ties, so the queryset should
+    have an index starting with its filter columns and that field.
+    """
+    ordering = '-created_at'
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            value, pk = cursor
+            if descending:
+                queryset = queryset.filter(**{f'{field}__lte': value}).exclude(**{field: value, 'pk__gte': pk})
+            else:
+                queryset = queryset.filter(**{f'{field}__gte': value}).exclude(**{field: value, 'pk__lte': pk})
+
+        queryset = queryset.order_by(self.ordering, '-pk' if descending else 'pk')
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approximate':
+            return approximate_count(queryset)
+        return None
+
+    def encode_cursor(self, instance) -> str:
+        value = getattr(instance, self.ordering.lstrip('-'))
+        payload = json.dumps([value.isoformat(), instance.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        """Return (sort value, pk) from the cursor param, or None for the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            value, pk = json.loads(payload)
+            value = parse_datetime(value)
+            if value is None or not isinstance(pk, int):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        return value, pk
+
+    def get_next_cursor(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.get_next_cursor()),
+            ('results', data),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    @classmethod
+    def is_requested(cls, request) -> bool:
+        """Cursor mode is chosen by passing ``cursor`` (empty for the first page)"""
+        return cls.cursor_query_param in request.query_params
@@ -0,0 +1,39 @@
+"""
+Shared Redis helpers
+"""
+from contextlib import contextmanager
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis_client() -> redis.Redis:
+    """Return a process-wide Redis client for REDIS_URL"""
+    redis_url = settings.CELERY_BROKER_URL
+    # Handle SSL for Heroku Redis
+    if redis_url.startswith('rediss://'):
+        return redis.from_url(redis_url, ssl_cert_reqs=None)
+    return redis.from_url(redis_url)
+
+
+@contextmanager
+def single_flight(key: str, timeout: int):
+    """
+    Hold a non-blocking distributed lock for the duration of the block
+
+    Yields True when the lock was acquired and False when another process
+    already holds it. The lock expires after ``timeout`` seconds so a crashed
+    holder cannot block the key forever.
+    """
+    lock = get_redis_client().lock(key, timeout=timeout, blocking=False)
+    acquired = lock.acquire()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except redis.exceptions.LockError:
+                pass  # Lock expired while we were still working
@@ -0,0 +1,82 @@
+"""
+Search for emails and applications
+
+On PostgreSQL, emails are matched against the trigger-maintained
+``Email.search_vector`` (GIN indexed), ranked, and returned with a
+highlighted snippet. Applications are matched on company/role with
+substring and trigram similarity lookups served by pg_trgm GIN indexes.
+Other databases (SQLite in local development) fall back to plain
+case-insensitive substring filters.
+
+Matching querysets are annotated with ``search_rank`` and, for emails,
+``search_highlight`` when the database supports them.
+"""
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, Q, QuerySet, Value
+from django.db.models.functions import Coalesce, Greatest, NullIf
+
+SEARCH_CONFIG = 'english'
+
+
+def supports_full_text_search(queryset: QuerySet) -> bool:
+    """Check whether the queryset's database is PostgreSQL"""
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_emails(queryset: QuerySet, search: str) -> QuerySet:
+    """
+    Filter emails matching ``search``, best matches first
+
+    Args:
+        queryset: Email queryset to search within
+        search: User input, parsed like a web search ("quoted phrases", -excluded)
+
+    Returns:
+        Ordered queryset
+    """
+    if not supports_full_text_search(queryset):
+        return queryset.filter(
+            Q(subject__icontains=search) |
+            Q(sender__icontains=search)
+        ).order_by('-received_at')
+
+    query = SearchQuery(search, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query),
+        search_highlight=SearchHeadline(
+            # Emails synced in metadata format only have a snippet
+            Coalesce(NullIf(F('body__plain'), Value('')), F('snippet')),
+            query,
+            config=SEARCH_CONFIG,
+            start_sel='<mark>',
+            stop_sel='</mark>',
+            max_fragments=2,
+        )
+    ).order_by('-search_rank', '-received_at')
+
+
+def search_applications(queryset: QuerySet, search: str) -> QuerySet:
+    """
+    Filter applications whose company or role matches ``search``
+
+    On PostgreSQL, near-misses such as typos also match through trigram
+    similarity, and results are ordered by similarity.
+
+    Returns:
+        Ordered queryset
+    """
+    matches = Q(company__icontains=search) | Q(role__icontains=search)
+    if not supports_full_text_search(queryset):
+        return queryset.filter(matches).order_by('-created_at')
+
+    return queryset.filter(
+        matches |
+        Q(company__trigram_similar=search) |
+        Q(role__trigram_similar=search)
+    ).annotate(
+        search_rank=Greatest(
+            TrigramSimilarity('company', search),
+            TrigramSimilarity('role', search)
+        )
+    ).order_by('-search_rank', '-created_at')
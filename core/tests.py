@@ -1,7 +1,20 @@
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import redis
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
 import json
 
+from applications.models import Application
+from core.cache import get_versioned, invalidate, set_versioned
+from gmail.models import Email, EmailBody
+
 
 class SmokeTestCase(TestCase):
     """Basic smoke tests to ensure the API is running correctly"""
@@ -37,6 +50,16 @@ class SmokeTestCase(TestCase):
         self.assertIn('components', data)
         self.assertIn('timestamp', data)
     
+    def test_detailed_health_check_survives_counter_errors(self):
+        """Test that unreadable Gmail quota counters degrade the check instead of failing it"""
+        with mock.patch('core.views.get_quota_counters',
+                        side_effect=redis.exceptions.ConnectionError('Connection refused')):
+            response = self.client.get(reverse('core:health-detailed'))
+        self.assertEqual(response.status_code, 503)
+        data = json.loads(response.content)
+        self.assertEqual(data['components']['gmail_quota']['status'], 'unhealthy')
+        self.assertNotEqual(data['status'], 'healthy')
+    
     def test_status_endpoint(self):
         """Test API status endpoint"""
         response = self.client.get(reverse('core:status'))
@@ -58,3 +81,76 @@ class SmokeTestCase(TestCase):
         """Test that 404 errors return JSON in production"""
         response = self.client.get('/api/nonexistent/')
         self.assertEqual(response.status_code, 404)
+
+
+class SearchTestCase(TestCase):
+    """Tests for email and application search"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        for i, (subject, body) in enumerate([
+            ('Interview invitation', 'We would like to schedule an interview for the backend role.'),
+            ('Weekly newsletter', 'Top stories this week.'),
+            ('Your application', 'Thanks for applying, an interview is not yet scheduled.'),
+        ]):
+            email = Email.objects.create(
+                user=self.user,
+                gmail_id=f'msg{i}',
+                thread_id=f'thr{i}',
+                subject=subject,
+                sender=f'jobs@example{i}.com',
+                recipient='tester@example.com',
+                received_at=timezone.now() - timedelta(days=i),
+            )
+            EmailBody.build(email, body, '').save()
+        Application.objects.create(user=self.user, company='Anthropic', role='Engineer', thread_id='a1')
+        Application.objects.create(user=self.user, company='Acme', role='Designer', thread_id='a2')
+        self.client.force_login(self.user)
+
+    def test_email_search(self):
+        """Test that email search finds matching subjects"""
+        response = self.client.get('/api/gmail/', {'search': 'interview'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['subject'], 'Interview invitation')
+
+    def test_application_search(self):
+        """Test that application search matches company names"""
+        response = self.client.get('/api/apps/', {'search': 'acme'})
+
+        self.assertEqual([a['company'] for a in response.json()['results']], ['Acme'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires PostgreSQL')
+    def test_ranked_search_with_highlights(self):
+        """Test that bodies are searched, ranked and highlighted, and typos still match companies"""
+        results = self.client.get('/api/gmail/', {'search': 'interview scheduled'}).json()['results']
+
+        self.assertEqual([r['subject'] for r in results], ['Interview invitation', 'Your application'])
+        self.assertIn('<mark>', results[0]['highlight'])
+
+        # 'backend' only appears in a body
+        results = self.client.get('/api/gmail/', {'search': 'backend'}).json()['results']
+        self.assertEqual([r['subject'] for r in results], ['Interview invitation'])
+
+        response = self.client.get('/api/apps/', {'search': 'Antrhopic'})
+        self.assertEqual([a['company'] for a in response.json()['results']], ['Anthropic'])
+
+
+class VersionedCacheTestCase(TestCase):
+    """Tests for versioned invalidation in core.cache"""
+
+    def test_invalidate_drops_every_entry_of_the_scope(self):
+        cache.clear()
+        version, value = get_versioned('test', 1, 'a')
+        self.assertIsNone(value)
+        set_versioned('test', 1, 'a', value='A', version=version, timeout=60)
+        set_versioned('test', 2, 'a', value='B', version=get_versioned('test', 2, 'a')[0], timeout=60)
+        self.assertEqual(get_versioned('test', 1, 'a'), (version, 'A'))
+
+        invalidate('test', 1)
+
+        new_version, value = get_versioned('test', 1, 'a')
+        self.assertIsNone(value)
+        self.assertGreater(int(new_version), int(version))
+        self.assertEqual(get_versioned('test', 2, 'a')[1], 'B')
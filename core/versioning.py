@@ -0,0 +1,80 @@
+"""
+Per-user change versions and conditional, cached list responses
+
+Every user has a version token (a versioned ``core.cache`` scope) that
+changes whenever one of their emails or applications is written. Model
+saves and deletes bump it through signals; bulk writes (``bulk_create``,
+``QuerySet.update``) bypass signals and call ``bump_user_version``
+themselves.
+
+``cached_user_response`` uses the token twice: as the ETag / Last-Modified
+of a response, answering a matching ``If-None-Match`` with 304, and to
+validate a cached copy of the serialized response. Both the token and the
+cached copy are read with a single cache lookup.
+"""
+import hashlib
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from core.cache import get_versioned, invalidate, set_versioned
+
+NAMESPACE = 'user-data'
+
+
+def bump_user_version(user_id: int):
+    """
+    Mark the user's emails/applications as changed
+
+    Runs once the current transaction commits, so a request that reads the
+    new token also reads the committed rows.
+    """
+    transaction.on_commit(lambda: invalidate(NAMESPACE, user_id))
+
+
+def _bump_for_instance(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+
+def track_user_changes(model):
+    """Bump the owner's version on every save/delete of ``model`` (needs a ``user`` FK)"""
+    post_save.connect(_bump_for_instance, sender=model, dispatch_uid=f'track_user_changes:{model._meta.label}')
+    post_delete.connect(_bump_for_instance, sender=model, dispatch_uid=f'track_user_changes:{model._meta.label}')
+
+
+def cached_user_response(request, build: Callable[[], Any]):
+    """
+    Serve a per-user GET response conditionally and from cache
+
+    Args:
+        request: Authenticated GET request
+        build: Returns the response data; only called on a cache miss
+
+    Returns:
+        304 when the client's ``If-None-Match``/``If-Modified-Since``
+        matches the user's version, otherwise a 200 Response
+    """
+    user_id = request.user.pk
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    version, data = get_versioned(NAMESPACE, user_id, 'response', path)
+    etag = f'W/"{version}"'
+    last_modified = int(version) // 10**9
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if data is None:
+            data = build()
+            set_versioned(NAMESPACE, user_id, 'response', path,
+                          value=data, version=version, timeout=settings.RESPONSE_CACHE_TTL)
+        response = Response(data)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Let browsers keep the response but revalidate it on every poll
+    response['Cache-Control'] = 'private, no-cache'
+    return response
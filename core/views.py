@@ -3,9 +3,11 @@ from django.views import View
 from django.db import connection
 from django.core.cache import cache
 from django.utils import timezone
-import redis
 from django.conf import settings
 
+from core.redis import get_redis_client
+from gmail.quota import get_quota_counters
+
 
 class HealthCheckView(View):
     """Basic health check endpoint"""
@@ -46,13 +48,7 @@ class DetailedHealthCheckView(View):
         
         # Check Redis
         try:
-            redis_url = settings.CELERY_BROKER_URL
-            # Handle SSL for Heroku Redis
-            if redis_url.startswith('rediss://'):
-                redis_client = redis.from_url(redis_url, ssl_cert_reqs=None)
-            else:
-                redis_client = redis.from_url(redis_url)
-            redis_client.ping()
+            get_redis_client().ping()
             health_status['components']['redis'] = {
                 'status': 'healthy',
                 'type': 'redis'
@@ -64,6 +60,20 @@ class DetailedHealthCheckView(View):
             }
             health_status['status'] = 'degraded'
         
+        # Gmail calls throttled by our quota buckets or retried after 429/5xx
+        try:
+            health_status['components']['gmail_quota'] = {
+                'status': 'healthy',
+                'counters': get_quota_counters()
+            }
+        except Exception as e:
+            health_status['components']['gmail_quota'] = {
+                'status': 'unhealthy',
+                'error': str(e)
+            }
+            if health_status['status'] == 'healthy':
+                health_status['status'] = 'degraded'
+        
         # Return appropriate status code
         status_code = 200 if health_status['status'] == 'healthy' else 503
         return JsonResponse(health_status, status=status_code)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class GmailConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gmail'
+    
+    def ready(self):
+        from core.versioning import track_user_changes
+        from gmail.models import Email
+        track_user_changes(Email)
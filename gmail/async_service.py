@@ -0,0 +1,93 @@
+"""
+Async driver for GmailService, used by the ASGI views
+
+googleapiclient is blocking, so each Gmail call still runs in a thread, but
+the event loop only awaits it: a request waiting on Google holds no worker.
+Message details are fetched one batch request per thread, several batches
+at a time (bounded by GMAIL_ASYNC_CONCURRENCY per request). Database access
+runs through ``sync_to_async`` on the request's thread-sensitive executor.
+"""
+import asyncio
+import copy
+import logging
+from typing import Callable, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from gmail.models import Email
+from gmail.services import GmailService, chunked, get_batch_size
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncGmailService:
+    """Concurrent, non-blocking counterpart of GmailService's body hydration"""
+
+    def __init__(self, gmail_service: GmailService, service_factory: Optional[Callable] = None,
+                 concurrency: Optional[int] = None):
+        """
+        Args:
+            gmail_service: Service for the user; its client is used for
+                listing, other calls get their own clients
+            service_factory: Builds a Gmail client per concurrent call
+                (defaults to ``gmail_service.build_service``)
+            concurrency: Gmail calls in flight at once (defaults to
+                GMAIL_ASYNC_CONCURRENCY)
+        """
+        self.gmail_service = gmail_service
+        self.service_factory = service_factory or gmail_service.build_service
+        self.semaphore = asyncio.Semaphore(concurrency or settings.GMAIL_ASYNC_CONCURRENCY)
+
+    @classmethod
+    async def for_user(cls, user) -> 'AsyncGmailService':
+        # Construction may refresh tokens (DB + Google)
+        return cls(await sync_to_async(GmailService)(user))
+
+    def _fetch_chunk(self, message_ids: List[str], batch_size: int, message_format: str,
+                     filter_domains: bool) -> List[Dict]:
+        """Fetch one batch with a client of its own (runs in a worker thread)"""
+        worker = copy.copy(self.gmail_service)
+        worker.service = self.service_factory()
+        if batch_size > 1:
+            return worker._fetch_email_details_batch(message_ids, batch_size, message_format, filter_domains)
+        email_data = worker._fetch_email_details(message_ids[0], message_format, filter_domains)
+        return [email_data] if email_data else []
+
+    async def _fetch_chunk_async(self, message_ids: List[str], batch_size: int, message_format: str,
+                                 filter_domains: bool) -> List[Dict]:
+        async with self.semaphore:
+            return await sync_to_async(self._fetch_chunk, thread_sensitive=False)(
+                message_ids, batch_size, message_format, filter_domains
+            )
+
+    async def fetch_email_details(self, message_ids: List[str], batch_size: Optional[int] = None,
+                                  message_format: Optional[str] = None,
+                                  filter_domains: bool = True) -> List[Dict]:
+        """
+        Fetch and parse details for ``message_ids`` with concurrent batch requests
+
+        Returns:
+            Email dictionaries in the order of ``message_ids``; messages that
+            failed or were filtered out are left out
+        """
+        batch_size = get_batch_size(batch_size)
+        message_format = message_format or settings.GMAIL_SYNC_FORMAT
+        if filter_domains:
+            # Load the matcher (cache/DB) here so worker copies share it
+            await sync_to_async(lambda: self.gmail_service.domain_matcher)()
+
+        results = await asyncio.gather(*(
+            self._fetch_chunk_async(chunk, batch_size, message_format, filter_domains)
+            for chunk in chunked(message_ids, batch_size)
+        ))
+        return [email_data for chunk in results for email_data in chunk]
+
+    async def hydrate_emails(self, emails: List[Email], batch_size: Optional[int] = None) -> int:
+        """Download and store bodies for emails synced in metadata format"""
+        pending = {email.gmail_id: email for email in emails if email.body_fetched_at is None}
+        if not pending:
+            return 0
+
+        emails_data = await self.fetch_email_details(list(pending), batch_size, 'full', filter_domains=False)
+        return await sync_to_async(self.gmail_service.save_bodies)(pending, emails_data)
@@ -0,0 +1,108 @@
+"""
+Async Gmail API views, routed instead of gmail.views when ASGI_MODE is on
+
+Same requests and responses as the views in gmail.views, plus the sync job
+event stream, which is only served here. Waiting on Google
+(and on sync job progress) happens on the event loop, with message details
+fetched by concurrent batch requests (see gmail.async_service), so a slow
+Gmail call or an open event stream does not hold a worker process. ORM work
+runs through ``sync_to_async``.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.response import Response
+
+from core.async_views import async_api_view
+from gmail.async_service import AsyncGmailService
+from gmail.models import Email, SyncJob
+from gmail.serializers import EmailSerializer
+from gmail.sync_jobs import SyncJobEvents, start_sync_job
+from gmail.views import create_application, get_fetch_params, sync_job_response, update_email
+
+logger = logging.getLogger(__name__)
+
+
+async def _get_email(request, email_id, *related) -> Email:
+    email = await Email.objects.select_related(*related).filter(id=email_id, user=request.user).afirst()
+    if email is None:
+        raise Http404
+    return email
+
+
+@async_api_view(['POST'])
+async def fetch_emails(request):
+    """Queue a sync of recent emails from Gmail (see gmail.views.fetch_emails)"""
+    params, error = await sync_to_async(get_fetch_params)(request)
+    if error:
+        return error
+
+    job, created = await sync_to_async(start_sync_job)(request.user, params)
+    return sync_job_response(job, created)
+
+
+@async_api_view(['GET'])
+async def sync_job_events(request, job_id):
+    """
+    Stream a sync job's progress and newly ingested emails as Server-Sent Events
+
+    Sends ``progress`` events with the job counts, an ``email`` event per
+    email saved since the job was queued and a final ``done`` event. Send
+    ``Last-Event-ID`` when reconnecting to skip emails already received.
+
+    Only routed when ASGI_MODE is on: the stream waits between polls on the
+    event loop, whereas on WSGI it would hold a sync worker for the whole
+    stream. WSGI clients poll /api/gmail/sync-jobs/<id>/ instead.
+    """
+    job = await SyncJob.objects.filter(id=job_id, user=request.user).afirst()
+    if job is None:
+        raise Http404
+    events = SyncJobEvents(job, last_email_id=get_last_event_id(request))
+    return event_stream_response(events.astream())
+
+
+def get_last_event_id(request) -> int:
+    try:
+        return int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        return 0
+
+
+def event_stream_response(stream) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+
+@async_api_view(['GET', 'PATCH'])
+async def email_detail(request, email_id):
+    """Get or update a specific email"""
+    email = await _get_email(request, email_id, 'application', 'body')
+
+    if request.method == 'GET':
+        # Emails synced in metadata format get their body on first read
+        if email.body_fetched_at is None:
+            try:
+                gmail_service = await AsyncGmailService.for_user(request.user)
+                await gmail_service.hydrate_emails([email])
+            except Exception:
+                logger.exception('Failed to fetch body for email %s', email.id)
+
+        # The nested application serializer may query
+        data = await sync_to_async(lambda: EmailSerializer(email).data)()
+        return Response(data)
+
+    return await sync_to_async(update_email)(request, email)
+
+
+@async_api_view(['POST'])
+async def create_application_from_email(request, email_id):
+    """
+    Create a job application from an email
+
+    Its Gmail label change goes through the outbox, so this is database work only.
+    """
+    email = await _get_email(request, email_id)
+    return await sync_to_async(create_application)(request, email)
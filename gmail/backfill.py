@@ -0,0 +1,211 @@
+"""
+Historical Gmail import (``manage.py backfill_gmail``)
+
+The requested range is split into BackfillWindow rows of
+GMAIL_BACKFILL_WINDOW_DAYS each, aligned to a fixed grid so re-running a
+backfill reuses finished windows. Windows are fetched in parallel, by the
+command's thread pool or by ``gmail.tasks.backfill_window`` tasks. Each one
+lists its date range page by page and saves every page with GmailService's
+batched fetch, parsing and bulk save. After each page the window stores the
+next page token, so an interrupted import resumes where it stopped.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from gmail.models import BackfillWindow
+from gmail.services import GmailService
+
+logger = logging.getLogger(__name__)
+
+WINDOW_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def plan_backfill(user, days: int, window_days: Optional[int] = None,
+                  now: Optional[datetime] = None) -> List[BackfillWindow]:
+    """
+    Create the windows covering the last ``days`` days, reusing existing ones
+
+    Returns:
+        The windows that are not done yet, newest first
+    """
+    window = timedelta(days=window_days or settings.GMAIL_BACKFILL_WINDOW_DAYS)
+    now = now or timezone.now()
+    first_start = WINDOW_EPOCH + ((now - timedelta(days=days) - WINDOW_EPOCH) // window) * window
+
+    windows = []
+    start = first_start
+    while start < now:
+        windows.append(BackfillWindow(user=user, start=start, end=start + window))
+        start += window
+    BackfillWindow.objects.bulk_create(windows, ignore_conflicts=True)
+
+    return list(
+        BackfillWindow.objects
+        .filter(user=user, start__in=[w.start for w in windows], end__in=[w.end for w in windows])
+        .exclude(status='DONE')
+        .order_by('-start')
+    )
+
+
+def claim_window(window_id: int) -> Optional[BackfillWindow]:
+    """
+    Mark a window RUNNING for this worker
+
+    Windows already done, or running elsewhere and checkpointed within the
+    last GMAIL_BACKFILL_STALE_AFTER seconds, are not claimed.
+
+    Returns:
+        The claimed window, or None
+    """
+    now = timezone.now()
+    claimable = Q(status__in=['PENDING', 'FAILED']) | Q(
+        status='RUNNING',
+        updated_at__lt=now - timedelta(seconds=settings.GMAIL_BACKFILL_STALE_AFTER)
+    )
+    claimed = BackfillWindow.objects.filter(claimable, pk=window_id).update(
+        status='RUNNING', error=None, started_at=Coalesce(F('started_at'), Value(now)), updated_at=now
+    )
+    if not claimed:
+        return None
+    return BackfillWindow.objects.select_related('user__google_account').get(pk=window_id)
+
+
+def run_window(window: BackfillWindow, message_format: Optional[str] = None,
+               batch_size: Optional[int] = None) -> Dict:
+    """
+    Import a claimed window, resuming from its page token
+
+    Returns:
+        Dictionary with the window's status and the fetched/saved counts and
+        seconds of this run
+    """
+    started = time.monotonic()
+    counts = {'fetched': 0, 'saved': 0}
+
+    def count_fetched(emails):
+        for email_data in emails:
+            counts['fetched'] += 1
+            yield email_data
+
+    try:
+        gmail_service = GmailService(window.user)
+        query = gmail_service._build_query(after=window.start, before=window.end)
+        page_token = window.page_token or None
+
+        while True:
+            message_ids, page_token = gmail_service.list_message_page(query, page_token)
+            fetched = counts['fetched']
+            saved = gmail_service.save_emails_to_db(count_fetched(
+                gmail_service._iter_email_details(message_ids, batch_size, message_format)
+            ))
+            counts['saved'] += saved
+
+            # Checkpoint: a restart continues with the next page
+            BackfillWindow.objects.filter(pk=window.pk).update(
+                page_token=page_token or '',
+                fetched=F('fetched') + counts['fetched'] - fetched,
+                saved=F('saved') + saved,
+                updated_at=timezone.now()
+            )
+            if not page_token:
+                break
+    except Exception as e:
+        logger.exception('Backfill of %s for user %s failed', window, window.user_id)
+        BackfillWindow.objects.filter(pk=window.pk).update(
+            status='FAILED', error=str(e), updated_at=timezone.now()
+        )
+        status = 'FAILED'
+    else:
+        now = timezone.now()
+        BackfillWindow.objects.filter(pk=window.pk).update(status='DONE', finished_at=now, updated_at=now)
+        status = 'DONE'
+
+    return {'status': status, **counts, 'seconds': time.monotonic() - started}
+
+
+def run_backfill(windows: List[BackfillWindow], workers: Optional[int] = None,
+                 message_format: Optional[str] = None,
+                 on_window_done: Optional[Callable[[BackfillWindow, Dict], None]] = None) -> Dict:
+    """
+    Import ``windows`` on a pool of ``workers`` threads
+
+    Gmail calls spend most of their time waiting on the network, so threads
+    overlap them well; the shared quota buckets keep the pool within the
+    user's Gmail quota.
+
+    Returns:
+        Totals of this run: windows run and failed, fetched and saved
+        messages, seconds and messages per second
+    """
+    workers = workers or settings.GMAIL_BACKFILL_WORKERS
+
+    def run(window_id):
+        window = claim_window(window_id)
+        if window is None:
+            return None, None  # Done or running elsewhere
+        result = run_window(window, message_format)
+        if on_window_done:
+            on_window_done(window, result)
+        return window, result
+
+    def run_in_thread(window_id):
+        try:
+            return run(window_id)
+        finally:
+            connections.close_all()  # Connections are per thread
+
+    started = time.monotonic()
+    window_ids = [window.pk for window in windows]
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(run_in_thread, window_ids))
+    else:
+        results = [run(window_id) for window_id in window_ids]
+    seconds = time.monotonic() - started
+
+    results = [result for _, result in results if result is not None]
+    fetched = sum(result['fetched'] for result in results)
+    return {
+        'windows': len(results),
+        'failed': sum(1 for result in results if result['status'] == 'FAILED'),
+        'fetched': fetched,
+        'saved': sum(result['saved'] for result in results),
+        'seconds': seconds,
+        'messages_per_second': fetched / seconds if seconds else 0.0,
+    }
+
+
+def get_backfill_summary(user) -> Dict:
+    """
+    Progress of a user's backfill across all windows and runs
+
+    ``messages_per_second`` spans the first window start to the last window
+    finish, so it includes time spent queued.
+    """
+    windows = BackfillWindow.objects.filter(user=user)
+    summary = windows.aggregate(
+        fetched=Sum('fetched'),
+        saved=Sum('saved'),
+        first_started_at=Min('started_at'),
+        last_finished_at=Max('finished_at'),
+    )
+    by_status = dict(windows.order_by().values_list('status').annotate(count=Count('pk')))
+    fetched = summary['fetched'] or 0
+    elapsed = None
+    if summary['first_started_at'] and summary['last_finished_at']:
+        elapsed = (summary['last_finished_at'] - summary['first_started_at']).total_seconds()
+    return {
+        'windows': {status: by_status.get(status, 0) for status, _ in BackfillWindow.STATUS_CHOICES},
+        'fetched': fetched,
+        'saved': summary['saved'] or 0,
+        'messages_per_second': fetched / elapsed if elapsed else None,
+    }
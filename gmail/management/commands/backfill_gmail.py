@@ -0,0 +1,78 @@
+"""
+Import a user's Gmail history: manage.py backfill_gmail <username or email>
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from gmail import backfill
+from gmail.tasks import backfill_account
+
+
+class Command(BaseCommand):
+    help = (
+        'Import the last --days days of job-related mail for a user, in date windows fetched in parallel. '
+        'Progress is checkpointed per window, so re-running after a crash resumes where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Username or email of the account owner')
+        parser.add_argument('--days', type=int, default=settings.GMAIL_BACKFILL_DAYS)
+        parser.add_argument('--window-days', type=int, default=settings.GMAIL_BACKFILL_WINDOW_DAYS)
+        parser.add_argument('--workers', type=int, default=settings.GMAIL_BACKFILL_WORKERS,
+                            help='windows imported at once')
+        parser.add_argument('--format', choices=['metadata', 'full'], default=None,
+                            help='message format (default GMAIL_SYNC_FORMAT)')
+        parser.add_argument('--queue', action='store_true',
+                            help='run the windows as Celery tasks instead of in this process')
+        parser.add_argument('--status', action='store_true', help='only report progress')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            Q(username=options['user']) | Q(email=options['user'])
+        ).select_related('google_account').first()
+        if user is None:
+            raise CommandError(f"No user {options['user']}")
+        if not hasattr(user, 'google_account'):
+            raise CommandError(f'{user} has no Google account connected')
+
+        if options['status']:
+            self.write_summary(backfill.get_backfill_summary(user))
+            return
+
+        if options['queue']:
+            result = backfill_account.delay(user.pk, options['days'], options['window_days'], options['format'])
+            self.stdout.write(f'Queued backfill task {result.id}; follow it with --status')
+            return
+
+        windows = backfill.plan_backfill(user, options['days'], options['window_days'])
+        if not windows:
+            self.stdout.write('Nothing to do: every window is already imported')
+            return
+        self.stdout.write(f"Importing {len(windows)} windows with {options['workers']} workers")
+
+        def report(window, result):
+            style = self.style.SUCCESS if result['status'] == 'DONE' else self.style.ERROR
+            rate = result['fetched'] / result['seconds'] if result['seconds'] else 0.0
+            self.stdout.write(style(
+                f"{window.start:%Y-%m-%d}..{window.end:%Y-%m-%d} {result['status']}: "
+                f"fetched {result['fetched']}, saved {result['saved']} in {result['seconds']:.1f}s "
+                f"({rate:.1f} messages/s)"
+            ))
+
+        totals = backfill.run_backfill(windows, options['workers'], options['format'], on_window_done=report)
+        self.stdout.write(
+            f"Fetched {totals['fetched']} messages ({totals['saved']} new) from {totals['windows']} windows "
+            f"in {totals['seconds']:.1f}s: {totals['messages_per_second']:.1f} messages/s"
+        )
+        if totals['failed']:
+            raise CommandError(f"{totals['failed']} windows failed; run the command again to resume them")
+
+    def write_summary(self, summary):
+        windows = ', '.join(f'{count} {status.lower()}' for status, count in summary['windows'].items())
+        rate = summary['messages_per_second']
+        self.stdout.write(
+            f"Windows: {windows}. Fetched {summary['fetched']} messages ({summary['saved']} new)"
+            + (f', {rate:.1f} messages/s' if rate else '')
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:36
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_emails_hydrated(apps, schema_editor):
+    """Emails synced before metadata-only sync already have their bodies"""
+    Email = apps.get_model('gmail', 'Email')
+    Email.objects.update(body_fetched_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gmail', '0004_gmailoperation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='email',
+            name='body_fetched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='email',
+            name='snippet',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(mark_existing_emails_hydrated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0002_application_indexes'),
+        ('gmail', '0005_email_snippet_body_fetched_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['user', '-received_at'], name='email_user_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['user', 'category', '-received_at'], name='email_user_cat_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['application', '-received_at'], name='email_app_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['thread_id'], name='email_thread_idx'),
+        ),
+    ]
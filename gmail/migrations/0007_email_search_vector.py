@@ -0,0 +1,59 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:48
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Subject weighs most, then sender, then the body (or the snippet for emails
+# whose body has not been fetched yet). Bodies are truncated to stay well
+# inside the tsvector size limit.
+CREATE_SEARCH_TRIGGER = """
+CREATE OR REPLACE FUNCTION gmail_email_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.subject, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sender, '')), 'B') ||
+        setweight(to_tsvector('english', left(coalesce(nullif(NEW.body_plain, ''), NEW.snippet, ''), 100000)), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER gmail_email_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF subject, sender, body_plain, snippet ON gmail_email
+    FOR EACH ROW EXECUTE FUNCTION gmail_email_search_vector_update();
+
+UPDATE gmail_email SET subject = subject;
+
+CREATE INDEX email_search_vector_idx ON gmail_email USING GIN (search_vector);
+"""
+
+DROP_SEARCH_TRIGGER = """
+DROP INDEX IF EXISTS email_search_vector_idx;
+DROP TRIGGER IF EXISTS gmail_email_search_vector_trigger ON gmail_email;
+DROP FUNCTION IF EXISTS gmail_email_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gmail', '0006_email_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='email',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:53
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The email trigger now reads the body from gmail_emailbody; body writes
+# touch the email row so its search vector is recomputed.
+MOVE_SEARCH_TRIGGER = """
+CREATE OR REPLACE FUNCTION gmail_email_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.subject, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sender, '')), 'B') ||
+        setweight(to_tsvector('english', left(coalesce(
+            nullif((SELECT plain FROM gmail_emailbody WHERE email_id = NEW.id), ''),
+            NEW.snippet, ''), 100000)), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER gmail_email_search_vector_trigger ON gmail_email;
+CREATE TRIGGER gmail_email_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF subject, sender, snippet ON gmail_email
+    FOR EACH ROW EXECUTE FUNCTION gmail_email_search_vector_update();
+
+CREATE OR REPLACE FUNCTION gmail_emailbody_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE gmail_email SET subject = subject WHERE id = NEW.email_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER gmail_emailbody_search_vector_trigger
+    AFTER INSERT OR UPDATE OF plain ON gmail_emailbody
+    FOR EACH ROW EXECUTE FUNCTION gmail_emailbody_search_vector_update();
+"""
+
+RESTORE_SEARCH_TRIGGER = """
+DROP TRIGGER IF EXISTS gmail_emailbody_search_vector_trigger ON gmail_emailbody;
+DROP FUNCTION IF EXISTS gmail_emailbody_search_vector_update();
+
+CREATE OR REPLACE FUNCTION gmail_email_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.subject, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.sender, '')), 'B') ||
+        setweight(to_tsvector('english', left(coalesce(nullif(NEW.body_plain, ''), NEW.snippet, ''), 100000)), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER gmail_email_search_vector_trigger ON gmail_email;
+CREATE TRIGGER gmail_email_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF subject, sender, body_plain, snippet ON gmail_email
+    FOR EACH ROW EXECUTE FUNCTION gmail_email_search_vector_update();
+"""
+
+BATCH_SIZE = 2000
+
+# Fixed rather than EMAIL_BODY_COMPRESSION so the result does not depend on
+# the environment at migrate time; each row records its codec for readers.
+COMPRESSION = 'zlib'
+
+
+def copy_bodies(apps, schema_editor):
+    """Move bodies of hydrated emails into EmailBody rows"""
+    Email = apps.get_model('gmail', 'Email')
+    EmailBody = apps.get_model('gmail', 'EmailBody')
+
+    rows = (
+        Email.objects.filter(body_fetched_at__isnull=False)
+        .order_by('pk')
+        .values_list('pk', 'body_plain', 'body_html')
+    )
+    bodies = []
+    for pk, plain, html in rows.iterator(chunk_size=BATCH_SIZE):
+        html_data = None
+        if html:
+            html_data = zlib.compress(html.encode('utf-8'))
+        bodies.append(EmailBody(email_id=pk, plain=plain or '', html_data=html_data, compression=COMPRESSION))
+        if len(bodies) == BATCH_SIZE:
+            EmailBody.objects.bulk_create(bodies)
+            bodies = []
+    EmailBody.objects.bulk_create(bodies)
+
+
+def restore_bodies(apps, schema_editor):
+    Email = apps.get_model('gmail', 'Email')
+    EmailBody = apps.get_model('gmail', 'EmailBody')
+
+    for body in EmailBody.objects.iterator(chunk_size=BATCH_SIZE):
+        html = ''
+        if body.html_data:
+            html_data = bytes(body.html_data)
+            if body.compression == 'zlib':
+                html_data = zlib.decompress(html_data)
+            html = html_data.decode('utf-8')
+        Email.objects.filter(pk=body.email_id).update(body_plain=body.plain, body_html=html)
+
+
+def move_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(MOVE_SEARCH_TRIGGER)
+
+
+def restore_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(RESTORE_SEARCH_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gmail', '0007_email_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailBody',
+            fields=[
+                ('email', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='gmail.email')),
+                ('plain', models.TextField(blank=True, default='')),
+                ('html_data', models.BinaryField(blank=True, null=True)),
+                ('compression', models.CharField(blank=True, choices=[('', 'None'), ('zlib', 'zlib')], default='', max_length=10)),
+            ],
+        ),
+        # Copy while the old trigger is in place: search vectors are already current
+        migrations.RunPython(copy_bodies, restore_bodies),
+        migrations.RunPython(move_search_trigger, restore_search_trigger),
+        migrations.RemoveField(
+            model_name='email',
+            name='body_html',
+        ),
+        migrations.RemoveField(
+            model_name='email',
+            name='body_plain',
+        ),
+    ]
@@ -0,0 +1,127 @@
+"""
+Body extraction from Gmail message payloads
+
+``extract_body`` walks the MIME tree of a ``format=full`` message with an
+explicit stack, so deeply nested messages cannot hit the recursion limit.
+Attachments are skipped from their headers without decoding their data.
+Each text part is base64-decoded once, only up to the room left under
+GMAIL_BODY_MAX_BYTES, and decoded with the charset from its Content-Type.
+Text parts of the same type are joined in order (multipart/mixed messages
+split their text around inline images and attachments), except inside a
+multipart/alternative, whose parts are renderings of the same content and
+where only the first of each type is kept.
+"""
+import base64
+import binascii
+import codecs
+import re
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+BODY_TYPES = {'text/plain': 'text', 'text/html': 'html'}
+
+TRUNCATION_MARKERS = {
+    'text': '\n\n[Message truncated]',
+    'html': '<!-- Message truncated -->',
+}
+
+CHARSET_PATTERN = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.IGNORECASE)
+
+
+def _headers(part: Dict) -> Dict[str, str]:
+    return {h['name'].lower(): h['value'] for h in part.get('headers', [])}
+
+
+def is_attachment(part: Dict) -> bool:
+    """Whether a payload part is an attachment rather than message text"""
+    if part.get('filename') or part.get('body', {}).get('attachmentId'):
+        return True
+    return _headers(part).get('content-disposition', '').lower().startswith('attachment')
+
+
+def get_charset(part: Dict) -> str:
+    """Python codec for the part's charset, UTF-8 when missing or unknown"""
+    match = CHARSET_PATTERN.search(_headers(part).get('content-type', ''))
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def _decode(data: str, limit: int) -> Tuple[bytes, bool]:
+    """
+    Base64url-decode at most ``limit`` bytes of ``data``
+
+    Returns:
+        Tuple of the decoded bytes and whether ``data`` held more
+    """
+    needed = -(-limit // 3) * 4  # base64 characters covering ``limit`` bytes
+    truncated = len(data) > needed
+    if truncated:
+        data = data[:needed]
+    data += '=' * (-len(data) % 4)  # Gmail may omit the padding
+    try:
+        decoded = base64.urlsafe_b64decode(data)
+    except (binascii.Error, ValueError):
+        return b'', False
+    if len(decoded) > limit:
+        decoded, truncated = decoded[:limit], True
+    return decoded, truncated
+
+
+def extract_body(payload: Dict, max_bytes: Optional[int] = None) -> Dict[str, str]:
+    """
+    Extract the text and HTML body of a message payload
+
+    Args:
+        payload: ``payload`` of a Gmail message resource
+        max_bytes: Decoded bytes kept per body type (defaults to
+            GMAIL_BODY_MAX_BYTES); longer bodies end with a truncation marker
+
+    Returns:
+        Dictionary with 'text' and 'html'
+    """
+    max_bytes = settings.GMAIL_BODY_MAX_BYTES if max_bytes is None else max_bytes
+    chunks = {'text': [], 'html': []}
+    remaining = {'text': max_bytes, 'html': max_bytes}
+    truncated = {'text': False, 'html': False}
+
+    # (part, id of the multipart/alternative it is a direct child of)
+    stack = [(payload, None)]
+    taken = set()  # (alternative id, body type) already extracted
+    while stack:
+        part, alternative = stack.pop()
+        mime_type = part.get('mimeType', '').lower()
+
+        if 'parts' in part:
+            group = id(part) if mime_type == 'multipart/alternative' else None
+            stack.extend((child, group) for child in reversed(part['parts']))
+            continue
+
+        kind = BODY_TYPES.get(mime_type)
+        data = part.get('body', {}).get('data')
+        if kind is None or not data or is_attachment(part):
+            continue
+        if alternative is not None:
+            if (alternative, kind) in taken:
+                continue  # Another rendering of the same content
+            taken.add((alternative, kind))
+        if remaining[kind] <= 0:
+            truncated[kind] = True
+            continue
+
+        decoded, part_truncated = _decode(data, remaining[kind])
+        remaining[kind] -= len(decoded)
+        truncated[kind] = truncated[kind] or part_truncated
+        # 'ignore' also drops a multi-byte character cut by the size cap
+        chunks[kind].append(decoded.decode(get_charset(part), errors='ignore'))
+
+    body = {}
+    for kind, parts in chunks.items():
+        body[kind] = ''.join(parts)
+        if truncated[kind]:
+            body[kind] += TRUNCATION_MARKERS[kind]
+    return body
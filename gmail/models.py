@@ -1,5 +1,10 @@
+import zlib
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 from applications.models import Application
 
 
@@ -20,8 +25,8 @@ class Email(models.Model):
     gmail_id = models.CharField(max_length=128, unique=True)
     thread_id = models.CharField(max_length=128)
     subject = models.TextField()
-    body_plain = models.TextField()
-    body_html = models.TextField(null=True, blank=True)
+    snippet = models.TextField(blank=True, default='')
+    body_fetched_at = models.DateTimeField(null=True, blank=True)  # None until the EmailBody is downloaded
     sender = models.EmailField()
     recipient = models.EmailField()
     category = models.CharField(max_length=30, choices=CATEGORY_CHOICES, null=True, blank=True)
@@ -29,16 +34,61 @@ class Email(models.Model):
     draft_id = models.CharField(max_length=128, null=True, blank=True)  # Gmail draft ID if created
     has_to_respond_label = models.BooleanField(default=False)
     received_at = models.DateTimeField()
+    search_vector = SearchVectorField(null=True, editable=False)  # Maintained by a database trigger on PostgreSQL
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-received_at']
+        indexes = [
+            # list_emails: per-user inbox, newest first, optionally by category
+            models.Index(fields=['user', '-received_at'], name='email_user_received_idx'),
+            models.Index(fields=['user', 'category', '-received_at'], name='email_user_cat_received_idx'),
+            # Emails of an application, newest first
+            models.Index(fields=['application', '-received_at'], name='email_app_received_idx'),
+            models.Index(fields=['thread_id'], name='email_thread_idx'),
+        ]
         
     def __str__(self):
         return f"{self.subject} - {self.category or 'Unclassified'}"
 
 
+class EmailBody(models.Model):
+    """Message bodies, kept out of the Email table so list queries stay narrow"""
+    COMPRESSION_CHOICES = [
+        ("", "None"),
+        ("zlib", "zlib")
+    ]
+    
+    email = models.OneToOneField(Email, on_delete=models.CASCADE, primary_key=True, related_name='body')
+    plain = models.TextField(blank=True, default='')  # Uncompressed so PostgreSQL can index it for search
+    html_data = models.BinaryField(null=True, blank=True)
+    compression = models.CharField(max_length=10, choices=COMPRESSION_CHOICES, blank=True, default='')
+    
+    @classmethod
+    def build(cls, email: Email, plain: str, html: str) -> 'EmailBody':
+        """Build an unsaved body, compressing the HTML per EMAIL_BODY_COMPRESSION"""
+        body = cls(email=email, plain=plain or '', compression=settings.EMAIL_BODY_COMPRESSION)
+        if html:
+            html_data = html.encode('utf-8')
+            if body.compression == 'zlib':
+                html_data = zlib.compress(html_data)
+            body.html_data = html_data
+        return body
+    
+    @property
+    def html(self) -> str:
+        if not self.html_data:
+            return ''
+        html_data = bytes(self.html_data)
+        if self.compression == 'zlib':
+            html_data = zlib.decompress(html_data)
+        return html_data.decode('utf-8')
+    
+    def __str__(self):
+        return f"Body of {self.email_id}"
+
+
 class DiscoveredLink(models.Model):
     CRAWL_STATUS_CHOICES = [
         ("PENDING", "Pending"),
@@ -68,3 +118,108 @@ class DiscoveredLink(models.Model):
         
     def __str__(self):
         return f"{self.url} - {self.crawl_status}"
+
+
+class GmailOperation(models.Model):
+    """Outbox entry for a Gmail mutation applied asynchronously by a worker"""
+    OPERATION_CHOICES = [
+        ("MARK_READ", "Mark Read"),
+        ("ADD_LABEL", "Add Label"),
+        ("CREATE_DRAFT", "Create Draft")
+    ]
+    
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed")
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='gmail_operations')
+    email = models.ForeignKey(Email, on_delete=models.SET_NULL, null=True, blank=True, related_name='gmail_operations')
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    gmail_id = models.CharField(max_length=128, blank=True)  # Target Gmail message ID
+    payload = models.JSONField(default=dict, blank=True)  # e.g. {"label": ...} or draft fields
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        
+    def __str__(self):
+        return f"{self.operation} {self.gmail_id} - {self.status}"
+
+
+class SyncJob(models.Model):
+    """A Gmail sync requested through the API and run by a background worker"""
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed")
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_jobs')
+    params = models.JSONField(default=dict, blank=True)  # GmailService.sync_emails keyword arguments
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    mode = models.CharField(max_length=20, blank=True, default='')  # 'full' or 'incremental' once done
+    total = models.PositiveIntegerField(null=True, blank=True)  # Messages listed so far, final once listing ends
+    processed = models.PositiveIntegerField(default=0)  # Listed messages whose details were fetched
+    fetched = models.PositiveIntegerField(default=0)
+    saved = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
+    
+    @property
+    def remaining(self):
+        if self.total is None:
+            return None
+        return max(self.total - self.processed, 0)
+        
+    def __str__(self):
+        return f"Sync job {self.pk} - {self.status}"
+
+
+class BackfillWindow(models.Model):
+    """A date window of a historical Gmail import, with its resume checkpoint"""
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed")
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='backfill_windows')
+    start = models.DateTimeField()  # Inclusive
+    end = models.DateTimeField()  # Exclusive
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    page_token = models.CharField(max_length=256, blank=True, default='')  # Next list page; '' starts the window over
+    fetched = models.PositiveIntegerField(default=0)
+    saved = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-start']
+        unique_together = ['user', 'start', 'end']
+        
+    def __str__(self):
+        return f"Backfill {self.start:%Y-%m-%d}..{self.end:%Y-%m-%d} - {self.status}"
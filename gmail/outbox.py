@@ -0,0 +1,199 @@
+"""
+Outbox for Gmail mutations triggered by API writes
+
+Views record the Gmail side effect as a GmailOperation row instead of calling
+Gmail inside the request. A worker on the ``io`` queue drains each user's
+pending operations, coalescing them into as few Gmail calls as possible
+(one batchModify per label change) and retrying failures with backoff.
+"""
+import logging
+import random
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import GoogleAccount
+from core.versioning import bump_user_version
+from gmail.models import Email, GmailOperation
+from gmail.services import GmailService
+
+logger = logging.getLogger(__name__)
+
+MARK_READ = 'MARK_READ'
+ADD_LABEL = 'ADD_LABEL'
+CREATE_DRAFT = 'CREATE_DRAFT'
+
+
+def enqueue(user, operation: str, emails: Iterable[Email],
+            payload: Optional[Dict] = None) -> List[GmailOperation]:
+    """
+    Record a Gmail operation for each email and drain once the transaction commits
+
+    Args:
+        user: Owner of the emails
+        operation: MARK_READ, ADD_LABEL or CREATE_DRAFT
+        emails: Emails the operation applies to
+        payload: Operation arguments, {"label": ...} for ADD_LABEL or
+            {"to", "subject", "body"} for CREATE_DRAFT
+
+    Returns:
+        The created GmailOperation rows
+    """
+    operations = GmailOperation.objects.bulk_create([
+        GmailOperation(
+            user=user,
+            email=email,
+            gmail_id=email.gmail_id,
+            operation=operation,
+            payload=payload or {}
+        )
+        for email in emails
+    ])
+
+    if operations:
+        from gmail.tasks import drain_user_outbox
+
+        # A broker outage must not fail the write; the periodic drain picks these up
+        transaction.on_commit(lambda: drain_user_outbox.delay(user.id), robust=True)
+    return operations
+
+
+def process_outbox(user, gmail_service: Optional[GmailService] = None,
+                   limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Apply a user's due operations to Gmail
+
+    MARK_READ operations become one batchModify, ADD_LABEL operations one
+    batchModify per label, and each CREATE_DRAFT its own call. A failing
+    group is rescheduled with exponential backoff without affecting the
+    others.
+
+    Args:
+        user: User whose outbox to drain
+        gmail_service: Optional GmailService to use (built for ``user`` by default)
+        limit: Max operations to apply (defaults to GMAIL_OUTBOX_BATCH_SIZE)
+
+    Returns:
+        Counts of 'done', 'retried' and 'failed' operations
+    """
+    counts = {'done': 0, 'retried': 0, 'failed': 0}
+    operations = list(
+        GmailOperation.objects
+        .filter(user=user, status='PENDING', next_attempt_at__lte=timezone.now())
+        .order_by('created_at')[:limit or settings.GMAIL_OUTBOX_BATCH_SIZE]
+    )
+    if not operations:
+        return counts
+
+    if gmail_service is None:
+        try:
+            gmail_service = GmailService(user)
+        except GoogleAccount.DoesNotExist:
+            # Disconnected accounts will never succeed
+            _mark_failed(operations, 'Google account not connected')
+            counts['failed'] = len(operations)
+            return counts
+        except Exception as e:
+            # E.g. a revoked refresh token: back off the whole batch
+            logger.warning('Gmail service unavailable for user %s: %s', user.pk, e)
+            for outcome, count in _schedule_retry(operations, e).items():
+                counts[outcome] += count
+            return counts
+
+    # Group operations that can share a Gmail call
+    groups = defaultdict(list)
+    for operation in operations:
+        if operation.operation == ADD_LABEL:
+            key = (ADD_LABEL, operation.payload.get('label'))
+        elif operation.operation == MARK_READ:
+            key = (MARK_READ, None)
+        else:
+            key = (operation.operation, operation.pk)
+        groups[key].append(operation)
+
+    for (operation_type, label), group in groups.items():
+        try:
+            _apply(gmail_service, operation_type, label, group)
+        except Exception as e:
+            logger.warning('Gmail %s failed for user %s: %s', operation_type, user.pk, e)
+            for outcome, count in _schedule_retry(group, e).items():
+                counts[outcome] += count
+            continue
+
+        GmailOperation.objects.filter(pk__in=[op.pk for op in group]).update(
+            status='DONE',
+            attempts=F('attempts') + 1,
+            last_error=None,
+            updated_at=timezone.now()
+        )
+        counts['done'] += len(group)
+
+    return counts
+
+
+def _apply(gmail_service: GmailService, operation_type: str, label: Optional[str],
+           group: List[GmailOperation]):
+    """Make the Gmail call(s) for one group of operations"""
+    gmail_ids = [op.gmail_id for op in group]
+
+    if operation_type == MARK_READ:
+        gmail_service.mark_as_read_many(gmail_ids)
+    elif operation_type == ADD_LABEL:
+        gmail_service.add_label_many(gmail_ids, label)
+    elif operation_type == CREATE_DRAFT:
+        operation = group[0]
+        draft_id = gmail_service.create_draft(
+            to=operation.payload['to'],
+            subject=operation.payload['subject'],
+            body=operation.payload['body'],
+            thread_id=operation.payload.get('thread_id')
+        )
+        if operation.email_id:
+            Email.objects.filter(pk=operation.email_id).update(draft_id=draft_id)
+            bump_user_version(operation.user_id)
+    else:
+        raise ValueError(f"Unknown Gmail operation {operation_type}")
+
+
+def get_retry_delay(attempts: int) -> float:
+    """Seconds to wait after ``attempts`` failures, doubling with jitter"""
+    delay = min(
+        settings.GMAIL_OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+        settings.GMAIL_OUTBOX_RETRY_MAX_DELAY
+    )
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _schedule_retry(group: List[GmailOperation], error: Exception) -> Dict[str, int]:
+    """Back off a failed group, giving up after GMAIL_OUTBOX_MAX_ATTEMPTS"""
+    now = timezone.now()
+    counts = {'retried': 0, 'failed': 0}
+
+    for operation in group:
+        operation.attempts += 1
+        operation.last_error = str(error)
+        operation.updated_at = now
+        if operation.attempts >= settings.GMAIL_OUTBOX_MAX_ATTEMPTS:
+            operation.status = 'FAILED'
+            counts['failed'] += 1
+        else:
+            operation.next_attempt_at = now + timedelta(seconds=get_retry_delay(operation.attempts))
+            counts['retried'] += 1
+
+    GmailOperation.objects.bulk_update(
+        group, ['attempts', 'last_error', 'status', 'next_attempt_at', 'updated_at']
+    )
+    return counts
+
+
+def _mark_failed(operations: List[GmailOperation], error: str):
+    GmailOperation.objects.filter(pk__in=[op.pk for op in operations]).update(
+        status='FAILED',
+        last_error=error,
+        updated_at=timezone.now()
+    )
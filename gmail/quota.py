@@ -0,0 +1,271 @@
+"""
+Gmail API quota handling
+
+Gmail meters calls in quota units (``messages.get`` costs 5, ``batchModify``
+50, ...) against a per-user and a per-project rate. ``GmailQuota`` takes the
+units of every call from two token buckets shared by all workers through
+Redis, one for the user and one for the project, waiting when either is
+empty, so concurrent workers saturate the quota without going over it.
+Calls rejected anyway (429, rate-limit 403s) or failing with a 5xx are
+retried with jittered exponential backoff. Throttling and retry counts are
+kept in the cache (``get_quota_counters``).
+"""
+import logging
+import random
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from googleapiclient.errors import HttpError
+
+from core.cache import make_key
+from core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Quota units per Gmail API method (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {
+    'gmail.users.getProfile': 1,
+    'gmail.users.history.list': 2,
+    'gmail.users.labels.list': 1,
+    'gmail.users.labels.create': 5,
+    'gmail.users.messages.list': 5,
+    'gmail.users.messages.get': 5,
+    'gmail.users.messages.modify': 5,
+    'gmail.users.messages.batchModify': 50,
+    'gmail.users.drafts.create': 10,
+}
+DEFAULT_QUOTA_UNITS = 5
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+USER_BUCKET_KEY = 'gmail:quota:user:{user_id}'
+PROJECT_BUCKET_KEY = 'gmail:quota:project'
+
+COUNTERS = ['throttled', 'throttled_ms', 'retried', 'failed']
+
+# Refill every bucket in KEYS, then take ARGV[1] units from all of them or
+# from none. ARGV[2..] are (rate, capacity) pairs. Returns the seconds to
+# wait before the units are available (0 when they were taken). A request
+# larger than a bucket is granted once the bucket is full and leaves it in
+# debt, so later calls wait for the overdraft.
+TAKE_TOKENS_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local requested = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    local needed = math.min(requested, capacity)
+    if tokens < needed then
+        wait = math.max(wait, (needed - tokens) / rate)
+    end
+end
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[2 * i])
+        local capacity = tonumber(ARGV[2 * i + 1])
+        redis.call('HSET', key, 'tokens', levels[i] - requested, 'ts', now)
+        redis.call('EXPIRE', key, math.ceil((capacity + requested) / rate) + 1)
+    end
+end
+return tostring(wait)
+"""
+
+
+@lru_cache(maxsize=None)
+def _take_tokens_script():
+    return get_redis_client().register_script(TAKE_TOKENS_SCRIPT)
+
+
+class GmailQuotaExceeded(Exception):
+    """Quota did not free up within GMAIL_QUOTA_MAX_WAIT seconds"""
+
+
+def quota_units(method_id: Optional[str]) -> int:
+    return QUOTA_UNITS.get(method_id, DEFAULT_QUOTA_UNITS)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Whether a failed Gmail call may succeed when retried (rate limits, 5xx, network errors)"""
+    if isinstance(exc, HttpError):
+        if exc.status_code in RETRYABLE_STATUSES:
+            return True
+        if exc.status_code == 403:
+            details = exc.error_details if isinstance(exc.error_details, list) else []
+            return any(
+                isinstance(detail, dict) and detail.get('reason') in RATE_LIMIT_REASONS
+                for detail in details
+            )
+        return False
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def is_transient(exc: Exception) -> bool:
+    """
+    Whether an error means Gmail was unavailable rather than the request bad
+
+    Transient errors that survived the retries are raised to the caller
+    instead of being logged and skipped, so a sync fails visibly rather than
+    silently returning fewer emails.
+    """
+    return isinstance(exc, GmailQuotaExceeded) or is_retryable(exc)
+
+
+def _count(name: str, amount: int = 1):
+    """Add to a counter; best-effort, so a cache outage never fails the Gmail call"""
+    key = make_key('gmail', 'quota-counter', name)
+    try:
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            if not cache.add(key, amount, timeout=None):
+                cache.incr(key, amount)
+    except redis.exceptions.RedisError as e:
+        logger.warning('Could not update Gmail quota counter %s: %s', name, e)
+
+
+def get_quota_counters() -> Dict[str, int]:
+    """Throttled/retried/failed call counts and quota units spent per method, across workers"""
+    names = COUNTERS + [f'units:{method_id}' for method_id in QUOTA_UNITS]
+    values = cache.get_many([make_key('gmail', 'quota-counter', name) for name in names])
+    return {name: values.get(make_key('gmail', 'quota-counter', name), 0) for name in names}
+
+
+class GmailQuota:
+    """Rate limiting and retries for one user's Gmail calls"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+
+    def acquire(self, units: int):
+        """
+        Block until ``units`` quota units are available to this user
+
+        Raises:
+            GmailQuotaExceeded: If that takes longer than GMAIL_QUOTA_MAX_WAIT
+        """
+        if not settings.GMAIL_QUOTA_ENABLED:
+            return
+
+        waited = 0.0
+        while True:
+            try:
+                wait = float(_take_tokens_script()(
+                    keys=[USER_BUCKET_KEY.format(user_id=self.user_id), PROJECT_BUCKET_KEY],
+                    args=[
+                        units,
+                        settings.GMAIL_QUOTA_USER_RATE, settings.GMAIL_QUOTA_USER_BURST,
+                        settings.GMAIL_QUOTA_PROJECT_RATE, settings.GMAIL_QUOTA_PROJECT_BURST,
+                    ],
+                ))
+            except redis.exceptions.ConnectionError:
+                logger.warning('Redis unavailable, calling Gmail without rate limiting')
+                return
+
+            if wait <= 0:
+                break
+            if waited + wait > settings.GMAIL_QUOTA_MAX_WAIT:
+                _count('failed')
+                raise GmailQuotaExceeded(f'Gmail quota for user {self.user_id} still exhausted after {waited:.1f}s')
+            time.sleep(wait)
+            waited += wait
+
+        if waited:
+            _count('throttled')
+            _count('throttled_ms', int(waited * 1000))
+
+    def _backoff(self, attempt: int, exc: Optional[Exception] = None):
+        """Sleep before retry ``attempt`` (0-based): full jitter, at least any Retry-After"""
+        delay = random.uniform(0, min(settings.GMAIL_RETRY_MAX_DELAY, settings.GMAIL_RETRY_BASE_DELAY * 2 ** attempt))
+        if isinstance(exc, HttpError):
+            try:
+                delay = max(delay, float(exc.resp.get('retry-after', 0)))
+            except ValueError:
+                pass  # HTTP-date form; the backoff delay will do
+        time.sleep(delay)
+
+    def execute(self, request):
+        """Execute a googleapiclient request within quota, retrying transient failures"""
+        units = quota_units(request.methodId)
+        for attempt in range(settings.GMAIL_MAX_RETRIES + 1):
+            self.acquire(units)
+            _count(f'units:{request.methodId}', units)
+            try:
+                return request.execute()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt == settings.GMAIL_MAX_RETRIES:
+                    _count('failed')
+                    raise
+                logger.info('Retrying %s for user %s after %s', request.methodId, self.user_id, e)
+                _count('retried')
+                self._backoff(attempt, e)
+
+    def execute_batch(self, service, requests: Dict[str, object], callback: Callable):
+        """
+        Execute ``requests`` as Gmail batch requests within quota
+
+        Sub-requests that failed transiently are retried in a new batch after
+        a backoff; ``callback(request_id, response, exception)`` is called
+        once per request with its final outcome.
+
+        Args:
+            service: Gmail client creating the batch
+            requests: googleapiclient requests by request id (at most
+                GMAIL_MAX_BATCH_SIZE)
+            callback: Called as for ``new_batch_http_request``
+        """
+        pending = dict(requests)
+        for attempt in range(settings.GMAIL_MAX_RETRIES + 1):
+            last_attempt = attempt == settings.GMAIL_MAX_RETRIES
+            units = {}
+            for request in pending.values():
+                units[request.methodId] = units.get(request.methodId, 0) + quota_units(request.methodId)
+            self.acquire(sum(units.values()))
+            for method_id, method_units in units.items():
+                _count(f'units:{method_id}', method_units)
+
+            retry = {}
+
+            def handle_response(request_id, response, exception):
+                if exception is not None and is_retryable(exception):
+                    if not last_attempt:
+                        retry[request_id] = pending[request_id]
+                        return
+                    _count('failed')
+                callback(request_id, response, exception)
+
+            batch = service.new_batch_http_request(callback=handle_response)
+            for request_id, request in pending.items():
+                batch.add(request, request_id=request_id)
+            try:
+                batch.execute()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if last_attempt:
+                    _count('failed')
+                    raise
+                retry, error = pending, e
+            else:
+                if not retry:
+                    return
+                error = None
+
+            logger.info('Retrying %s of %s batched Gmail calls for user %s', len(retry), len(pending), self.user_id)
+            _count('retried', len(retry))
+            self._backoff(attempt, error)
+            pending = retry
@@ -2,7 +2,7 @@
 Gmail serializers
 """
 from rest_framework import serializers
-from gmail.models import Email
+from gmail.models import Email, SyncJob
 from applications.serializers import ApplicationSerializer
 
 
@@ -10,6 +10,8 @@ class EmailSerializer(serializers.ModelSerializer):
     """Serializer for Email model"""
     application = ApplicationSerializer(read_only=True)
     has_application = serializers.SerializerMethodField()
+    body_plain = serializers.CharField(source='body.plain', read_only=True, default='')
+    body_html = serializers.CharField(source='body.html', read_only=True, default='')
     
     class Meta:
         model = Email
@@ -21,6 +23,7 @@ class EmailSerializer(serializers.ModelSerializer):
             'sender',
             'recipient',
             'received_at',
+            'snippet',
             'body_plain',
             'body_html',
             'category',
@@ -37,20 +40,20 @@ class EmailSerializer(serializers.ModelSerializer):
             'sender',
             'recipient',
             'received_at',
-            'body_plain',
-            'body_html',
+            'snippet',
             'created_at',
             'updated_at',
         ]
     
     def get_has_application(self, obj):
         """Check if email has associated application"""
-        return hasattr(obj, 'application') and obj.application is not None
+        return obj.application_id is not None
 
 
 class EmailListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for email lists"""
     has_application = serializers.SerializerMethodField()
+    highlight = serializers.SerializerMethodField()
     
     class Meta:
         model = Email
@@ -62,8 +65,37 @@ class EmailListSerializer(serializers.ModelSerializer):
             'category',
             'sub_category',
             'has_application',
+            'highlight',
         ]
     
     def get_has_application(self, obj):
         """Check if email has associated application"""
-        return hasattr(obj, 'application') and obj.application is not None
\ No newline at end of file
+        return obj.application_id is not None
+    
+    def get_highlight(self, obj):
+        """Matching snippet with <mark> tags, only set for full-text search results"""
+        return getattr(obj, 'search_highlight', None)
+
+
+class SyncJobSerializer(serializers.ModelSerializer):
+    """Serializer for background sync jobs and their progress"""
+    remaining = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = SyncJob
+        fields = [
+            'id',
+            'status',
+            'mode',
+            'params',
+            'total',
+            'processed',
+            'fetched',
+            'saved',
+            'remaining',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
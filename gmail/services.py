@@ -2,204 +2,688 @@
 Gmail service for fetching and processing emails
 """
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from email.mime.text import MIMEText
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
+from itertools import islice
 import base64
 import re
 
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+from django.core.cache import cache
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.conf import settings
+from django.utils.functional import cached_property
 
+from accounts.authentication import invalidate_auth_cache
+from accounts.domain_filters import DomainMatcher, get_domain_matcher
 from accounts.models import GoogleAccount
-from accounts.utils import refresh_google_tokens
-from gmail.models import Email
+from accounts.utils import build_google_service, ensure_fresh_tokens, get_credentials_from_tokens
+from core.cache import make_key
+from core.versioning import bump_user_version
+from gmail.mime import extract_body
+from gmail.quota import GmailQuota, is_transient
+from gmail.models import Email, EmailBody
 from applications.models import Application
 
 
+# Fields requested per message format; metadata skips the MIME payload entirely
+MESSAGE_FIELDS = {
+    'metadata': 'id,threadId,labelIds,snippet,payload(mimeType,headers)',
+    'full': 'id,threadId,labelIds,snippet,payload',
+}
+METADATA_HEADERS = ['Subject', 'From', 'To', 'Date']
+
+# Gmail rejects batch requests with more than 100 calls
+GMAIL_MAX_BATCH_SIZE = 100
+
+# Largest page messages().list will return
+GMAIL_MAX_PAGE_SIZE = 500
+
+# Most message ids a single messages().batchModify call accepts
+GMAIL_MAX_BATCH_MODIFY_SIZE = 1000
+
+# Labels applied to processed emails
+PROCESSED_LABEL = 'Job Tracker/Processed'
+STATUS_LABEL = 'Job Tracker/{status}'
+
+# Keywords used to find job-related emails
+JOB_KEYWORDS = [
+    'job', 'position', 'opportunity', 'hiring', 'recruitment',
+    'application', 'interview', 'offer', 'reject', 'candidate'
+]
+JOB_KEYWORDS_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(keyword) for keyword in JOB_KEYWORDS) + r')\b',
+    re.IGNORECASE
+)
+
+# Labels excluded from Gmail search results by default
+EXCLUDED_LABELS = {'SPAM', 'TRASH'}
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """Split an iterable into lists of at most ``size`` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_batch_size(batch_size: Optional[int] = None) -> int:
+    """Messages per Gmail batch request, GMAIL_BATCH_SIZE by default"""
+    if batch_size is None:
+        batch_size = settings.GMAIL_BATCH_SIZE
+    return max(1, min(batch_size, GMAIL_MAX_BATCH_SIZE))
+
+
 class GmailService:
     """Service for interacting with Gmail API"""
     
-    def __init__(self, user):
+    def __init__(self, user, service=None):
         self.user = user
         self.google_account = user.google_account
-        self.service = self._get_gmail_service()
+        self.quota = GmailQuota(user.pk)
+        self.service = service or self._get_gmail_service()
     
     def _get_gmail_service(self):
         """Get authenticated Gmail service instance"""
+        # Refresh token if it is about to expire
+        ensure_fresh_tokens(self.google_account)
+        return self.build_service()
+    
+    def build_service(self):
+        """
+        Build a Gmail client for the account's current tokens
+        
+        googleapiclient clients are not thread-safe, so threads working for
+        the same account each need their own.
+        """
         # Create credentials from stored tokens
-        credentials = Credentials(
-            token=self.google_account.access_token,
-            refresh_token=self.google_account.refresh_token,
-            token_uri='https://oauth2.googleapis.com/token',
-            client_id=settings.GOOGLE_CLIENT_ID,
-            client_secret=settings.GOOGLE_CLIENT_SECRET,
+        credentials = get_credentials_from_tokens(
+            self.google_account.access_token,
+            self.google_account.refresh_token,
+            self.google_account.token_expiry
         )
         
-        # Refresh token if expired
-        if self.google_account.token_expiry <= timezone.now():
-            refresh_google_tokens(self.google_account)
-            # Re-create credentials with new token
-            credentials = Credentials(
-                token=self.google_account.access_token,
-                refresh_token=self.google_account.refresh_token,
-                token_uri='https://oauth2.googleapis.com/token',
-                client_id=settings.GOOGLE_CLIENT_ID,
-                client_secret=settings.GOOGLE_CLIENT_SECRET,
-            )
-        
         # Build Gmail service
-        return build('gmail', 'v1', credentials=credentials)
+        return build_google_service(
+            'gmail', 'v1',
+            credentials=credentials,
+            root_url=settings.GMAIL_API_ROOT_URL
+        )
     
-    def fetch_recent_emails(self, days_back: int = 7, max_results: int = 100) -> List[Dict]:
+    def fetch_recent_emails(self, days_back: int = 7, max_results: int = 100,
+                            batch_size: Optional[int] = None,
+                            message_format: Optional[str] = None) -> List[Dict]:
         """
         Fetch recent emails from Gmail
         
         Args:
             days_back: Number of days to look back
             max_results: Maximum number of emails to fetch
+            batch_size: Number of message details fetched per Gmail batch
+                request (defaults to GMAIL_BATCH_SIZE, 1 disables batching)
+            message_format: 'metadata' for headers and snippet only, 'full'
+                to include bodies (defaults to GMAIL_SYNC_FORMAT)
             
         Returns:
             List of email dictionaries
         """
-        # Calculate date for query
-        after_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
+        try:
+            return list(self.iter_recent_emails(
+                days_back=days_back,
+                max_results=max_results,
+                batch_size=batch_size,
+                message_format=message_format
+            ))
+        except Exception as e:
+            if is_transient(e):
+                raise  # Quota or Gmail outage: an empty result would hide it
+            print(f"Error fetching emails: {str(e)}")
+            return []
+    
+    def iter_recent_emails(self, days_back: int = 7, max_results: int = 100,
+                           batch_size: Optional[int] = None,
+                           message_format: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream recent emails from Gmail
         
+        Follows ``nextPageToken`` across ``messages().list`` pages and fetches
+        details one batch at a time, so only a single page of ids and a single
+        batch of messages are held in memory at any point.
+        """
+        message_ids = self._iter_message_ids(self._build_query(days_back), max_results)
+        return self._iter_email_details(message_ids, batch_size, message_format)
+    
+    def _build_query(self, days_back: Optional[int] = None, after: Optional[datetime] = None,
+                     before: Optional[datetime] = None) -> str:
+        """
+        Build the Gmail search query for job-related emails
+        
+        Args:
+            days_back: Only messages from the last ``days_back`` days
+            after, before: Only messages received in [after, before), as
+                exact timestamps (used for backfill windows)
+        """
         # Build query - look for job-related keywords
-        job_keywords = [
-            'job', 'position', 'opportunity', 'hiring', 'recruitment',
-            'application', 'interview', 'offer', 'reject', 'candidate'
-        ]
-        query_parts = [f'"{keyword}"' for keyword in job_keywords]
-        query = f"({' OR '.join(query_parts)}) after:{after_date}"
+        query_parts = [f'"{keyword}"' for keyword in JOB_KEYWORDS]
+        query = f"({' OR '.join(query_parts)})"
         
-        try:
-            # Search for messages
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
+        if days_back is not None:
+            after_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
+            query += f' after:{after_date}'
+        # Gmail reads bare dates in Pacific time; epoch seconds are exact
+        if after is not None:
+            query += f' after:{int(after.timestamp()) - 1}'
+        if before is not None:
+            query += f' before:{int(before.timestamp())}'
+        
+        # Exclude blocked domains server-side so their mail is never listed
+        blocked = self.domain_matcher.blocked_domains()[:settings.GMAIL_QUERY_MAX_BLOCKED_DOMAINS]
+        if blocked:
+            query += ' ' + ' '.join(f'-from:{domain}' for domain in blocked)
+        return query
+    
+    @cached_property
+    def domain_matcher(self) -> DomainMatcher:
+        """The user's compiled DomainFilter rules"""
+        return get_domain_matcher(self.user)
+    
+    def _is_sender_allowed(self, message: Dict) -> bool:
+        """Check a raw message's From header against the domain filters"""
+        if not self.domain_matcher:
+            return True
+        for header in message.get('payload', {}).get('headers', []):
+            if header['name'].lower() == 'from':
+                return self.domain_matcher.is_allowed(header['value'])
+        return True
+    
+    def _iter_message_ids(self, query: str, max_results: int,
+                          on_page: Optional[Callable[[List[str]], None]] = None) -> Iterator[str]:
+        """
+        Yield ids of messages matching ``query``, page by page
+        
+        ``on_page`` is called with each page's ids as soon as the page is
+        listed, before its ids are yielded.
+        """
+        remaining = max_results
+        page_token = None
+        
+        while remaining > 0:
+            message_ids, page_token = self.list_message_page(
+                query, page_token, min(remaining, GMAIL_MAX_PAGE_SIZE)
+            )
+            message_ids = message_ids[:remaining]
+            if on_page:
+                on_page(message_ids)
+            yield from message_ids
+            remaining -= len(message_ids)
             
-            for message in messages:
-                email_data = self._fetch_email_details(message['id'])
+            if not page_token or not message_ids:
+                return
+    
+    def list_message_page(self, query: str, page_token: Optional[str] = None,
+                          page_size: int = GMAIL_MAX_PAGE_SIZE) -> Tuple[List[str], Optional[str]]:
+        """
+        List one page of ids of messages matching ``query``
+        
+        Returns:
+            Tuple of (message ids, token of the next page or None)
+        """
+        results = self.quota.execute(self.service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=page_size,
+            pageToken=page_token
+        ))
+        message_ids = [message['id'] for message in results.get('messages', [])]
+        return message_ids, results.get('nextPageToken')
+    
+    def _iter_email_details(self, message_ids: Iterable[str], batch_size: Optional[int] = None,
+                            message_format: Optional[str] = None,
+                            filter_domains: bool = True) -> Iterator[Dict]:
+        """
+        Fetch and parse details for ``message_ids`` one batch at a time
+        
+        With ``filter_domains``, messages from blocked sender domains are
+        dropped on their headers, before any body is decoded.
+        """
+        batch_size = get_batch_size(batch_size)
+        message_format = message_format or settings.GMAIL_SYNC_FORMAT
+        
+        for chunk in chunked(message_ids, batch_size):
+            if batch_size > 1:
+                yield from self._fetch_email_details_batch(
+                    chunk, batch_size, message_format, filter_domains
+                )
+            else:
+                email_data = self._fetch_email_details(chunk[0], message_format, filter_domains)
                 if email_data:
-                    emails.append(email_data)
-            
-            return emails
+                    yield email_data
+    
+    def list_new_message_ids(self, days_back: int = 7, max_results: int = 100,
+                             on_page: Optional[Callable[[List[str]], None]] = None
+                             ) -> Tuple[Iterable[str], Optional[str], bool]:
+        """
+        List ids of messages added since the last sync
+        
+        Uses the history API, or the ``after:<days_back>`` keyword query
+        when the account has no history cursor yet or Gmail reports it as
+        expired. ``max_results`` only applies to that fallback query.
+        
+        Returns:
+            Tuple of (message ids, new history cursor, whether the history
+            API was used). Ids from the keyword query are listed lazily,
+            page by page, calling ``on_page`` with each page's ids.
+        """
+        start_history_id = self.google_account.gmail_history_id
+        if start_history_id:
+            try:
+                message_ids, history_id = self._list_history_message_ids(start_history_id)
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                # Cursor expired (Gmail keeps roughly a week of history)
+                message_ids, history_id = None, None
             
-        except Exception as e:
-            print(f"Error fetching emails: {str(e)}")
-            return []
+            if message_ids is not None:
+                # Skip messages we already hold
+                existing_ids = set(Email.objects.filter(
+                    gmail_id__in=message_ids
+                ).order_by().values_list('gmail_id', flat=True))
+                return [m for m in message_ids if m not in existing_ids], history_id, True
+        
+        # Full sync: read the cursor first so nothing arriving during the scan is missed
+        profile = self.quota.execute(self.service.users().getProfile(userId='me'))
+        message_ids = self._iter_message_ids(self._build_query(days_back), max_results, on_page)
+        return message_ids, profile.get('historyId'), False
     
-    def _fetch_email_details(self, message_id: str) -> Optional[Dict]:
-        """Fetch detailed information for a single email"""
-        try:
-            message = self.service.users().messages().get(
+    def _list_history_message_ids(self, start_history_id: str) -> Tuple[List[str], str]:
+        """
+        List ids of messages added since ``start_history_id``
+        
+        Returns:
+            Tuple of (message ids in history order, latest mailbox history id)
+        
+        Raises:
+            HttpError: 404 when the start history id is too old
+        """
+        message_ids = []
+        seen = set()
+        page_token = None
+        
+        while True:
+            results = self.quota.execute(self.service.users().history().list(
                 userId='me',
-                id=message_id
-            ).execute()
+                startHistoryId=start_history_id,
+                historyTypes='messageAdded',
+                pageToken=page_token
+            ))
             
-            # Extract headers
-            headers = message['payload'].get('headers', [])
-            header_dict = {h['name']: h['value'] for h in headers}
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added['message']
+                    if message['id'] in seen:
+                        continue
+                    if EXCLUDED_LABELS.intersection(message.get('labelIds', [])):
+                        continue
+                    seen.add(message['id'])
+                    message_ids.append(message['id'])
             
-            # Extract body
-            body = self._extract_body(message['payload'])
-            
-            # Parse email data
-            email_data = {
-                'gmail_id': message['id'],
-                'thread_id': message['threadId'],
-                'subject': header_dict.get('Subject', ''),
-                'sender': header_dict.get('From', ''),
-                'recipient': header_dict.get('To', ''),
-                'date': header_dict.get('Date', ''),
-                'body_text': body.get('text', ''),
-                'body_html': body.get('html', ''),
-                'labels': message.get('labelIds', []),
-                'snippet': message.get('snippet', ''),
-            }
-            
-            # Extract sender email
-            sender_match = re.search(r'<(.+?)>', email_data['sender'])
-            if sender_match:
-                email_data['sender_email'] = sender_match.group(1)
-            else:
-                email_data['sender_email'] = email_data['sender']
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return message_ids, results.get('historyId', start_history_id)
+    
+    def _is_job_related(self, email_data: Dict) -> bool:
+        """Apply the job keyword filter locally, mirroring the search query"""
+        text = ' '.join((email_data['subject'], email_data['snippet'], email_data['body_text']))
+        return bool(JOB_KEYWORDS_RE.search(text))
+    
+    def record_sync(self, history_id: Optional[str] = None):
+        """Store the sync time and, when given, the incremental sync cursor"""
+        fields = {'gmail_synced_at': timezone.now()}
+        if history_id:
+            fields['gmail_history_id'] = history_id
+        
+        for name, value in fields.items():
+            setattr(self.google_account, name, value)
+        GoogleAccount.objects.filter(pk=self.google_account.pk).update(**fields)
+        invalidate_auth_cache(self.user.pk)
+    
+    def sync_emails(self, days_back: int = 7, max_results: int = 100,
+                    batch_size: Optional[int] = None, incremental: bool = False,
+                    message_format: Optional[str] = None,
+                    on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Fetch emails and save them to the database
+        
+        Emails flow through list pages -> batched detail fetch -> parse ->
+        chunked DB writes without ever being collected into one list, so
+        memory use does not grow with ``max_results``.
+        
+        Args:
+            incremental: Use the stored history cursor to fetch only new
+                messages instead of re-running the date-window query
+            message_format: 'metadata' (default via GMAIL_SYNC_FORMAT) stores
+                headers and snippet only; bodies are fetched on first read
+                by ``hydrate_emails``. 'full' stores bodies right away.
+            on_progress: Called with the running counts (total, processed,
+                fetched, saved) after each listed page of message ids and
+                after each saved chunk. Ids are listed lazily as details
+                are fetched, so ``total`` counts the ids listed so far and
+                is final once the last page is in.
+        
+        Returns:
+            Dictionary with fetched/saved counts and the sync mode used
+        """
+        progress = {'total': 0, 'processed': 0, 'fetched': 0, 'saved': 0}
+        
+        def count_listed(page: List[str]):
+            progress['total'] += len(page)
+            if on_progress:
+                on_progress(progress)
+        
+        if incremental:
+            message_ids, history_id, used_history = self.list_new_message_ids(
+                days_back, max_results, on_page=count_listed
+            )
+            if used_history:
+                count_listed(message_ids)  # History ids are listed up front
+        else:
+            message_ids, history_id, used_history = self._iter_message_ids(
+                self._build_query(days_back), max_results, on_page=count_listed
+            ), None, False
+        
+        def count_processed(message_ids):
+            for message_id in message_ids:
+                progress['processed'] += 1
+                yield message_id
+        
+        def count_fetched(emails):
+            for email_data in emails:
+                progress['fetched'] += 1
+                yield email_data
+        
+        emails = self._iter_email_details(count_processed(message_ids), batch_size, message_format)
+        if used_history:
+            # History lists all new mail, not only messages matching the job query
+            emails = filter(self._is_job_related, emails)
+        
+        for chunk in chunked(count_fetched(emails), settings.GMAIL_SYNC_CHUNK_SIZE):
+            progress['saved'] += self._save_email_chunk(chunk)
+            if on_progress:
+                on_progress(progress)
+        
+        # Only advance the cursor once the emails are safely stored
+        self.record_sync(history_id)
+        
+        return {
+            'fetched': progress['fetched'],
+            'saved': progress['saved'],
+            'mode': 'incremental' if used_history else 'full',
+        }
+    
+    def _get_message_request(self, message_id: str, message_format: str = 'full'):
+        """Build a ``messages().get`` request trimmed to the fields we parse"""
+        params = {}
+        if message_format == 'metadata':
+            params['metadataHeaders'] = METADATA_HEADERS
+        return self.service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format=message_format,
+            fields=MESSAGE_FIELDS[message_format],
+            **params
+        )
+    
+    def _fetch_email_details(self, message_id: str, message_format: str = 'full',
+                             filter_domains: bool = False) -> Optional[Dict]:
+        """Fetch detailed information for a single email"""
+        try:
+            message = self.quota.execute(self._get_message_request(message_id, message_format))
+            if filter_domains and not self._is_sender_allowed(message):
+                return None
             
-            return email_data
+            return self._parse_message(message)
             
         except Exception as e:
+            if is_transient(e):
+                raise
             print(f"Error fetching email details for {message_id}: {str(e)}")
             return None
     
-    def _extract_body(self, payload: Dict) -> Dict[str, str]:
-        """Extract text and HTML body from email payload"""
-        body = {'text': '', 'html': ''}
-        
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain':
-                    data = part['body']['data']
-                    body['text'] = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                elif part['mimeType'] == 'text/html':
-                    data = part['body']['data']
-                    body['html'] = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                elif 'parts' in part:
-                    # Recursive call for nested parts
-                    nested_body = self._extract_body(part)
-                    body['text'] = body['text'] or nested_body['text']
-                    body['html'] = body['html'] or nested_body['html']
+    def _fetch_email_details_batch(self, message_ids: List[str], batch_size: int,
+                                   message_format: str = 'full',
+                                   filter_domains: bool = False) -> List[Dict]:
+        """
+        Fetch details for many emails using Gmail batch requests
+        
+        Each batch request carries up to ``batch_size`` ``messages().get``
+        calls in a single HTTP round-trip. Failures are handled per message,
+        exactly like ``_fetch_email_details``: the message is logged and
+        left out of the result. Rate-limited and 5xx parts are retried (see
+        ``GmailQuota.execute_batch``); if they still fail, the error is raised.
+        
+        Returns:
+            List of email dictionaries, in the order of ``message_ids``
+        """
+        batch_size = min(batch_size, GMAIL_MAX_BATCH_SIZE)
+        results = {}
+        transient_errors = []
+        
+        def handle_response(request_id, response, exception):
+            if exception is not None:
+                if is_transient(exception):
+                    transient_errors.append(exception)
+                else:
+                    print(f"Error fetching email details for {request_id}: {str(exception)}")
+                return
+            if filter_domains and not self._is_sender_allowed(response):
+                return
+            try:
+                results[request_id] = self._parse_message(response)
+            except Exception as e:
+                print(f"Error parsing email {request_id}: {str(e)}")
+        
+        for start in range(0, len(message_ids), batch_size):
+            chunk = message_ids[start:start + batch_size]
+            requests = {
+                message_id: self._get_message_request(message_id, message_format)
+                for message_id in chunk
+            }
+            try:
+                self.quota.execute_batch(self.service, requests, handle_response)
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                print(f"Error executing Gmail batch request: {str(e)}")
+            if transient_errors:
+                raise transient_errors[0]
+        
+        return [results[message_id] for message_id in message_ids if message_id in results]
+    
+    def _parse_message(self, message: Dict) -> Dict:
+        """Convert a Gmail message resource into an email dictionary"""
+        # Extract headers
+        headers = message['payload'].get('headers', [])
+        header_dict = {h['name']: h['value'] for h in headers}
+        
+        # Extract body (metadata-format messages carry headers only)
+        has_body = 'body' in message['payload'] or 'parts' in message['payload']
+        body = self._extract_body(message['payload']) if has_body else {}
+        
+        # Parse email data
+        email_data = {
+            'gmail_id': message['id'],
+            'thread_id': message['threadId'],
+            'subject': header_dict.get('Subject', ''),
+            'sender': header_dict.get('From', ''),
+            'recipient': header_dict.get('To', ''),
+            'date': header_dict.get('Date', ''),
+            'body_text': body.get('text', ''),
+            'body_html': body.get('html', ''),
+            'labels': message.get('labelIds', []),
+            'snippet': message.get('snippet', ''),
+            'has_body': has_body,
+        }
+        
+        # Extract sender email
+        sender_match = re.search(r'<(.+?)>', email_data['sender'])
+        if sender_match:
+            email_data['sender_email'] = sender_match.group(1)
         else:
-            # Simple message
-            if payload['body'].get('data'):
-                data = payload['body']['data']
-                if payload['mimeType'] == 'text/plain':
-                    body['text'] = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                elif payload['mimeType'] == 'text/html':
-                    body['html'] = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
+            email_data['sender_email'] = email_data['sender']
         
-        return body
+        return email_data
+    
+    def _extract_body(self, payload: Dict) -> Dict[str, str]:
+        """Extract text and HTML body from email payload"""
+        return extract_body(payload)
     
-    @transaction.atomic
-    def save_emails_to_db(self, emails: List[Dict]) -> int:
+    def save_emails_to_db(self, emails: Iterable[Dict], chunk_size: Optional[int] = None) -> int:
         """
         Save fetched emails to database
         
+        Emails are consumed lazily and written in chunks of ``chunk_size``
+        (defaults to GMAIL_SYNC_CHUNK_SIZE) using one existence query and
+        one bulk insert per chunk.
+        
         Returns:
             Number of new emails saved
         """
+        chunk_size = chunk_size or settings.GMAIL_SYNC_CHUNK_SIZE
         saved_count = 0
         
+        for chunk in chunked(emails, chunk_size):
+            saved_count += self._save_email_chunk(chunk)
+        
+        return saved_count
+    
+    def _save_email_chunk(self, emails: List[Dict]) -> int:
+        """
+        Save one chunk of emails, returning the number of new rows
+        
+        Existing rows are found with a single ``gmail_id IN (...)`` query and
+        the rest are inserted with ``bulk_create``. If a concurrent sync wins
+        the race for some rows, the ``gmail_id`` unique constraint rejects the
+        bulk insert and the chunk is retried row by row so the count stays
+        accurate.
+        """
+        gmail_ids = [email_data['gmail_id'] for email_data in emails]
+        existing_ids = set(Email.objects.filter(
+            gmail_id__in=gmail_ids
+        ).order_by().values_list('gmail_id', flat=True))
+        
+        new_emails = []
         for email_data in emails:
-            # Check if email already exists
-            if Email.objects.filter(
-                user=self.user,
-                gmail_id=email_data['gmail_id']
-            ).exists():
+            if email_data['gmail_id'] in existing_ids:
+                continue
+            existing_ids.add(email_data['gmail_id'])
+            new_emails.append((self._build_email(email_data), email_data))
+        
+        if not new_emails:
+            return 0
+        
+        try:
+            with transaction.atomic():
+                Email.objects.bulk_create([email for email, _ in new_emails])
+                bodies = [self._build_body(email, email_data) for email, email_data in new_emails]
+                EmailBody.objects.bulk_create([body for body in bodies if body])
+            bump_user_version(self.user.pk)
+            return len(new_emails)
+        except IntegrityError:
+            pass
+        
+        saved_count = 0
+        for email, email_data in new_emails:
+            email.pk = None
+            try:
+                with transaction.atomic():
+                    email.save(force_insert=True)
+                    body = self._build_body(email, email_data)
+                    if body:
+                        body.save(force_insert=True)
+                saved_count += 1
+            except IntegrityError:
                 continue
+        
+        return saved_count
+    
+    def _build_email(self, email_data: Dict) -> Email:
+        """Build an unsaved Email from an email dictionary"""
+        return Email(
+            user=self.user,
+            gmail_id=email_data['gmail_id'],
+            thread_id=email_data['thread_id'],
+            subject=email_data['subject'],
+            sender=email_data['sender_email'],  # Email model expects email address in sender field
+            recipient=email_data['recipient'],
+            received_at=self._parse_date(email_data['date']),  # Field is received_at not date_received
+            snippet=email_data['snippet'],
+            body_fetched_at=timezone.now() if email_data['has_body'] else None
+        )
+    
+    def _build_body(self, email: Email, email_data: Dict) -> Optional[EmailBody]:
+        """Build the unsaved EmailBody for a saved Email, None for metadata-only messages"""
+        if not email_data['has_body']:
+            return None
+        return EmailBody.build(email, email_data['body_text'], email_data['body_html'])
+    
+    def hydrate_emails(self, emails: List[Email], batch_size: Optional[int] = None) -> int:
+        """
+        Download and store bodies for emails synced in metadata format
+        
+        Args:
+            emails: Email instances to hydrate, updated in place
+            batch_size: Messages per Gmail batch request (defaults to GMAIL_BATCH_SIZE)
             
-            # Create email record
-            email = Email.objects.create(
-                user=self.user,
-                gmail_id=email_data['gmail_id'],
-                thread_id=email_data['thread_id'],
-                subject=email_data['subject'],
-                sender=email_data['sender_email'],  # Email model expects email address in sender field
-                recipient=email_data['recipient'],
-                received_at=self._parse_date(email_data['date']),  # Field is received_at not date_received
-                body_plain=email_data['body_text'],  # Field is body_plain not body_text
-                body_html=email_data['body_html']
-            )
+        Returns:
+            Number of emails hydrated
+        """
+        pending = {email.gmail_id: email for email in emails if email.body_fetched_at is None}
+        if not pending:
+            return 0
+        
+        emails_data = self._iter_email_details(pending, batch_size, 'full', filter_domains=False)
+        return self.save_bodies(pending, emails_data)
+    
+    def save_bodies(self, pending: Dict[str, Email], emails_data: Iterable[Dict]) -> int:
+        """
+        Store fetched bodies for emails synced in metadata format
+        
+        Args:
+            pending: Emails awaiting a body, by Gmail id; updated in place
+            emails_data: Full-format email dictionaries for those emails
             
-            saved_count += 1
+        Returns:
+            Number of emails hydrated
+        """
+        hydrated = []
+        bodies = []
+        now = timezone.now()
+        for email_data in emails_data:
+            email = pending[email_data['gmail_id']]
+            email.body_fetched_at = now
+            email.updated_at = now
+            hydrated.append(email)
+            bodies.append(self._build_body(email, email_data))
         
-        return saved_count
+        with transaction.atomic():
+            EmailBody.objects.bulk_create(
+                bodies,
+                update_conflicts=True,
+                unique_fields=['email'],
+                update_fields=['plain', 'html_data', 'compression']
+            )
+            Email.objects.bulk_update(hydrated, ['body_fetched_at', 'updated_at'])
+            bump_user_version(self.user.pk)
+        
+        # Serve the new bodies without another query
+        for email, body in zip(hydrated, bodies):
+            email.body = body
+        return len(hydrated)
     
     def _parse_date(self, date_str: str) -> datetime:
         """Parse email date string to datetime"""
@@ -212,40 +696,150 @@ class GmailService:
     def mark_as_read(self, message_id: str):
         """Mark an email as read in Gmail"""
         try:
-            self.service.users().messages().modify(
+            self.quota.execute(self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ))
         except Exception as e:
             print(f"Error marking email as read: {str(e)}")
     
+    def mark_as_read_many(self, message_ids: List[str]) -> int:
+        """
+        Mark many emails as read using batchModify
+        
+        Returns:
+            Number of Gmail API calls made
+        """
+        return self.batch_modify(message_ids, remove_label_ids=['UNREAD'])
+    
     def add_label(self, message_id: str, label_name: str):
         """Add a label to an email in Gmail"""
         try:
             # First, get or create the label
             label_id = self._get_or_create_label(label_name)
+            if not label_id:
+                return
             
             # Then add it to the message
-            self.service.users().messages().modify(
+            self.quota.execute(self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body={'addLabelIds': [label_id]}
-            ).execute()
+            ))
+        except HttpError as e:
+            # The label may have been deleted in Gmail since it was cached
+            self.invalidate_label_cache()
+            print(f"Error adding label: {str(e)}")
         except Exception as e:
             print(f"Error adding label: {str(e)}")
     
+    def add_label_many(self, message_ids: List[str], label_name: str) -> int:
+        """
+        Add a label to many emails using batchModify
+        
+        Returns:
+            Number of Gmail API calls made
+        
+        Raises:
+            RuntimeError: If the label could not be found or created
+        """
+        label_id = self._get_or_create_label(label_name)
+        if not label_id:
+            raise RuntimeError(f"Could not get or create label {label_name}")
+        return self.batch_modify(message_ids, add_label_ids=[label_id])
+    
+    def batch_modify(self, message_ids: List[str], add_label_ids: Optional[List[str]] = None,
+                     remove_label_ids: Optional[List[str]] = None) -> int:
+        """
+        Add and remove labels on many messages with ``messages().batchModify``
+        
+        Messages are sent in chunks of up to 1000 ids (Gmail's limit), so
+        hundreds of messages cost a single call instead of one per message.
+        
+        Returns:
+            Number of Gmail API calls made
+        """
+        body = {}
+        if add_label_ids:
+            body['addLabelIds'] = add_label_ids
+        if remove_label_ids:
+            body['removeLabelIds'] = remove_label_ids
+        if not body:
+            return 0
+        
+        calls = 0
+        for chunk in chunked(dict.fromkeys(message_ids), GMAIL_MAX_BATCH_MODIFY_SIZE):
+            try:
+                self.quota.execute(self.service.users().messages().batchModify(
+                    userId='me',
+                    body={'ids': chunk, **body}
+                ))
+            except HttpError:
+                # The label may have been deleted in Gmail since it was cached
+                self.invalidate_label_cache()
+                raise
+            calls += 1
+        
+        return calls
+    
+    def create_draft(self, to: str, subject: str, body: str,
+                     thread_id: Optional[str] = None) -> str:
+        """
+        Create a plain-text draft in Gmail
+        
+        Args:
+            to: Recipient address
+            subject: Draft subject
+            body: Plain-text body
+            thread_id: Gmail thread to attach the draft to, for replies
+            
+        Returns:
+            The Gmail draft ID
+        """
+        message = MIMEText(body)
+        message['to'] = to
+        message['subject'] = subject
+        
+        draft_message = {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+        if thread_id:
+            draft_message['threadId'] = thread_id
+        
+        draft = self.quota.execute(self.service.users().drafts().create(
+            userId='me',
+            body={'message': draft_message}
+        ))
+        return draft['id']
+    
+    def _label_cache_key(self) -> str:
+        return make_key('gmail', 'labels', self.google_account.pk)
+    
+    def _get_label_ids(self, refresh: bool = False) -> Dict[str, str]:
+        """Get the label name -> id mapping, from cache unless ``refresh``"""
+        if not refresh:
+            label_ids = cache.get(self._label_cache_key())
+            if label_ids is not None:
+                return label_ids
+        
+        results = self.quota.execute(self.service.users().labels().list(userId='me'))
+        label_ids = {label['name']: label['id'] for label in results.get('labels', [])}
+        cache.set(self._label_cache_key(), label_ids, settings.GMAIL_LABEL_CACHE_TTL)
+        return label_ids
+    
+    def invalidate_label_cache(self):
+        """Forget cached label ids so the next lookup lists labels again"""
+        cache.delete(self._label_cache_key())
+    
     def _get_or_create_label(self, label_name: str) -> str:
         """Get label ID, creating it if necessary"""
         try:
-            # List all labels
-            results = self.service.users().labels().list(userId='me').execute()
-            labels = results.get('labels', [])
-            
-            # Check if label exists
-            for label in labels:
-                if label['name'] == label_name:
-                    return label['id']
+            # Check cached labels first, then re-list in case it was created elsewhere
+            label_id = self._get_label_ids().get(label_name)
+            if label_id:
+                return label_id
+            label_ids = self._get_label_ids(refresh=True)
+            if label_name in label_ids:
+                return label_ids[label_name]
             
             # Create new label
             label_object = {
@@ -253,10 +847,13 @@ class GmailService:
                 'labelListVisibility': 'labelShow',
                 'messageListVisibility': 'show'
             }
-            created_label = self.service.users().labels().create(
+            created_label = self.quota.execute(self.service.users().labels().create(
                 userId='me',
                 body=label_object
-            ).execute()
+            ))
+            
+            label_ids[label_name] = created_label['id']
+            cache.set(self._label_cache_key(), label_ids, settings.GMAIL_LABEL_CACHE_TTL)
             
             return created_label['id']
             
@@ -0,0 +1,162 @@
+"""
+Gmail syncs requested through the API, run in the background
+
+POST /api/gmail/fetch/ records a SyncJob and returns at once. A worker on
+the ``io`` queue (gmail.tasks.run_sync_job) runs the sync and writes its
+progress to the job row, which clients poll at /api/gmail/sync-jobs/<id>/
+or, in ASGI mode, follow as Server-Sent Events at
+/api/gmail/sync-jobs/<id>/events/.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import GoogleAccount
+from gmail.models import Email, SyncJob
+from gmail.services import GmailService
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('PENDING', 'RUNNING')
+JOB_FIELDS = ['status', 'mode', 'total', 'processed', 'fetched', 'saved', 'error']
+EMAIL_EVENT_FIELDS = ['id', 'gmail_id', 'subject', 'sender', 'received_at', 'category']
+
+
+def start_sync_job(user, params: Dict) -> Tuple[SyncJob, bool]:
+    """
+    Queue a sync for ``user`` unless one is already queued or running
+
+    Jobs that stopped reporting progress for SYNC_JOB_STALE_AFTER seconds
+    (their worker died) are marked FAILED and no longer count as running.
+
+    Args:
+        user: Owner of the Google account to sync
+        params: GmailService.sync_emails keyword arguments
+
+    Returns:
+        Tuple of (job, whether it was created)
+    """
+    from gmail.tasks import run_sync_job
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Lock the account row so concurrent requests cannot both queue a job
+        list(GoogleAccount.objects.select_for_update().filter(user=user).values_list('pk', flat=True))
+
+        active_jobs = SyncJob.objects.filter(user=user, status__in=ACTIVE_STATUSES)
+        active_jobs.filter(
+            updated_at__lt=now - timedelta(seconds=settings.SYNC_JOB_STALE_AFTER)
+        ).update(status='FAILED', error='Sync stopped reporting progress', finished_at=now, updated_at=now)
+
+        job = active_jobs.order_by('-created_at').first()
+        if job:
+            return job, False
+
+        job = SyncJob.objects.create(user=user, params=params)
+        transaction.on_commit(lambda: run_sync_job.delay(job.pk))
+    return job, True
+
+
+def _update_job(job: SyncJob, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=[*fields, 'updated_at'])
+
+
+def run_job(job: SyncJob):
+    """Run ``job``'s sync, recording progress and the outcome on the job row"""
+    _update_job(job, status='RUNNING', started_at=timezone.now())
+
+    def record_progress(progress: Dict):
+        _update_job(job, **progress)
+
+    try:
+        result = GmailService(job.user).sync_emails(**job.params, on_progress=record_progress)
+    except Exception as e:
+        logger.exception('Sync job %s failed for user %s', job.pk, job.user_id)
+        fail_job(job, str(e))
+        return
+
+    _update_job(job, status='DONE', mode=result['mode'], finished_at=timezone.now())
+    logger.info(
+        'Sync job %s for user %s: fetched %s, saved %s (%s)',
+        job.pk, job.user_id, job.fetched, job.saved, job.mode
+    )
+
+
+def fail_job(job: SyncJob, error: str):
+    _update_job(job, status='FAILED', error=error, finished_at=timezone.now())
+
+
+def _format_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    message = f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n'
+    if event_id is not None:
+        message = f'id: {event_id}\n' + message
+    return message + '\n'
+
+
+class SyncJobEvents:
+    """
+    Server-Sent Events for one sync job
+
+    Each poll reads the job row and the user's emails ingested since the job
+    was queued, and emits a ``progress`` event when the counts changed, one
+    ``email`` event per new email (its id is the event id, so a reconnecting
+    client resumes with ``Last-Event-ID``) and a final ``done`` event.
+    Streams close after SYNC_JOB_EVENTS_TIMEOUT seconds; clients reconnect.
+    """
+
+    def __init__(self, job: SyncJob, last_email_id: int = 0):
+        self.job_id = job.pk
+        self.user_id = job.user_id
+        self.since = job.created_at
+        self.last_email_id = last_email_id
+        self.last_state = None
+        self.finished = False
+
+    def poll(self) -> List[str]:
+        """Read the job and new emails, returning the SSE messages to send"""
+        job = SyncJob.objects.filter(pk=self.job_id).values(*JOB_FIELDS).first()
+        if job is None:
+            self.finished = True
+            return [_format_event('done', {'status': 'DELETED'})]
+
+        messages = []
+        if job != self.last_state:
+            self.last_state = job
+            messages.append(_format_event('progress', job))
+
+        emails = list(
+            Email.objects
+            .filter(user_id=self.user_id, created_at__gte=self.since, id__gt=self.last_email_id)
+            .order_by('id')
+            .values(*EMAIL_EVENT_FIELDS)[:settings.SYNC_JOB_EVENTS_BATCH_SIZE]
+        )
+        for email in emails:
+            messages.append(_format_event('email', email, event_id=email['id']))
+        if emails:
+            self.last_email_id = emails[-1]['id']
+
+        # Finish once the job is over and every email it saved has been sent
+        if job['status'] not in ACTIVE_STATUSES and len(emails) < settings.SYNC_JOB_EVENTS_BATCH_SIZE:
+            self.finished = True
+            messages.append(_format_event('done', job))
+        return messages
+
+    async def astream(self) -> AsyncIterator[str]:
+        """Event stream; waits between polls on the event loop"""
+        deadline = time.monotonic() + settings.SYNC_JOB_EVENTS_TIMEOUT
+        while True:
+            yield ''.join(await sync_to_async(self.poll)()) or ': keepalive\n\n'
+            if self.finished or time.monotonic() >= deadline:
+                return
+            await asyncio.sleep(settings.SYNC_JOB_EVENTS_POLL_INTERVAL)
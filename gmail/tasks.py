@@ -0,0 +1,278 @@
+"""
+Celery tasks for background Gmail synchronization
+"""
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import GoogleAccount
+from core.redis import get_redis_client, single_flight
+from gmail import backfill, sync_jobs
+from gmail.models import Email, GmailOperation, SyncJob
+from gmail.outbox import process_outbox
+from gmail.services import GmailService, chunked
+
+logger = logging.getLogger(__name__)
+
+SYNC_LOCK_KEY = 'gmail:sync:lock:{user_id}'
+OUTBOX_LOCK_KEY = 'gmail:outbox:lock:{user_id}'
+SWEEP_KEY = 'gmail:sync:sweep:{sweep_id}'
+LAST_SWEEP_KEY = 'gmail:sync:last-sweep'
+
+
+def get_queue_depth(queue: str) -> int:
+    """Number of messages waiting in a Celery queue on the Redis broker"""
+    return get_redis_client().llen(queue)
+
+
+@shared_task
+def dispatch_sync() -> Dict:
+    """
+    Fan out sync tasks for connected Google accounts (run by celery beat)
+
+    Accounts are split into chunks of GMAIL_SYNC_ACCOUNTS_PER_TASK and
+    least-recently-synced accounts go first. When the ``io`` queue already
+    holds GMAIL_SYNC_MAX_QUEUE_DEPTH messages, the sweep is shrunk to the
+    remaining capacity (or skipped), so a slow Gmail API never piles up an
+    unbounded backlog.
+    """
+    redis_client = get_redis_client()
+
+    queue_depth = get_queue_depth('io')
+    capacity = settings.GMAIL_SYNC_MAX_QUEUE_DEPTH - queue_depth
+    if capacity <= 0:
+        logger.warning('Skipping Gmail sync sweep: io queue depth %s', queue_depth)
+        return {'dispatched_tasks': 0, 'accounts': 0, 'queue_depth': queue_depth}
+
+    per_task = settings.GMAIL_SYNC_ACCOUNTS_PER_TASK
+    user_ids = list(
+        GoogleAccount.objects
+        .order_by(F('gmail_synced_at').asc(nulls_first=True))
+        .values_list('user_id', flat=True)[:capacity * per_task]
+    )
+    if not user_ids:
+        return {'dispatched_tasks': 0, 'accounts': 0, 'queue_depth': queue_depth}
+
+    # Sweep bookkeeping; sync_accounts counts down 'remaining' as chunks finish
+    sweep_id = uuid.uuid4().hex
+    sweep_key = SWEEP_KEY.format(sweep_id=sweep_id)
+    redis_client.hset(sweep_key, mapping={
+        'started_at': time.time(),
+        'accounts': len(user_ids),
+        'remaining': len(user_ids),
+        'synced': 0,
+        'skipped': 0,
+        'failed': 0,
+    })
+    redis_client.expire(sweep_key, settings.GMAIL_SYNC_SWEEP_TTL)
+
+    dispatched = 0
+    for chunk in chunked(user_ids, per_task):
+        sync_accounts.delay(chunk, sweep_id=sweep_id)
+        dispatched += 1
+
+    logger.info(
+        'Dispatched Gmail sync sweep: %s accounts in %s tasks (io queue depth %s)',
+        len(user_ids), dispatched, queue_depth
+    )
+    return {'dispatched_tasks': dispatched, 'accounts': len(user_ids), 'queue_depth': queue_depth}
+
+
+@shared_task
+def sync_accounts(user_ids: List[int], sweep_id: Optional[str] = None) -> Dict:
+    """Sync a chunk of accounts one after another"""
+    counts = {'synced': 0, 'skipped': 0, 'failed': 0}
+
+    for user_id in user_ids:
+        counts[sync_user(user_id)] += 1
+
+    if sweep_id:
+        _record_sweep_progress(sweep_id, len(user_ids), counts)
+    return counts
+
+
+def sync_user(user_id: int) -> str:
+    """
+    Run an incremental sync for one user under a per-user lock
+
+    Returns:
+        'synced', 'skipped' (another sync holds the lock) or 'failed'
+    """
+    lock_key = SYNC_LOCK_KEY.format(user_id=user_id)
+    with single_flight(lock_key, timeout=settings.GMAIL_SYNC_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return 'skipped'
+
+        try:
+            user = User.objects.select_related('google_account').get(pk=user_id)
+            result = GmailService(user).sync_emails(
+                days_back=settings.GMAIL_SYNC_DAYS_BACK,
+                max_results=settings.GMAIL_SYNC_MAX_RESULTS,
+                incremental=True
+            )
+        except Exception:
+            logger.exception('Gmail sync failed for user %s', user_id)
+            return 'failed'
+
+    logger.info(
+        'Gmail sync for user %s: fetched %s, saved %s (%s)',
+        user_id, result['fetched'], result['saved'], result['mode']
+    )
+    return 'synced'
+
+
+@shared_task(bind=True)
+def run_sync_job(self, job_id: int) -> Dict:
+    """
+    Run a sync queued by POST /api/gmail/fetch/ under the per-user sync lock
+
+    While a scheduled sync of the same user holds the lock, the job stays
+    PENDING and retries every SYNC_JOB_RETRY_DELAY seconds.
+    """
+    job = SyncJob.objects.select_related('user__google_account').get(pk=job_id)
+    if job.status not in sync_jobs.ACTIVE_STATUSES:
+        return {'status': job.status}  # Redelivered after it finished
+
+    lock_key = SYNC_LOCK_KEY.format(user_id=job.user_id)
+    with single_flight(lock_key, timeout=settings.GMAIL_SYNC_LOCK_TIMEOUT) as acquired:
+        if acquired:
+            sync_jobs.run_job(job)
+            return {'status': job.status, 'fetched': job.fetched, 'saved': job.saved}
+
+    if self.request.retries >= settings.SYNC_JOB_MAX_RETRIES:
+        sync_jobs.fail_job(job, 'Another sync of this account is still running')
+        return {'status': job.status}
+    raise self.retry(countdown=settings.SYNC_JOB_RETRY_DELAY, max_retries=settings.SYNC_JOB_MAX_RETRIES)
+
+
+def _record_sweep_progress(sweep_id: str, account_count: int, counts: Dict[str, int]):
+    """Count finished accounts and store sweep timing once the last chunk is done"""
+    redis_client = get_redis_client()
+    sweep_key = SWEEP_KEY.format(sweep_id=sweep_id)
+    if not redis_client.exists(sweep_key):
+        return  # Sweep bookkeeping expired
+
+    pipeline = redis_client.pipeline()
+    for name, value in counts.items():
+        pipeline.hincrby(sweep_key, name, value)
+    pipeline.hincrby(sweep_key, 'remaining', -account_count)
+    remaining = pipeline.execute()[-1]
+    if remaining > 0:
+        return
+
+    sweep = {key.decode(): value.decode() for key, value in redis_client.hgetall(sweep_key).items()}
+    if 'started_at' not in sweep:
+        redis_client.delete(sweep_key)  # Expired between the check and the update
+        return
+    finished_at = time.time()
+    duration = finished_at - float(sweep['started_at'])
+    redis_client.hset(LAST_SWEEP_KEY, mapping={
+        **sweep,
+        'finished_at': finished_at,
+        'sweep_id': sweep_id,
+        'duration_seconds': round(duration, 3),
+    })
+    redis_client.delete(sweep_key)
+
+    logger.info(
+        'Gmail sync sweep finished in %.1fs: %s accounts (%s synced, %s skipped, %s failed)',
+        duration, sweep['accounts'], sweep['synced'], sweep['skipped'], sweep['failed']
+    )
+
+
+def get_last_sweep_metrics() -> Dict[str, str]:
+    """Timing and outcome counts of the last completed sync sweep"""
+    return {
+        key.decode(): value.decode()
+        for key, value in get_redis_client().hgetall(LAST_SWEEP_KEY).items()
+    }
+
+
+@shared_task
+def drain_outbox() -> Dict:
+    """Queue a drain for every user with due outbox operations (run by celery beat)"""
+    user_ids = list(
+        GmailOperation.objects
+        .filter(status='PENDING', next_attempt_at__lte=timezone.now())
+        .order_by()
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    for user_id in user_ids:
+        drain_user_outbox.delay(user_id)
+    return {'users': len(user_ids)}
+
+
+@shared_task
+def drain_user_outbox(user_id: int) -> Dict:
+    """
+    Apply one user's pending Gmail operations under a per-user lock
+
+    Skipped when another worker is already draining the same outbox; it
+    will see the new rows on its next pass or the next periodic sweep.
+    """
+    lock_key = OUTBOX_LOCK_KEY.format(user_id=user_id)
+    with single_flight(lock_key, timeout=settings.GMAIL_OUTBOX_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return {'skipped': True}
+
+        user = User.objects.select_related('google_account').get(pk=user_id)
+        counts = process_outbox(user)
+
+    if any(counts.values()):
+        logger.info(
+            'Gmail outbox for user %s: %s done, %s retried, %s failed',
+            user_id, counts['done'], counts['retried'], counts['failed']
+        )
+    return counts
+
+
+@shared_task
+def hydrate_emails(user_id: int, email_ids: List[int]) -> Dict:
+    """Fetch bodies for emails that were synced in metadata format"""
+    user = User.objects.select_related('google_account').get(pk=user_id)
+    emails = list(Email.objects.filter(
+        user=user,
+        id__in=email_ids,
+        body_fetched_at__isnull=True
+    ))
+    return {'hydrated': GmailService(user).hydrate_emails(emails)}
+
+
+@shared_task
+def backfill_account(user_id: int, days: Optional[int] = None, window_days: Optional[int] = None,
+                     message_format: Optional[str] = None) -> Dict:
+    """
+    Import a user's mail history, one backfill_window task per date window
+
+    Windows already imported by an earlier run are skipped, so the task can
+    simply be queued again after a failure.
+    """
+    user = User.objects.get(pk=user_id)
+    windows = backfill.plan_backfill(user, days or settings.GMAIL_BACKFILL_DAYS, window_days)
+    for window in windows:
+        backfill_window.delay(window.pk, message_format)
+    return {'windows': len(windows)}
+
+
+@shared_task
+def backfill_window(window_id: int, message_format: Optional[str] = None) -> Dict:
+    """Import one backfill window, resuming from its checkpoint"""
+    window = backfill.claim_window(window_id)
+    if window is None:
+        return {'skipped': True}  # Done or running elsewhere
+
+    result = backfill.run_window(window, message_format)
+    logger.info(
+        'Backfilled %s for user %s: fetched %s, saved %s in %.1fs (%.1f messages/s)',
+        window, window.user_id, result['fetched'], result['saved'], result['seconds'],
+        result['fetched'] / result['seconds'] if result['seconds'] else 0.0
+    )
+    return result
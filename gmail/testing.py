@@ -0,0 +1,279 @@
+"""
+In-process fake of the Gmail REST API for tests and benchmarks
+
+``FakeGmailTransport`` implements the ``httplib2.Http.request`` interface used
+by googleapiclient, so a real Gmail service object can be built on top of it.
+Every call to ``request`` counts as one HTTP round-trip and sleeps for
+``latency`` seconds to simulate network time.
+"""
+import base64
+import json
+import threading
+import time
+import urllib.parse
+from email.parser import Parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+
+# History id of the mailbox before any message was added
+FIRST_HISTORY_ID = 1000
+
+
+def make_message(index: int, body_size: int = 2000) -> dict:
+    """Build a synthetic Gmail message resource"""
+    message_id = f'msg{index:08d}'
+    text = ('Thanks for your application to the Software Engineer position. ' * (body_size // 64 + 1))[:body_size]
+    html = f'<html><body><p>{text}</p></body></html>'
+    return {
+        'id': message_id,
+        'threadId': f'thr{index:08d}',
+        'labelIds': ['INBOX', 'UNREAD'],
+        'snippet': text[:100],
+        'historyId': str(FIRST_HISTORY_ID + 1 + index),
+        'payload': {
+            'mimeType': 'multipart/alternative',
+            'headers': [
+                {'name': 'Subject', 'value': f'Your application #{index}'},
+                {'name': 'From', 'value': f'Recruiter {index} <jobs{index % 50}@example{index % 7}.com>'},
+                {'name': 'To', 'value': 'me@example.com'},
+                {'name': 'Date', 'value': 'Mon, 13 Oct 2025 10:00:00 +0000'},
+            ],
+            'body': {'size': 0},
+            'parts': [
+                {
+                    'mimeType': 'text/plain',
+                    'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'}],
+                    'body': {'size': len(text), 'data': base64.urlsafe_b64encode(text.encode()).decode()},
+                },
+                {
+                    'mimeType': 'text/html',
+                    'headers': [{'name': 'Content-Type', 'value': 'text/html; charset="UTF-8"'}],
+                    'body': {'size': len(html), 'data': base64.urlsafe_b64encode(html.encode()).decode()},
+                },
+            ],
+        },
+    }
+
+
+class FakeGmailTransport:
+    """httplib2-compatible transport serving a synthetic mailbox"""
+
+    def __init__(self, message_count: int, latency: float = 0.01, body_size: int = 2000):
+        self.message_count = message_count
+        self.latency = latency
+        self.body_size = body_size
+        self.oldest_history_id = FIRST_HISTORY_ID
+        self.labels = {'INBOX': 'INBOX', 'UNREAD': 'UNREAD'}
+        self.modified = []  # (message ids, request body) per modify/batchModify call
+        self.drafts = []  # request bodies of drafts().create calls
+        self.rate_limited_calls = 0  # next API calls answered with 429
+        self.round_trips = 0
+        self.api_calls = 0
+        self.bytes_received = 0
+
+    @property
+    def history_id(self) -> int:
+        return FIRST_HISTORY_ID + self.message_count
+
+    def add_messages(self, count: int):
+        """Simulate new mail arriving in the mailbox"""
+        self.message_count += count
+
+    def expire_history(self):
+        """Simulate Gmail discarding all history up to now"""
+        self.oldest_history_id = self.history_id
+
+    def rate_limit(self, calls: int):
+        """Answer the next ``calls`` API calls (batch parts included) with 429"""
+        self.rate_limited_calls = calls
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.api_calls = 0
+        self.bytes_received = 0
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        parsed = urllib.parse.urlparse(uri)
+        if parsed.path.split('/')[1] == 'batch':
+            response, content = self._handle_batch(body, headers or {})
+        else:
+            status, payload = self._dispatch(method, parsed.path, urllib.parse.parse_qs(parsed.query), body)
+            response, content = self._response(status), json.dumps(payload).encode()
+        self.bytes_received += len(content)
+        return response, content
+
+    def _response(self, status: int, content_type: str = 'application/json; charset=UTF-8'):
+        return httplib2.Response({'status': str(status), 'content-type': content_type})
+
+    def _dispatch(self, method, path, query, body):
+        """Route a single API call to its handler"""
+        self.api_calls += 1
+        if self.rate_limited_calls:
+            self.rate_limited_calls -= 1
+            return 429, {'error': {'code': 429, 'message': 'Too many concurrent requests for user.'}}
+        body = json.loads(body) if body else None
+        prefix = '/gmail/v1/users/me/'
+        if not path.startswith(prefix):
+            return 404, {'error': {'code': 404, 'message': f'Unknown path {path}'}}
+        resource = path[len(prefix):]
+
+        if resource == 'messages' and method == 'GET':
+            return 200, self._list_messages(query)
+        if resource.startswith('messages/') and method == 'GET':
+            return self._get_message(resource.split('/', 1)[1], query)
+        if resource == 'history' and method == 'GET':
+            return self._list_history(query)
+        if resource == 'profile' and method == 'GET':
+            return 200, {'emailAddress': 'me@example.com', 'historyId': str(self.history_id)}
+        if resource == 'labels' and method == 'GET':
+            return 200, {'labels': [{'id': i, 'name': name} for name, i in self.labels.items()]}
+        if resource == 'labels' and method == 'POST':
+            return self._create_label(body)
+        if resource.startswith('messages/') and resource.endswith('/modify') and method == 'POST':
+            self.modified.append(([resource.split('/')[1]], body))
+            return 200, {'id': resource.split('/')[1]}
+        if resource == 'messages/batchModify' and method == 'POST':
+            self.modified.append((body['ids'], body))
+            return 204, {}
+        if resource == 'drafts' and method == 'POST':
+            self.drafts.append(body)
+            return 200, {'id': f'r-{len(self.drafts)}', 'message': {'id': f'draft{len(self.drafts)}'}}
+        return 404, {'error': {'code': 404, 'message': f'Unsupported call {method} {path}'}}
+
+    def _list_messages(self, query):
+        max_results = min(int(query.get('maxResults', ['100'])[0]), 500)
+        start = int(query.get('pageToken', ['0'])[0])
+        end = min(start + max_results, self.message_count)
+        result = {
+            'messages': [
+                {'id': f'msg{i:08d}', 'threadId': f'thr{i:08d}'} for i in range(start, end)
+            ],
+            'resultSizeEstimate': self.message_count,
+        }
+        if end < self.message_count:
+            result['nextPageToken'] = str(end)
+        return result
+
+    def _create_label(self, body):
+        if body['name'] in self.labels:
+            return 409, {'error': {'code': 409, 'message': 'Label name exists or conflicts'}}
+        label_id = f'Label_{len(self.labels)}'
+        self.labels[body['name']] = label_id
+        return 200, {'id': label_id, 'name': body['name']}
+
+    def _list_history(self, query):
+        start = int(query['startHistoryId'][0])
+        if start < self.oldest_history_id:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        first_index = max(start - FIRST_HISTORY_ID, 0)
+        history = [
+            {
+                'id': str(FIRST_HISTORY_ID + 1 + i),
+                'messagesAdded': [{'message': {
+                    'id': f'msg{i:08d}', 'threadId': f'thr{i:08d}', 'labelIds': ['INBOX', 'UNREAD']
+                }}],
+            }
+            for i in range(first_index, self.message_count)
+        ]
+        return 200, {'history': history, 'historyId': str(self.history_id)}
+
+    def _get_message(self, message_id, query):
+        try:
+            index = int(message_id.replace('msg', ''))
+        except ValueError:
+            index = -1
+        if not 0 <= index < self.message_count:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        message = make_message(index, self.body_size)
+        if query.get('format', ['full'])[0] == 'metadata':
+            # Headers only, limited to metadataHeaders when given
+            wanted = set(query.get('metadataHeaders', []))
+            headers = message['payload']['headers']
+            message['payload'] = {
+                'mimeType': message['payload']['mimeType'],
+                'headers': [h for h in headers if not wanted or h['name'] in wanted],
+            }
+        return 200, message
+
+    def _handle_batch(self, body, headers):
+        """Answer a multipart/mixed batch request part by part"""
+        content_type = headers.get('content-type') or headers.get('Content-Type')
+        message = Parser().parsestr(f'Content-Type: {content_type}\r\n\r\n{body}')
+        boundary = 'batch_fake_gmail_boundary'
+        chunks = []
+
+        for part in message.get_payload():
+            head, _, part_body = part.get_payload().replace('\r\n', '\n').partition('\n\n')
+            method, url, _ = head.split('\n', 1)[0].strip().split(' ', 2)
+            parsed = urllib.parse.urlparse(url)
+            status, payload = self._dispatch(
+                method, parsed.path, urllib.parse.parse_qs(parsed.query), part_body.strip() or None
+            )
+            content_id = ' '.join(part['Content-ID'].split()).strip('<>')
+            chunks.append(
+                f'--{boundary}\r\n'
+                f'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status} OK\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n\r\n'
+                f'{json.dumps(payload)}\r\n'
+            )
+        chunks.append(f'--{boundary}--\r\n')
+
+        response = self._response(200, f'multipart/mixed; boundary={boundary}')
+        return response, ''.join(chunks).encode()
+
+
+def build_fake_gmail_service(transport: FakeGmailTransport):
+    """Build a googleapiclient Gmail service that talks to ``transport``"""
+    from accounts.utils import build_google_service
+    return build_google_service('gmail', 'v1', http=transport)
+
+
+class FakeGmailServer(ThreadingHTTPServer):
+    """
+    Serve a FakeGmailTransport over real HTTP on localhost
+
+    For load tests of the web server: point GMAIL_API_ROOT_URL at ``url``.
+    Requests are handled on their own threads, so ``latency`` overlaps
+    across concurrent requests; the transport's counters are approximate.
+    """
+    daemon_threads = True
+
+    def __init__(self, transport: FakeGmailTransport, port: int = 0):
+        self.transport = transport
+        super().__init__(('127.0.0.1', port), _FakeGmailHandler)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def start(self) -> 'FakeGmailServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _FakeGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else None
+        response, content = self.server.transport.request(
+            f'http://fake{self.path}', self.command, body, dict(self.headers)
+        )
+        self.send_response(int(response['status']))
+        self.send_header('Content-Type', response['content-type'])
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
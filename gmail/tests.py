@@ -1,3 +1,687 @@
-from django.test import TestCase
+import base64
+import json
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import fakeredis
+import redis
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import DomainFilter, GoogleAccount
+from core.redis import get_redis_client
+from gmail import async_views, backfill, mime, outbox, quota as quota_module, tasks
+from gmail.async_service import AsyncGmailService
+from gmail.mime import extract_body
+from gmail.models import BackfillWindow, Email, EmailBody, GmailOperation, SyncJob
+from gmail.quota import GmailQuota, get_quota_counters
+from gmail.services import GmailService
+from gmail.testing import FakeGmailServer, FakeGmailTransport, build_fake_gmail_service
+
+
+class GmailServiceTestCase(TestCase):
+    """Tests for GmailService against the fake Gmail transport"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        GoogleAccount.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        self.transport = FakeGmailTransport(message_count=120, latency=0)
+        self.gmail_service = GmailService(
+            self.user,
+            service=build_fake_gmail_service(self.transport)
+        )
+
+    def test_batched_fetch_uses_one_round_trip_per_batch(self):
+        """Test that message details are fetched in batch requests"""
+        emails = self.gmail_service.fetch_recent_emails(max_results=120, batch_size=50)
+
+        self.assertEqual(len(emails), 120)
+        # One list call plus three batches of 50/50/20
+        self.assertEqual(self.transport.round_trips, 4)
+        self.assertEqual(emails[0]['gmail_id'], 'msg00000000')
+        self.assertEqual(emails[0]['sender_email'], 'jobs0@example0.com')
+
+    def test_batched_fetch_matches_serial_fetch(self):
+        """Test that batched and serial fetches produce the same emails"""
+        batched = self.gmail_service.fetch_recent_emails(max_results=20, batch_size=7)
+        serial = self.gmail_service.fetch_recent_emails(max_results=20, batch_size=1)
+
+        self.assertEqual(batched, serial)
+
+    def test_batched_fetch_skips_failed_messages(self):
+        """Test that a failing message is dropped without failing the batch"""
+        emails = self.gmail_service._fetch_email_details_batch(
+            ['msg00000001', 'missing', 'msg00000002'],
+            batch_size=50
+        )
+
+        self.assertEqual([e['gmail_id'] for e in emails], ['msg00000001', 'msg00000002'])
+
+    def test_incremental_sync_fetches_only_new_messages(self):
+        """Test that incremental sync uses the history cursor after the first sync"""
+        first = self.gmail_service.sync_emails(max_results=500, incremental=True)
+        self.assertEqual(first['mode'], 'full')
+        self.assertEqual(first['saved'], 120)
+
+        self.transport.add_messages(5)
+        self.transport.reset_counters()
+        second = self.gmail_service.sync_emails(max_results=500, incremental=True)
+
+        self.assertEqual(second['mode'], 'incremental')
+        self.assertEqual((second['fetched'], second['saved']), (5, 5))
+        # One history call plus one batch request
+        self.assertEqual(self.transport.round_trips, 2)
+        self.user.google_account.refresh_from_db()
+        self.assertEqual(self.user.google_account.gmail_history_id, str(self.transport.history_id))
+
+    def test_incremental_sync_falls_back_when_cursor_expired(self):
+        """Test that an expired history cursor triggers a full sync"""
+        self.gmail_service.sync_emails(max_results=500, incremental=True)
+        self.transport.add_messages(3)
+        self.transport.expire_history()
+        self.gmail_service.google_account.gmail_history_id = '1001'
+
+        result = self.gmail_service.sync_emails(max_results=500, incremental=True)
+
+        self.assertEqual(result['mode'], 'full')
+        self.assertEqual(result['saved'], 3)
+
+    def test_fetch_follows_next_page_token(self):
+        """Test that listing pages through results up to max_results"""
+        transport = FakeGmailTransport(message_count=1200, latency=0)
+        gmail_service = GmailService(self.user, service=build_fake_gmail_service(transport))
+
+        result = gmail_service.sync_emails(max_results=1100, batch_size=100)
+
+        self.assertEqual((result['fetched'], result['saved']), (1100, 1100))
+        # Three list pages (500/500/100) plus eleven batches of 100
+        self.assertEqual(transport.round_trips, 14)
+
+    def test_save_reports_only_new_rows(self):
+        """Test that bulk saving skips emails that are already stored"""
+        emails = self.gmail_service.fetch_recent_emails(max_results=30)
+        self.assertEqual(self.gmail_service.save_emails_to_db(emails[:10]), 10)
+
+        # Existence check, then the bulk insert wrapped in a savepoint
+        with self.assertNumQueries(4):
+            saved = self.gmail_service.save_emails_to_db(emails, chunk_size=100)
+
+        self.assertEqual(saved, 20)
+        self.assertEqual(Email.objects.count(), 30)
+
+    def test_save_tolerates_concurrent_inserts(self):
+        """Test that rows inserted by a concurrent sync are not double counted"""
+        emails = self.gmail_service.fetch_recent_emails(max_results=5)
+        # Another worker stores the first email after our existence check ran
+        self.gmail_service._build_email(emails[0]).save()
+
+        with mock.patch.object(Email.objects, 'filter') as filter_mock:
+            filter_mock.return_value.order_by.return_value.values_list.return_value = []
+            saved = self.gmail_service.save_emails_to_db(emails)
+
+        self.assertEqual(saved, 4)
+        self.assertEqual(Email.objects.count(), 5)
+
+    def test_label_ids_are_cached(self):
+        """Test that adding labels lists labels once and reuses the cached id"""
+        self.gmail_service.add_label('msg00000001', 'Job Tracker/Processed')
+        self.transport.reset_counters()
+        self.gmail_service.add_label('msg00000002', 'Job Tracker/Processed')
+
+        # Only the modify call, no labels().list
+        self.assertEqual(self.transport.api_calls, 1)
+        self.assertEqual(self.transport.modified[-1][1]['addLabelIds'], ['Label_2'])
+
+    def test_batch_modify_chunks_message_ids(self):
+        """Test that many messages are labelled with a few batchModify calls"""
+        message_ids = [f'msg{i:08d}' for i in range(2500)]
+
+        calls = self.gmail_service.add_label_many(message_ids, 'Job Tracker/Interview')
+
+        self.assertEqual(calls, 3)
+        self.assertEqual([len(ids) for ids, _ in self.transport.modified], [1000, 1000, 500])
+
+
+    def test_metadata_sync_defers_bodies_until_hydrated(self):
+        """Test that metadata sync stores headers only and bodies are fetched later"""
+        self.gmail_service.sync_emails(max_results=10, message_format='metadata')
+        metadata_bytes = self.transport.bytes_received
+
+        emails = list(Email.objects.all())
+        self.assertEqual(len(emails), 10)
+        self.assertTrue(all(e.body_fetched_at is None and e.snippet for e in emails))
+        self.assertFalse(EmailBody.objects.exists())
+
+        self.transport.reset_counters()
+        hydrated = self.gmail_service.hydrate_emails(emails)
+
+        self.assertEqual(hydrated, 10)
+        self.assertEqual(self.transport.round_trips, 1)
+        self.assertGreater(self.transport.bytes_received, metadata_bytes)
+        email = Email.objects.select_related('body').get(gmail_id='msg00000003')
+        self.assertIn('Software Engineer', email.body.plain)
+        self.assertIsNotNone(email.body_fetched_at)
+
+    def test_blocked_sender_domains_are_skipped(self):
+        """Test that blocked domains are excluded from the query and dropped on headers"""
+        DomainFilter.objects.create(user=self.user, domain='example1.com', is_allowed=False)
+
+        self.assertIn('-from:example1.com', self.gmail_service._build_query(7))
+        # The fake ignores the search query, so the header check has to catch them
+        result = self.gmail_service.sync_emails(max_results=70)
+
+        self.assertEqual(result['saved'], 60)
+        self.assertFalse(Email.objects.filter(sender__endswith='@example1.com').exists())
+
+
+@override_settings(GMAIL_SYNC_MAX_QUEUE_DEPTH=4, GMAIL_SYNC_ACCOUNTS_PER_TASK=2)
+class SyncSweepTestCase(TestCase):
+    """Tests for the scheduled sync sweep"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        for target in ('core.redis.get_redis_client', 'gmail.tasks.get_redis_client'):
+            patcher = mock.patch(target, return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        now = timezone.now()
+        self.user_ids = []
+        # Created newest-synced first so ordering cannot come from insertion order
+        for index, synced_at in enumerate([now, now - timedelta(hours=1), now - timedelta(hours=2), None]):
+            user = User.objects.create(username=f'user{index}', email=f'user{index}@example.com')
+            GoogleAccount.objects.create(
+                user=user,
+                access_token='access',
+                refresh_token='refresh',
+                token_expiry=now + timedelta(hours=1),
+                gmail_synced_at=synced_at,
+            )
+            self.user_ids.append(user.pk)
+
+    def dispatch(self):
+        with mock.patch.object(tasks.sync_accounts, 'delay') as delay:
+            result = tasks.dispatch_sync()
+        return result, [call.args[0] for call in delay.call_args_list], [call.kwargs for call in delay.call_args_list]
+
+    def test_dispatches_oldest_synced_accounts_first(self):
+        """Test that never-synced accounts go first, then the least recently synced"""
+        result, chunks, _ = self.dispatch()
+
+        self.assertEqual(result['accounts'], 4)
+        self.assertEqual(chunks, [self.user_ids[:1:-1], self.user_ids[1::-1]])
+
+    def test_io_queue_depth_shrinks_or_skips_the_sweep(self):
+        """Test that a backed-up io queue limits the sweep to the remaining capacity"""
+        self.redis.rpush('io', *['task'] * 3)
+        result, chunks, _ = self.dispatch()
+
+        self.assertEqual((result['dispatched_tasks'], result['queue_depth']), (1, 3))
+        self.assertEqual(chunks, [[self.user_ids[3], self.user_ids[2]]])
+
+        self.redis.rpush('io', 'task')
+        result, chunks, _ = self.dispatch()
+
+        self.assertEqual(result['dispatched_tasks'], 0)
+        self.assertEqual(chunks, [])
+
+    def test_held_lock_skips_the_user(self):
+        """Test that a user whose sync lock is held elsewhere is skipped without calling Gmail"""
+        lock = self.redis.lock(tasks.SYNC_LOCK_KEY.format(user_id=self.user_ids[0]), timeout=60)
+        self.assertTrue(lock.acquire(blocking=False))
+
+        with mock.patch('gmail.tasks.GmailService') as service_class:
+            self.assertEqual(tasks.sync_user(self.user_ids[0]), 'skipped')
+        service_class.assert_not_called()
+
+    def test_last_sweep_metrics_aggregate_all_chunks(self):
+        """Test that sweep metrics are recorded once the last chunk finishes"""
+        _, chunks, kwargs = self.dispatch()
+        sweep_id = kwargs[0]['sweep_id']
+        sweep_key = tasks.SWEEP_KEY.format(sweep_id=sweep_id)
+        self.assertGreater(self.redis.ttl(sweep_key), 0)
+
+        outcomes = iter(['synced', 'failed', 'synced', 'skipped'])
+        with mock.patch('gmail.tasks.sync_user', side_effect=lambda user_id: next(outcomes)):
+            tasks.sync_accounts(chunks[0], sweep_id=sweep_id)
+            self.assertEqual(tasks.get_last_sweep_metrics(), {})
+            tasks.sync_accounts(chunks[1], sweep_id=sweep_id)
+
+        metrics = tasks.get_last_sweep_metrics()
+        self.assertEqual(metrics['sweep_id'], sweep_id)
+        self.assertEqual(
+            {name: metrics[name] for name in ('accounts', 'remaining', 'synced', 'skipped', 'failed')},
+            {'accounts': '4', 'remaining': '0', 'synced': '2', 'skipped': '1', 'failed': '1'}
+        )
+        self.assertIn('duration_seconds', metrics)
+        self.assertFalse(self.redis.exists(sweep_key))
+
+
+class MimeTestCase(TestCase):
+    """Tests for body extraction from message payloads"""
+
+    def part(self, mime_type, content, charset='utf-8', **extra):
+        data = base64.urlsafe_b64encode(content.encode(charset)).decode().rstrip('=')
+        return {
+            'mimeType': mime_type,
+            'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'}],
+            'body': {'size': len(data), 'data': data},
+            **extra,
+        }
+
+    def multipart(self, mime_type, *parts):
+        return {'mimeType': mime_type, 'body': {'size': 0}, 'parts': list(parts)}
+
+    def test_walks_nested_parts_and_skips_attachments(self):
+        """Test that text is joined across mixed parts, alternatives and deep nesting"""
+        payload = self.multipart(
+            'multipart/mixed',
+            self.multipart(
+                'multipart/alternative',
+                self.part('text/plain', 'Hello'),
+                self.part('text/html', '<p>Hello</p>'),
+            ),
+            self.part('text/plain', 'report,data', filename='report.csv'),
+            self.part('text/plain', ' again'),
+        )
+        for _ in range(2000):  # Deeper than the recursion limit
+            payload = self.multipart('multipart/related', payload)
+
+        self.assertEqual(extract_body(payload), {'text': 'Hello again', 'html': '<p>Hello</p>'})
+
+    def test_honours_charset_and_size_cap(self):
+        """Test that parts are decoded with their charset and long bodies truncated"""
+        body = extract_body(self.part('text/plain', 'Café résumé', charset='iso-8859-1'))
+        self.assertEqual(body['text'], 'Café résumé')
+
+        body = extract_body(self.part('text/html', 'x' * 100), max_bytes=10)
+        self.assertEqual(body['html'], 'x' * 10 + mime.TRUNCATION_MARKERS['html'])
+
+
+def redis_available() -> bool:
+    try:
+        return get_redis_client().ping()
+    except Exception:
+        return False
+
+
+@override_settings(GMAIL_RETRY_BASE_DELAY=0)
+class GmailQuotaTestCase(TestCase):
+    """Tests for Gmail rate limiting and retries"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        GoogleAccount.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        self.transport = FakeGmailTransport(message_count=20, latency=0)
+        self.gmail_service = GmailService(
+            self.user,
+            service=build_fake_gmail_service(self.transport)
+        )
+
+    def test_rate_limited_calls_are_retried(self):
+        """Test that 429s on single calls and on batch parts are retried"""
+        self.transport.rate_limit(2)
+        message_ids = list(self.gmail_service._iter_message_ids('', max_results=10))
+        self.assertEqual(len(message_ids), 10)
+
+        # Three parts of one batch are rejected and sent again in a second batch
+        self.transport.rate_limit(3)
+        self.transport.reset_counters()
+        emails = self.gmail_service._fetch_email_details_batch(message_ids, batch_size=10)
+
+        self.assertEqual([e['gmail_id'] for e in emails], message_ids)
+        self.assertEqual(self.transport.round_trips, 2)
+        counters = get_quota_counters()
+        self.assertEqual(counters['retried'], 5)
+        self.assertEqual(counters['units:gmail.users.messages.get'], 65)
+
+    @override_settings(GMAIL_MAX_RETRIES=1)
+    def test_exhausted_retries_fail_the_sync(self):
+        """Test that a sync still rate limited after its retries raises instead of saving nothing"""
+        self.transport.rate_limit(1000)
+
+        with self.assertRaises(HttpError):
+            self.gmail_service.sync_emails(max_results=10)
+        with self.assertRaises(HttpError):
+            self.gmail_service.fetch_recent_emails(max_results=10)
+        self.assertEqual(get_quota_counters()['failed'], 2)
+
+    def test_counter_errors_do_not_fail_calls(self):
+        """Test that Gmail calls still go through while the counter cache is unreachable"""
+        broken_cache = mock.Mock()
+        broken_cache.incr.side_effect = broken_cache.add.side_effect = redis.exceptions.ConnectionError()
+
+        with mock.patch('gmail.quota.cache', broken_cache), self.assertLogs('gmail.quota', level='WARNING'):
+            emails = self.gmail_service.fetch_recent_emails(max_results=5)
+        self.assertEqual(len(emails), 5)
+
+    @skipUnless(redis_available(), 'token buckets require Redis')
+    @override_settings(GMAIL_QUOTA_ENABLED=True, GMAIL_QUOTA_USER_RATE=100, GMAIL_QUOTA_USER_BURST=100)
+    def test_user_bucket_throttles_calls(self):
+        """Test that calls beyond the user's burst wait for the bucket to refill"""
+        quota = GmailQuota(self.user.pk)
+        get_redis_client().delete(quota_module.USER_BUCKET_KEY.format(user_id=self.user.pk))
+
+        started = time.perf_counter()
+        quota.acquire(100)
+        quota.acquire(50)
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.45)
+        self.assertEqual(get_quota_counters()['throttled'], 1)
+
+
+class GmailOutboxTestCase(TestCase):
+    """Tests for the Gmail operation outbox"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        GoogleAccount.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        self.transport = FakeGmailTransport(message_count=10, latency=0)
+        self.gmail_service = GmailService(
+            self.user,
+            service=build_fake_gmail_service(self.transport)
+        )
+
+    def make_emails(self, count):
+        return [
+            Email.objects.create(
+                user=self.user,
+                gmail_id=f'msg{i:08d}',
+                thread_id=f'thr{i:08d}',
+                subject='Application',
+                sender='jobs@example.com',
+                received_at=timezone.now(),
+            )
+            for i in range(count)
+        ]
+
+    def test_operations_are_coalesced_into_batch_calls(self):
+        """Test that queued operations cost one Gmail call per label change"""
+        emails = self.make_emails(6)
+        for email in emails[:3]:
+            outbox.enqueue(self.user, outbox.MARK_READ, [email])
+        outbox.enqueue(self.user, outbox.ADD_LABEL, emails, {'label': 'Job Tracker/Processed'})
+        self.transport.reset_counters()
+
+        counts = outbox.process_outbox(self.user, gmail_service=self.gmail_service)
+
+        self.assertEqual(counts, {'done': 9, 'retried': 0, 'failed': 0})
+        # One batchModify per group, plus two label lists and a create for the new label
+        self.assertEqual(self.transport.api_calls, 5)
+        self.assertEqual(len(self.transport.modified), 2)
+        self.assertFalse(GmailOperation.objects.exclude(status='DONE').exists())
+
+    def test_failed_operations_are_retried_with_backoff(self):
+        """Test that a failing group is rescheduled and the rest still applied"""
+        email = self.make_emails(1)[0]
+        outbox.enqueue(self.user, outbox.MARK_READ, [email])
+        outbox.enqueue(self.user, outbox.CREATE_DRAFT, [email], {
+            'to': 'recruiter@example.com', 'subject': 'Re: Application', 'body': 'Thanks!'
+        })
+
+        with mock.patch.object(GmailService, 'mark_as_read_many', side_effect=RuntimeError('quota')):
+            counts = outbox.process_outbox(self.user, gmail_service=self.gmail_service)
+
+        self.assertEqual(counts, {'done': 1, 'retried': 1, 'failed': 0})
+        failed = GmailOperation.objects.get(operation=outbox.MARK_READ)
+        self.assertEqual((failed.status, failed.attempts, failed.last_error), ('PENDING', 1, 'quota'))
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        email.refresh_from_db()
+        self.assertEqual(email.draft_id, 'r-1')
+
+        # Not due yet
+        self.assertEqual(outbox.process_outbox(self.user, gmail_service=self.gmail_service)['done'], 0)
+
+    def test_service_errors_back_off_the_whole_batch(self):
+        """Test that failing to build the Gmail service reschedules every loaded operation"""
+        emails = self.make_emails(2)
+        outbox.enqueue(self.user, outbox.MARK_READ, emails)
+
+        with mock.patch('gmail.outbox.GmailService', side_effect=RuntimeError('invalid_grant')):
+            counts = outbox.process_outbox(self.user)
+
+        self.assertEqual(counts, {'done': 0, 'retried': 2, 'failed': 0})
+        for operation in GmailOperation.objects.all():
+            self.assertEqual(
+                (operation.status, operation.attempts, operation.last_error), ('PENDING', 1, 'invalid_grant')
+            )
+            self.assertGreater(operation.next_attempt_at, timezone.now())
+
+
+class AsyncGmailTestCase(TestCase):
+    """Tests for the async Gmail path against the fake Gmail server over HTTP"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        GoogleAccount.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        self.transport = FakeGmailTransport(message_count=40, latency=0.2)
+        server = FakeGmailServer(self.transport).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        settings_override = override_settings(GMAIL_API_ROOT_URL=server.url, GMAIL_ASYNC_CONCURRENCY=4)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_hydration_fetches_batches_concurrently(self):
+        """Test that the batches of one hydration are in flight together"""
+        emails = [
+            Email.objects.create(
+                user=self.user, gmail_id=f'msg{i:08d}', thread_id=f'thr{i:08d}', subject='Application',
+                sender='jobs@example.com', recipient='tester@example.com', received_at=timezone.now(),
+            )
+            for i in range(40)
+        ]
+        gmail_service = async_to_sync(AsyncGmailService.for_user)(self.user)
+
+        started = time.perf_counter()
+        hydrated = async_to_sync(gmail_service.hydrate_emails)(emails, batch_size=10)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(hydrated, 40)
+        self.assertEqual(EmailBody.objects.filter(email__user=self.user).count(), 40)
+        # Four batches overlapping instead of 4 x 0.2s in a row
+        self.assertEqual(self.transport.round_trips, 4)
+        self.assertLess(elapsed, 0.6)
+
+    def test_email_detail_hydrates_body(self):
+        """Test the async detail view authenticates, fetches the body and renders"""
+        email = Email.objects.create(
+            user=self.user, gmail_id='msg00000003', thread_id='thr00000003', subject='Application',
+            sender='jobs@example.com', recipient='tester@example.com', received_at=timezone.now(),
+        )
+        factory = AsyncRequestFactory()
+        token = RefreshToken.for_user(self.user).access_token
+
+        response = async_to_sync(async_views.email_detail)(factory.get('/'), email_id=email.id)
+        self.assertEqual(response.status_code, 401)
+
+        request = factory.get('/', headers={'Authorization': f'Bearer {token}'})
+        response = async_to_sync(async_views.email_detail)(request, email_id=email.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Software Engineer', json.loads(response.content)['body_plain'])
+
+
+@override_settings(SYNC_JOB_EVENTS_POLL_INTERVAL=0)
+class SyncJobTestCase(TestCase):
+    """Tests for syncs queued by the fetch endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        GoogleAccount.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        self.transport = FakeGmailTransport(message_count=30)
+        for patcher in (
+            mock.patch.object(GmailService, 'build_service',
+                              side_effect=lambda: build_fake_gmail_service(self.transport)),
+            # No Redis here: the per-user sync lock is always free
+            mock.patch('gmail.tasks.single_flight', side_effect=lambda *args, **kwargs: nullcontext(True)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+
+    def test_fetch_queues_job_and_reports_progress(self):
+        """Test that fetch returns a job at once and the worker records its counts"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/gmail/fetch/', {'max_results': 30, 'batch_size': 10})
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual((job['status'], job['remaining']), ('PENDING', None))
+        self.assertEqual(response['Location'], job['status_url'])
+
+        # A retried request gets the queued job instead of a second sync
+        response = self.client.post('/api/gmail/fetch/', {'max_results': 30})
+        self.assertEqual(response.json()['id'], job['id'])
+        self.assertEqual(SyncJob.objects.count(), 1)
+
+        for callback in callbacks:
+            callback()  # Run the worker
+
+        status = self.client.get(job['status_url']).json()
+        self.assertEqual(status['status'], 'DONE')
+        self.assertEqual(
+            (status['total'], status['processed'], status['fetched'], status['saved'], status['remaining']),
+            (30, 30, 30, 30, 0)
+        )
+        self.assertEqual(Email.objects.filter(user=self.user).count(), 30)
+
+    @override_settings(GMAIL_SYNC_CHUNK_SIZE=5)
+    def test_progress_is_reported_while_ids_are_listed(self):
+        """Test that ids stay lazily listed and each listed page reports progress"""
+        snapshots = []
+        with mock.patch('gmail.services.GMAIL_MAX_PAGE_SIZE', 10):
+            GmailService(self.user).sync_emails(
+                max_results=30, batch_size=5, on_progress=lambda progress: snapshots.append(dict(progress))
+            )
+
+        self.assertEqual(snapshots[0], {'total': 10, 'processed': 0, 'fetched': 0, 'saved': 0})
+        # The next page is only listed once the previous one was fetched
+        second_page = next(snapshot for snapshot in snapshots if snapshot['total'] == 20)
+        self.assertEqual(second_page['processed'], 10)
+        self.assertEqual(snapshots[-1], {'total': 30, 'processed': 30, 'fetched': 30, 'saved': 30})
+
+    def test_events_stream_progress_and_new_emails(self):
+        """Test the ASGI event stream sends progress, the job's emails and a done event"""
+        with self.captureOnCommitCallbacks(execute=True):
+            job = self.client.post('/api/gmail/fetch/', {'max_results': 12}).json()
+        # Streams would hold a sync worker each, so WSGI only serves the status URL
+        self.assertIsNone(job['events_url'])
+        self.assertEqual(self.client.get(f'/api/gmail/sync-jobs/{job["id"]}/events/').status_code, 404)
+
+        token = RefreshToken.for_user(self.user).access_token
+
+        async def read_events(last_event_id=None):
+            headers = {'Authorization': f'Bearer {token}', 'Accept': 'text/event-stream'}
+            if last_event_id:
+                headers['Last-Event-ID'] = str(last_event_id)
+            request = AsyncRequestFactory().get('/', headers=headers)
+            response = await async_views.sync_job_events(request, job_id=job['id'])
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            return b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        content = async_to_sync(read_events)()
+        self.assertEqual(content.count('event: email'), 12)
+        self.assertIn('event: progress', content)
+        self.assertTrue(content.rstrip().split('\n\n')[-1].startswith('event: done'))
+
+        # Reconnecting resumes after the last email received
+        last_id = Email.objects.filter(user=self.user).order_by('id')[9].id
+        self.assertEqual(async_to_sync(read_events)(last_id).count('event: email'), 2)
+
+
+class BackfillTestCase(TestCase):
+    """Tests for the windowed history import"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='tester', email='tester@example.com')
+        GoogleAccount.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            token_expiry=timezone.now() + timedelta(hours=1),
+        )
+        # The fake mailbox ignores the date range: every window lists all 120 messages
+        self.transport = FakeGmailTransport(message_count=120, latency=0)
+        patcher = mock.patch.object(
+            GmailService, 'build_service', side_effect=lambda: build_fake_gmail_service(self.transport)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_windows_cover_the_range_on_a_fixed_grid(self):
+        """Test that windows are contiguous, cover the range and are reused by later plans"""
+        now = timezone.now()
+        windows = sorted(backfill.plan_backfill(self.user, days=90, window_days=30, now=now), key=lambda w: w.start)
+
+        self.assertLessEqual(windows[0].start, now - timedelta(days=90))
+        self.assertGreater(windows[-1].end, now)
+        for window, following in zip(windows, windows[1:]):
+            self.assertEqual(window.end - window.start, timedelta(days=30))
+            self.assertEqual(window.end, following.start)
+
+        later = backfill.plan_backfill(self.user, days=90, window_days=30, now=now + timedelta(hours=1))
+        self.assertEqual({w.pk for w in later}, {w.pk for w in windows})
+
+    def test_command_resumes_interrupted_windows(self):
+        """Test that a window interrupted mid-way continues from its page checkpoint"""
+        windows = backfill.plan_backfill(self.user, days=60, window_days=30)
+        oldest = windows[-1]
+        BackfillWindow.objects.filter(pk=oldest.pk).update(
+            status='RUNNING', page_token='100', fetched=100, saved=100,
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        out = StringIO()
+        call_command('backfill_gmail', 'tester', '--days', '60', '--window-days', '30', '--workers', '1', stdout=out)
+
+        self.assertIn('messages/s', out.getvalue())
+        self.assertEqual(Email.objects.filter(user=self.user).count(), 120)
+        self.assertEqual(
+            set(BackfillWindow.objects.filter(user=self.user).values_list('status', flat=True)), {'DONE'}
+        )
+        oldest.refresh_from_db()
+        self.assertEqual((oldest.fetched, oldest.page_token), (120, ''))
+
+        out = StringIO()
+        call_command('backfill_gmail', 'tester@example.com', '--days', '60', '--window-days', '30', stdout=out)
+        self.assertIn('Nothing to do', out.getvalue())
@@ -1,15 +1,30 @@
 """
 Gmail URL configuration
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Gmail-bound endpoints run on the event loop when served over ASGI
+gmail_views = views
+if settings.ASGI_MODE:
+    from . import async_views as gmail_views
+
 app_name = 'gmail'
 
 urlpatterns = [
     # Email operations
-    path('fetch/', views.fetch_emails, name='fetch_emails'),
+    path('fetch/', gmail_views.fetch_emails, name='fetch_emails'),
     path('', views.list_emails, name='list_emails'),
-    path('<int:email_id>/', views.email_detail, name='email_detail'),
-    path('<int:email_id>/create-application/', views.create_application_from_email, name='create_application'),
-]
\ No newline at end of file
+    path('<int:email_id>/', gmail_views.email_detail, name='email_detail'),
+    path('<int:email_id>/create-application/', gmail_views.create_application_from_email, name='create_application'),
+    
+    # Background sync jobs
+    path('sync-jobs/<int:job_id>/', views.sync_job_detail, name='sync_job'),
+]
+
+if settings.ASGI_MODE:
+    # Event streams would hold a sync worker each on WSGI; poll the job there
+    urlpatterns.append(
+        path('sync-jobs/<int:job_id>/events/', gmail_views.sync_job_events, name='sync_job_events')
+    )
\ No newline at end of file
@@ -1,65 +1,126 @@
 """
 Gmail API views
 """
+import logging
+from typing import Dict, Optional, Tuple
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.db import transaction
+from django.urls import reverse
+
+from core.pagination import KeysetPagination
+from core.search import search_emails
+from core.versioning import cached_user_response
+from gmail import outbox
+from gmail.models import Email, SyncJob
+from gmail.serializers import EmailSerializer, EmailListSerializer, SyncJobSerializer
+from gmail.services import GmailService, PROCESSED_LABEL
+from gmail.sync_jobs import start_sync_job
+from gmail.tasks import hydrate_emails
+
+logger = logging.getLogger(__name__)
+
 
-from gmail.models import Email
-from gmail.serializers import EmailSerializer, EmailListSerializer
-from gmail.services import GmailService
+EMAIL_LIST_FIELDS = ['id', 'subject', 'sender', 'received_at', 'category', 'sub_category', 'application_id']
+
+
+class EmailCursorPagination(KeysetPagination):
+    ordering = '-received_at'
+    page_size = 20
+    max_page_size = 100
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def fetch_emails(request):
     """
-    Fetch recent emails from Gmail
+    Queue a sync of recent emails from Gmail
     
     Request body:
     {
         "days_back": 7,  // optional, default 7
-        "max_results": 50  // optional, default 50
+        "max_results": 50,  // optional, default 50
+        "batch_size": 50,  // optional, default GMAIL_BATCH_SIZE, 1 disables batching
+        "incremental": false,  // optional, fetch only messages added since the last sync
+        "format": "metadata"  // optional, "metadata" or "full" (default GMAIL_SYNC_FORMAT)
     }
+    
+    Responds 202 with the sync job; poll ``status_url`` or, in ASGI mode,
+    stream ``events_url`` for progress. While a sync of the user is queued or
+    running, that job is returned instead of starting another.
+    """
+    params, error = get_fetch_params(request)
+    if error:
+        return error
+    
+    job, created = start_sync_job(request.user, params)
+    return sync_job_response(job, created)
+
+
+def get_fetch_params(request) -> Tuple[Optional[Dict], Optional[Response]]:
+    """
+    Read fetch_emails parameters from the request body
+    
+    Returns:
+        Tuple of (sync_emails keyword arguments, None) or (None, error response)
     """
     # Check if user has Google account
     if not hasattr(request.user, 'google_account'):
-        return Response(
+        return None, Response(
             {'error': 'Google account not connected'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Get parameters
-    days_back = request.data.get('days_back', 7)
-    max_results = request.data.get('max_results', 50)
-    
+    # Get parameters (stored on the sync job, so as plain ints)
     try:
-        # Initialize Gmail service
-        gmail_service = GmailService(request.user)
-        
-        # Fetch emails
-        emails = gmail_service.fetch_recent_emails(
-            days_back=days_back,
-            max_results=max_results
+        days_back = int(request.data.get('days_back', 7))
+        max_results = int(request.data.get('max_results', 50))
+        batch_size = request.data.get('batch_size')
+        batch_size = int(batch_size) if batch_size is not None else None
+    except (TypeError, ValueError):
+        return None, Response(
+            {'error': 'days_back, max_results and batch_size must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        
-        # Save to database
-        saved_count = gmail_service.save_emails_to_db(emails)
-        
-        return Response({
-            'fetched': len(emails),
-            'saved': saved_count,
-            'message': f'Fetched {len(emails)} emails, saved {saved_count} new emails'
-        }, status=status.HTTP_200_OK)
-        
-    except Exception as e:
-        return Response(
-            {'error': f'Failed to fetch emails: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+    
+    message_format = request.data.get('format')
+    if message_format not in (None, 'metadata', 'full'):
+        return None, Response(
+            {'error': 'format must be "metadata" or "full"'},
+            status=status.HTTP_400_BAD_REQUEST
         )
+    
+    return {
+        'days_back': days_back,
+        'max_results': max_results,
+        'batch_size': batch_size,
+        'incremental': request.data.get('incremental', False) in (True, 'true', 'True', '1', 1),
+        'message_format': message_format,
+    }, None
+
+
+def sync_job_response(job: SyncJob, created: bool) -> Response:
+    status_url = reverse('gmail:sync_job', args=[job.pk])
+    return Response({
+        **SyncJobSerializer(job).data,
+        'status_url': status_url,
+        # Event streams are only served in ASGI mode
+        'events_url': reverse('gmail:sync_job_events', args=[job.pk]) if settings.ASGI_MODE else None,
+        'message': 'Sync queued' if created else 'A sync is already in progress',
+    }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_job_detail(request, job_id):
+    """Get the status and progress counts of a sync job"""
+    job = get_object_or_404(SyncJob, id=job_id, user=request.user)
+    return Response(SyncJobSerializer(job).data)
 
 
 @api_view(['GET'])
@@ -71,10 +132,24 @@ def list_emails(request):
     Query params:
     - status: Filter by processing status
     - is_job_related: Filter by job relation
-    - search: Search in subject/sender
+    - search: Search subject, sender and body; results are ranked and
+      carry a highlighted snippet on PostgreSQL
     - page: Page number
+    - cursor: Use keyset pagination instead of page numbers; pass an empty
+      cursor for the first page, then each response's ``next_cursor``.
+      Results are always newest first and ``count=exact|approximate``
+      adds a total count.
+    
+    Responses carry an ETag; polls with a matching ``If-None-Match`` get a
+    304, and unchanged pages are served from the per-user response cache.
     """
-    emails = Email.objects.filter(user=request.user)
+    return cached_user_response(request, lambda: _list_emails_data(request))
+
+
+def _list_emails_data(request):
+    """Build the list_emails response data"""
+    # Load only the columns EmailListSerializer renders
+    emails = Email.objects.filter(user=request.user).only(*EMAIL_LIST_FIELDS)
     
     # Apply filters
     status_filter = request.query_params.get('status')
@@ -85,15 +160,18 @@ def list_emails(request):
     if is_job_related is not None:
         emails = emails.filter(is_job_related=is_job_related.lower() == 'true')
     
+    # Search (ranked full-text on PostgreSQL), otherwise newest first
     search = request.query_params.get('search')
     if search:
-        emails = emails.filter(
-            models.Q(subject__icontains=search) |
-            models.Q(sender__icontains=search)
-        )
+        emails = search_emails(emails, search)
+    else:
+        emails = emails.order_by('-received_at')
     
-    # Order by date
-    emails = emails.order_by('-received_at')
+    # Keyset pagination: no COUNT(*) or OFFSET
+    if EmailCursorPagination.is_requested(request):
+        paginator = EmailCursorPagination()
+        page = paginator.paginate_queryset(emails, request)
+        return paginator.get_paginated_response(EmailListSerializer(page, many=True).data).data
     
     # Paginate
     from django.core.paginator import Paginator
@@ -103,39 +181,51 @@ def list_emails(request):
     
     serializer = EmailListSerializer(page_obj, many=True)
     
-    return Response({
+    return {
         'results': serializer.data,
         'count': paginator.count,
         'num_pages': paginator.num_pages,
         'current_page': page_obj.number
-    }, status=status.HTTP_200_OK)
+    }
 
 
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def email_detail(request, email_id):
     """Get or update a specific email"""
-    email = get_object_or_404(Email, id=email_id, user=request.user)
+    email = get_object_or_404(
+        Email.objects.select_related('application', 'body'),
+        id=email_id,
+        user=request.user
+    )
     
     if request.method == 'GET':
+        # Emails synced in metadata format get their body on first read
+        if email.body_fetched_at is None:
+            try:
+                GmailService(request.user).hydrate_emails([email])
+            except Exception:
+                logger.exception('Failed to fetch body for email %s', email.id)
+        
         serializer = EmailSerializer(email)
         return Response(serializer.data)
     
     elif request.method == 'PATCH':
-        serializer = EmailSerializer(email, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            
-            # If marking as processed, mark as read in Gmail
-            if request.data.get('category') == 'PROCESSED':
-                try:
-                    gmail_service = GmailService(request.user)
-                    gmail_service.mark_as_read(email.gmail_id)
-                except:
-                    pass  # Don't fail if Gmail update fails
-            
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return update_email(request, email)
+
+
+def update_email(request, email: Email) -> Response:
+    """Apply a PATCH to ``email``"""
+    serializer = EmailSerializer(email, data=request.data, partial=True)
+    if serializer.is_valid():
+        serializer.save()
+        
+        # If marking as processed, mark as read in Gmail (applied by a worker)
+        if request.data.get('category') == 'PROCESSED':
+            outbox.enqueue(request.user, outbox.MARK_READ, [email])
+        
+        return Response(serializer.data)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['POST'])
@@ -153,7 +243,11 @@ def create_application_from_email(request, email_id):
     }
     """
     email = get_object_or_404(Email, id=email_id, user=request.user)
-    
+    return create_application(request, email)
+
+
+def create_application(request, email: Email) -> Response:
+    """Create a job application from ``email``"""
     # Check if application already exists
     if hasattr(email, 'application'):
         return Response(
@@ -164,30 +258,35 @@ def create_application_from_email(request, email_id):
     # Create application
     from applications.models import Application
     from applications.serializers import ApplicationSerializer
+    from applications.stats import invalidate_application_stats
     
     # Merge email data with request data
     application_data = {
         'user': request.user.id,
         'email': email.id,
-        'applied_date': email.date_received,
+        'applied_date': email.received_at,
         **request.data
     }
     
     serializer = ApplicationSerializer(data=application_data)
     if serializer.is_valid():
         application = serializer.save()
+        invalidate_application_stats(request.user)
         
         # Update email status
         email.status = 'PROCESSED'
         email.is_job_related = True
         email.save()
         
-        # Add label in Gmail
-        try:
-            gmail_service = GmailService(request.user)
-            gmail_service.add_label(email.gmail_id, 'Job Tracker/Processed')
-        except:
-            pass
+        # Add label in Gmail (applied by a worker)
+        outbox.enqueue(request.user, outbox.ADD_LABEL, [email], {'label': PROCESSED_LABEL})
+        
+        # The application's email will be read, fetch its body ahead of time
+        if email.body_fetched_at is None:
+            transaction.on_commit(
+                lambda: hydrate_emails.delay(request.user.id, [email.id]),
+                robust=True
+            )
         
         return Response(
             ApplicationSerializer(application).data,
@@ -0,0 +1,16 @@
+"""
+Gunicorn configuration
+
+WSGI with sync workers by default. With ASGI_MODE=True the ASGI application
+is served by uvicorn workers, so requests waiting on Gmail do not hold a
+worker process.
+"""
+import os
+
+asgi_mode = os.environ.get('ASGI_MODE', 'False') == 'True'
+
+wsgi_app = 'job_tracker.asgi:application' if asgi_mode else 'job_tracker.wsgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker' if asgi_mode else 'sync'
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+errorlog = '-'
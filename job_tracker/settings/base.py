@@ -27,6 +27,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Search lookups; inert on SQLite
 ]
 
 THIRD_PARTY_APPS = [
@@ -125,7 +126,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -185,6 +186,7 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 # Celery task routing
 CELERY_TASK_ROUTES = {
     'gmail.*': {'queue': 'io'},
+    'accounts.tasks.*': {'queue': 'io'},
     'applications.tasks.classify_email': {'queue': 'ai'},
     'applications.tasks.generate_draft': {'queue': 'ai'},
     'applications.tasks.analyze_page': {'queue': 'ai'},
@@ -192,10 +194,125 @@ CELERY_TASK_ROUTES = {
     'applications.tasks.daily_digest': {'queue': 'beat'},
 }
 
+# Cache (shares REDIS_URL with Celery; keys are prefixed and namespaced via core.cache)
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'job_tracker',
+        'OPTIONS': {
+            # Passed to the per-process redis ConnectionPool
+            'max_connections': int(os.environ.get('REDIS_CACHE_MAX_CONNECTIONS', '50')),
+            'socket_connect_timeout': 2,
+            'socket_timeout': 2,
+            'health_check_interval': 30,
+            # Heroku Redis uses self-signed certificates
+            **({'ssl_cert_reqs': None} if REDIS_URL.startswith('rediss://') else {}),
+        },
+    }
+}
+
+# Sessions live in the cache: no session row writes per login or OAuth flow
+SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+SESSION_CACHE_ALIAS = 'default'
+
+# Async deployment (gunicorn.conf.py): serve job_tracker.asgi with uvicorn workers
+# and route the Gmail-bound endpoints to gmail.async_views
+ASGI_MODE = os.environ.get('ASGI_MODE', 'False') == 'True'
+
 # Google OAuth2 settings
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', '')
 GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET', '')
 GOOGLE_REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI', 'http://localhost:8000/api/oauth/google/callback')
+OAUTH_STATE_TTL = 600  # seconds an OAuth state issued by /api/oauth/google/ stays valid
+
+# Domain filters
+DOMAIN_FILTER_CACHE_TTL = 3600  # seconds a user's compiled domain matcher is cached
+
+# Application stats
+APPLICATION_STATS_CACHE_TTL = 300  # seconds; writes through the API invalidate sooner
+
+# Per-user response cache for polled list endpoints (core.versioning)
+RESPONSE_CACHE_TTL = 300  # seconds; any email/application write invalidates sooner
+
+# Authentication caches (accounts.authentication)
+AUTH_USER_CACHE_TTL = 300  # seconds a JWT user is cached; user/account writes invalidate sooner
+GOOGLE_ACCOUNT_CACHE_TTL = 30  # seconds decrypted Google tokens stay in process memory
+
+# Google token refresh
+GOOGLE_TOKEN_EXPIRY_SKEW = 60  # seconds before expiry a request-path refresh kicks in
+GOOGLE_TOKEN_REFRESH_AHEAD = 600  # seconds before expiry the periodic job renews tokens
+GOOGLE_TOKEN_REFRESH_INTERVAL = 300  # seconds between periodic refresh sweeps
+GOOGLE_TOKEN_REFRESH_LOCK_TIMEOUT = 30  # seconds a refresh may hold (or wait for) the lock
+
+# Gmail sync settings
+GMAIL_BATCH_SIZE = int(os.environ.get('GMAIL_BATCH_SIZE', '50'))  # messages per batch request (max 100)
+GMAIL_SYNC_CHUNK_SIZE = int(os.environ.get('GMAIL_SYNC_CHUNK_SIZE', '200'))  # emails per existence check + bulk insert
+GMAIL_LABEL_CACHE_TTL = 3600  # seconds label name -> id mappings are cached per account
+GMAIL_QUERY_MAX_BLOCKED_DOMAINS = 50  # blocked domains pushed into the search query as -from: terms
+EMAIL_BODY_COMPRESSION = os.environ.get('EMAIL_BODY_COMPRESSION', 'zlib')  # HTML body codec: 'zlib' or ''
+GMAIL_SYNC_FORMAT = os.environ.get('GMAIL_SYNC_FORMAT', 'metadata')  # 'metadata' (bodies fetched on read) or 'full'
+GMAIL_BODY_MAX_BYTES = int(os.environ.get('GMAIL_BODY_MAX_BYTES', '1048576'))  # stored per body type, longer ones truncated
+GMAIL_ASYNC_CONCURRENCY = int(os.environ.get('GMAIL_ASYNC_CONCURRENCY', '4'))  # Gmail calls in flight per async request
+GMAIL_API_ROOT_URL = os.environ.get('GMAIL_API_ROOT_URL') or None  # overrides https://gmail.googleapis.com/ (load tests)
+
+# Gmail API quota (gmail.quota): Gmail allows 250 units/s per user and 1,200,000 units/min per project
+GMAIL_QUOTA_ENABLED = os.environ.get('GMAIL_QUOTA_ENABLED', 'True') == 'True'  # token buckets in Redis
+GMAIL_QUOTA_USER_RATE = int(os.environ.get('GMAIL_QUOTA_USER_RATE', '250'))  # units per second per user
+GMAIL_QUOTA_USER_BURST = 250  # units a user can spend at once
+GMAIL_QUOTA_PROJECT_RATE = int(os.environ.get('GMAIL_QUOTA_PROJECT_RATE', '20000'))  # units per second, all workers
+GMAIL_QUOTA_PROJECT_BURST = 20000
+GMAIL_QUOTA_MAX_WAIT = 60  # seconds a call waits for quota before GmailQuotaExceeded
+GMAIL_MAX_RETRIES = 5  # retries of rate-limited (429, rate-limit 403) and 5xx Gmail calls
+GMAIL_RETRY_BASE_DELAY = 1  # seconds, doubled per retry with full jitter
+GMAIL_RETRY_MAX_DELAY = 32
+
+# Scheduled Gmail sync (gmail.tasks.dispatch_sync)
+GMAIL_SYNC_INTERVAL = int(os.environ.get('GMAIL_SYNC_INTERVAL', '300'))  # seconds between sweeps
+GMAIL_SYNC_ACCOUNTS_PER_TASK = int(os.environ.get('GMAIL_SYNC_ACCOUNTS_PER_TASK', '25'))
+GMAIL_SYNC_MAX_QUEUE_DEPTH = int(os.environ.get('GMAIL_SYNC_MAX_QUEUE_DEPTH', '200'))  # io queue backpressure limit
+GMAIL_SYNC_LOCK_TIMEOUT = 600  # seconds a per-user sync lock is held at most
+GMAIL_SYNC_SWEEP_TTL = 3600  # seconds sweep bookkeeping is kept in Redis
+GMAIL_SYNC_DAYS_BACK = 7  # date window for full syncs when no history cursor exists
+GMAIL_SYNC_MAX_RESULTS = 500
+
+# Background sync jobs (POST /api/gmail/fetch/, gmail.sync_jobs)
+SYNC_JOB_RETRY_DELAY = 15  # seconds before a job blocked by a running scheduled sync retries
+SYNC_JOB_MAX_RETRIES = 40
+SYNC_JOB_STALE_AFTER = GMAIL_SYNC_LOCK_TIMEOUT  # seconds without progress before a job counts as dead
+SYNC_JOB_EVENTS_POLL_INTERVAL = 1  # seconds between job reads of an event stream
+SYNC_JOB_EVENTS_BATCH_SIZE = 100  # email events sent per poll
+SYNC_JOB_EVENTS_TIMEOUT = 300  # seconds an event stream stays open before the client reconnects
+
+# Historical import (gmail.backfill, manage.py backfill_gmail, gmail.tasks.backfill_account)
+GMAIL_BACKFILL_DAYS = 365
+GMAIL_BACKFILL_WINDOW_DAYS = 30  # days per window, the unit of parallelism and checkpointing
+GMAIL_BACKFILL_WORKERS = 4  # windows imported at once by the management command
+GMAIL_BACKFILL_STALE_AFTER = GMAIL_SYNC_LOCK_TIMEOUT  # seconds without a checkpoint before a RUNNING window is retaken
+
+# Gmail outbox (gmail.outbox, drained by gmail.tasks.drain_outbox)
+GMAIL_OUTBOX_DRAIN_INTERVAL = 60  # seconds between sweeps that pick up due retries
+GMAIL_OUTBOX_BATCH_SIZE = 1000  # operations applied per account per drain
+GMAIL_OUTBOX_LOCK_TIMEOUT = 300  # seconds a per-user drain lock is held at most
+GMAIL_OUTBOX_MAX_ATTEMPTS = 8  # attempts before an operation is marked FAILED
+GMAIL_OUTBOX_RETRY_BASE_DELAY = 30  # seconds before the first retry, doubled per attempt
+GMAIL_OUTBOX_RETRY_MAX_DELAY = 3600
+
+CELERY_BEAT_SCHEDULE = {
+    'gmail-sync-all-accounts': {
+        'task': 'gmail.tasks.dispatch_sync',
+        'schedule': GMAIL_SYNC_INTERVAL,
+    },
+    'google-refresh-expiring-tokens': {
+        'task': 'accounts.tasks.refresh_expiring_tokens',
+        'schedule': GOOGLE_TOKEN_REFRESH_INTERVAL,
+    },
+    'gmail-drain-outbox': {
+        'task': 'gmail.tasks.drain_outbox',
+        'schedule': GMAIL_OUTBOX_DRAIN_INTERVAL,
+    },
+}
 
 # OpenAI settings
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
@@ -13,6 +13,16 @@ DATABASES = {
     }
 }
 
+# Per-process cache instead of Redis (sessions are lost on restart)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# No Redis for the Gmail quota buckets (rate-limited calls are still retried)
+GMAIL_QUOTA_ENABLED = False
+
 # Development-specific settings
 CORS_ALLOW_ALL_ORIGINS = True
 